@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import exceptions
+import apps.api.services as api_services
+from apps.api.services import payloads, dump
+
+
+class Command(BaseCommand):
+    help = 'Writes open data (all records or records filtered by obj_type/last_update_from) ' \
+           'to a gzip-compressed NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Output file path'
+        )
+        parser.add_argument(
+            '--obj_type',
+            type=int,
+            help='Object type id'
+        )
+        parser.add_argument(
+            '--last_update_from',
+            type=str,
+            help='Last update date from (dd.mm.yyyy)'
+        )
+        parser.add_argument(
+            '--biblio_format',
+            type=str,
+            default=payloads.FULL,
+            choices=list(payloads.FORMATS.keys()),
+        )
+        parser.add_argument(
+            '--snapshot',
+            action='store_true',
+            help='Create snapshots of the whole register in all formats (served by /api/v1/open-data/dump/snapshot/)'
+        )
+
+    def handle(self, *args, **options):
+        if options['snapshot']:
+            dump.create_snapshots()
+            self.stdout.write(self.style.SUCCESS(f'Snapshots are saved to {dump.get_root()}'))
+            return
+
+        if not options['output']:
+            raise CommandError('--output or --snapshot is required')
+
+        try:
+            filters = api_services.opendata_prepare_filters({
+                'obj_type': options['obj_type'],
+                'last_update_from': options['last_update_from'],
+            })
+        except exceptions.ParseError as e:
+            raise CommandError(e.detail)
+
+        dump.write(options['output'], filters, options['biblio_format'])
+        self.stdout.write(self.style.SUCCESS('Finished'))
@@ -2,18 +2,23 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 from django.core.mail import mail_admins
 from elasticsearch import Elasticsearch
-from elasticsearch_dsl import Search
 from apps.search.models import IpcAppList
 from apps.search.utils import is_app_limited
 import apps.api.services as api_services
-from ...models import OpenData
+from apps.api.services import payloads
+import apps.search.services as search_services
+from ...models import OpenData, Person
 from datetime import datetime
+from typing import List
 import json
 
 
 class Command(BaseCommand):
     help = 'Fills open data db table'
     es = None
+    change_journal_name = 'open_data'
+    update_fields = ['obj_type', 'last_update', 'app_number', 'app_date', 'files_path', 'data', 'data_docs',
+                     'data_payments', 'registration_number', 'registration_date', 'obj_state']
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -37,6 +42,17 @@ class Command(BaseCommand):
             type=bool,
             help='Show progress'
         )
+        parser.add_argument(
+            '--changes',
+            action='store_true',
+            help='Process only records indexed in ElasticSearch since the previous run with this flag'
+        )
+        parser.add_argument(
+            '--chunk_size',
+            type=int,
+            default=500,
+            help='Number of records processed at once'
+        )
 
     def get_registration_date(self, app: IpcAppList, data: dict) -> datetime | str:
         """Возвращает дату регистрации."""
@@ -59,72 +75,112 @@ class Command(BaseCommand):
         else:
             return app.app_date
 
+    def get_es_data(self, ids: List[int]) -> dict:
+        """Возвращает данные объектов из ElasticSearch (одним запросом)."""
+        response = self.es.mget(
+            body={'ids': ids},
+            index=settings.ELASTIC_INDEX_NAME,
+            doc_type='_doc',
+            _source_exclude=["*.DocBarCode", "*.DOCBARCODE"]
+        )
+        return {int(doc['_id']): doc['_source'] for doc in response['docs'] if doc.get('found')}
+
+    def fill_record(self, open_data_record: OpenData, app: IpcAppList, data: dict) -> None:
+        """Заполняет поля записи открытых данных."""
+        # Данные заявки из ES (обработанные)
+        biblio_data = api_services.app_get_biblio_data(data)
+        data_docs = api_services.app_get_documents(data)
+        data_payments = api_services.app_get_payments(data)
+
+        open_data_record.obj_type_id = app.obj_type_id
+        open_data_record.last_update = app.lastupdate
+        open_data_record.app_number = app.app_number
+        open_data_record.app_date = self.get_app_date(app, data)
+        open_data_record.files_path = app.files_path
+        open_data_record.data = json.dumps(biblio_data) if biblio_data else None
+        open_data_record.data_docs = json.dumps(data_docs) if data_docs else None
+        open_data_record.data_payments = json.dumps(data_payments) if data_payments else None
+        if app.registration_date:
+            open_data_record.registration_number = app.registration_number
+            open_data_record.registration_date = self.get_registration_date(app, data)
+            open_data_record.obj_state = 2
+        else:
+            open_data_record.obj_state = 1
+
+    def process_chunk(self, ids: List[int]) -> int:
+        """Добавляет/обновляет данные части объектов. Возвращает количество обработанных объектов."""
+        es_data = self.get_es_data(ids)
+        apps = IpcAppList.objects.in_bulk(list(es_data.keys()))
+        existing = {x.app_id: x for x in OpenData.objects.filter(app_id__in=list(es_data.keys())).defer(
+            'data', 'data_docs', 'data_payments', 'api_json', 'api_json_nacp'
+        )}
+
+        to_create = []
+        to_update = []
+        # Наименования субъектов (обновляются только для заявок без ограничения доступа)
+        persons = {}
+        for app_id, data in es_data.items():
+            app = apps.get(app_id)
+            if app is None:
+                continue
+            open_data_record = existing.get(app_id) or OpenData(app_id=app_id)
+            self.fill_record(open_data_record, app, data)
+            if open_data_record.pk:
+                to_update.append(open_data_record)
+            else:
+                to_create.append(open_data_record)
+            if not is_app_limited(data):
+                persons[app_id] = api_services.app_get_unique_subjects_from_data(data)
+
+        # Сохраннение данных
+        OpenData.objects.bulk_update(to_update, self.update_fields, batch_size=100)
+        OpenData.objects.bulk_create(to_create)
+
+        open_data_ids = dict(
+            OpenData.objects.filter(app_id__in=[x.app_id for x in to_update + to_create]).values_list('app_id', 'id')
+        )
+
+        # Данные в формате API
+        payloads.update(list(open_data_ids.values()))
+
+        # Обновление списка наименований субъектов
+        if persons:
+            Person.objects.filter(open_data_id__in=[open_data_ids[app_id] for app_id in persons]).delete()
+            Person.objects.bulk_create([
+                Person(open_data_id=open_data_ids[app_id], person_name=person_name)
+                for app_id, person_names in persons.items()
+                for person_name in person_names
+            ])
+
+        return len(to_update) + len(to_create)
+
     def handle(self, *args, **options):
         # Инициализация клиента ElasticSearch
         self.es = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
 
+        # Диапазон изменений, которые ещё не добавлены в API
+        if options['changes']:
+            options['changes_range'] = search_services.change_journal_get_range(
+                self.change_journal_name,
+                api_services.app_get_api_queryset(),
+                'last_indexation_date'
+            )
+
         # Объекты для добавления в API
         apps = api_services.app_get_api_list(options)
 
-        if options['verbose']:
-            c = len(apps)
-            i = 0
+        ids = [d[0] for d in apps]
 
-        # Добавление/обновление данных
+        # Добавление/обновление данных частями
         updated_count = 0
-        for d in apps:
+        for i in range(0, len(ids), options['chunk_size']):
+            updated_count += self.process_chunk(ids[i:i + options['chunk_size']])
             if options['verbose']:
-                i += 1
-                self.stdout.write(self.style.SUCCESS(f"{i}/{c} - {d[0]}"))
-
-            app = IpcAppList.objects.get(id=d[0])
-
-            # Получение данных с ElasticSearch
-            data = Search(
-                using=self.es,
-                index=settings.ELASTIC_INDEX_NAME
-            ).query(
-                "match",
-                _id=d[0]
-            ).source(
-                excludes=["*.DocBarCode", "*.DOCBARCODE"]
-            ).execute()
-
-            if data:
-                data = data[0].to_dict()
-
-                # Данные заявки из ES (обработанные)
-                biblio_data = api_services.app_get_biblio_data(data)
-                data_docs = api_services.app_get_documents(data)
-                data_payments = api_services.app_get_payments(data)
-
-                # Сохраннение данных
-                open_data_record, created = OpenData.objects.get_or_create(app_id=d[0])
-                open_data_record.obj_type_id = app.obj_type_id
-                open_data_record.last_update = app.lastupdate
-                open_data_record.app_number = app.app_number
-                open_data_record.app_date = self.get_app_date(app, data)
-                open_data_record.files_path = app.files_path
-                open_data_record.data = json.dumps(biblio_data) if biblio_data else None
-                open_data_record.data_docs = json.dumps(data_docs) if data_docs else None
-                open_data_record.data_payments = json.dumps(data_payments) if data_payments else None
-                if app.registration_date:
-                    open_data_record.registration_number = app.registration_number
-                    open_data_record.registration_date = self.get_registration_date(app, data)
-                    open_data_record.obj_state = 2
-                else:
-                    open_data_record.obj_state = 1
-                open_data_record.save()
-
-                # Обновление списка наименований субъектов
-                if not is_app_limited(data):
-                    open_data_record.person_set.all().delete()
-                    for person_name in api_services.app_get_unique_subjects_from_data(data):
-                        open_data_record.person_set.create(
-                            person_name=person_name
-                        )
-
-                updated_count += 1
+                self.stdout.write(self.style.SUCCESS(f"{min(i + options['chunk_size'], len(ids))}/{len(ids)}"))
+
+        # Сохранение контрольной точки журнала изменений
+        if options['changes']:
+            search_services.change_journal_commit(self.change_journal_name, options['changes_range'][1], updated_count)
 
         mail_admins(
             "API SIS",
@@ -1,61 +1,79 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from django.db.models import F
-from django.utils.timezone import make_aware
 from elasticsearch import Elasticsearch
-from elasticsearch_dsl import Search
-from apps.search.models import IpcAppList
-from apps.bulletin.models import EBulletinData
 from ...models import OpenData
+from ...services import payloads
 import json
-from datetime import datetime
 
 
 class Command(BaseCommand):
     help = 'Fills open data db table'
     es = None
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk_size',
+            type=int,
+            default=500,
+            help='Number of records processed at once'
+        )
+
+    def get_data_docs(self, obj_type_id: int, data: dict):
+        """Возвращает документы заявки."""
+        # Патенты на изобретения, Патенты на полезные модели, Свидетельства на топографии инт. микросхем
+        if obj_type_id in (1, 2, 3):
+            return data.get('DOCFLOW', {}).get('DOCUMENTS')
+
+        # Свидетельства на знаки для товаров и услуг
+        elif obj_type_id == 4:
+            return data['TradeMark'].get('DocFlow', {}).get('Documents')
+
+        # Патенты на пром. образцы
+        elif obj_type_id == 6:
+            return data['Design'].get('DocFlow', {}).get('Documents')
+
+        return None
+
     def handle(self, *args, **options):
         # Инициализация клиента ElasticSearch
         self.es = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
 
         # Объекты для добавления в API
-        apps = OpenData.objects.filter(
+        apps = list(OpenData.objects.filter(
             data_docs__isnull=True
-        ).values('app_id', 'obj_type_id')
+        ).values_list('id', 'app_id', 'obj_type_id'))
 
-        c = apps.count()
-        i = 0
+        c = len(apps)
 
-        # Добавление/обновление данных
-        for app in apps:
-            i += 1
-            print(f"{i}/{c} - {app['app_id']}")
+        # Добавление/обновление данных частями
+        for i in range(0, c, options['chunk_size']):
+            chunk = apps[i:i + options['chunk_size']]
+            print(f"{i + len(chunk)}/{c}")
 
             # Получение данных с ElasticSearch
-            data = Search(using=self.es, index=settings.ELASTIC_INDEX_NAME).query("match", _id=app['app_id']).execute()
-            if data:
-                data = data[0].to_dict()
-                try:
-                    data_docs = None
-                    # Патенты на изобретения, Патенты на полезные модели, Свидетельства на топографии инт. микросхем
-                    if app['obj_type_id'] in (1, 2, 3):
-                        data_docs = data.get('DOCFLOW', {}).get('DOCUMENTS')
-
-                    # Свидетельства на знаки для товаров и услуг
-                    elif app['obj_type_id'] == 4:
-                        data_docs = data['TradeMark'].get('DocFlow', {}).get('Documents')
-
-                    # Патенты на пром. образцы
-                    elif app['obj_type_id'] == 6:
-                        data_docs = data['Design'].get('DocFlow', {}).get('Documents')
+            response = self.es.mget(
+                body={'ids': [app_id for _, app_id, _ in chunk]},
+                index=settings.ELASTIC_INDEX_NAME,
+                doc_type='_doc',
+                _source_exclude=["*.DocBarCode", "*.DOCBARCODE"]
+            )
+            es_data = {int(doc['_id']): doc['_source'] for doc in response['docs'] if doc.get('found')}
 
+            records = []
+            for open_data_id, app_id, obj_type_id in chunk:
+                if app_id not in es_data:
+                    continue
+                try:
+                    data_docs = self.get_data_docs(obj_type_id, es_data[app_id])
                 except KeyError as e:
                     self.stdout.write(
-                        self.style.ERROR(f"Can't get app data (idAPPNumber={app['app_id']}, error text:{e})")
+                        self.style.ERROR(f"Can't get app data (idAPPNumber={app_id}, error text:{e})")
                     )
                 else:
-                    # Сохраннение данных
-                    OpenData.objects.filter(app_id=app['app_id']).update(data_docs=json.dumps(data_docs))
+                    records.append(OpenData(id=open_data_id, data_docs=json.dumps(data_docs)))
+
+            # Сохраннение данных
+            OpenData.objects.bulk_update(records, ['data_docs'], batch_size=100)
+            payloads.update([x.id for x in records])
 
         self.stdout.write(self.style.SUCCESS(f'Finished'))
@@ -7,6 +7,7 @@ from elasticsearch_dsl import Search
 from apps.search.models import IpcAppList
 from apps.bulletin.models import EBulletinData
 from ...models import OpenData
+from ...services import payloads
 import json
 
 
@@ -32,6 +33,7 @@ class Command(BaseCommand):
         if max_date:
             items = items.filter(lastupdate__gt=max_date)
 
+        updated_ids = []
         for item in items:
             open_data_record, created = OpenData.objects.get_or_create(
                 app_id=item.pk
@@ -101,5 +103,10 @@ class Command(BaseCommand):
 
                 # Сохранение в БД
                 open_data_record.save()
+                updated_ids.append(open_data_record.pk)
+
+        # Формирование данных в формате API для изменённых записей
+        for i in range(0, len(updated_ids), 100):
+            payloads.update(updated_ids[i:i + 100])
 
         self.stdout.write(self.style.SUCCESS(f'Finished'))
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_person'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='opendata',
+            name='api_json',
+            field=models.TextField(blank=True, default=None, null=True, verbose_name='Дані для API у форматі JSON'),
+        ),
+        migrations.AddField(
+            model_name='opendata',
+            name='api_json_nacp',
+            field=models.TextField(blank=True, default=None, null=True, verbose_name='Дані для API у форматі JSON (НАЗК)'),
+        ),
+    ]
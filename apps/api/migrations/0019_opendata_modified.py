@@ -0,0 +1,20 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_opendata_api_json'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='opendata',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата зміни запису'),
+            preserve_default=False,
+        ),
+    ]
@@ -22,6 +22,26 @@ class OpenData(models.Model):
     registration_number = models.CharField(blank=True, null=True, default=None, max_length=32)
     registration_date = models.DateTimeField(blank=True, null=True, default=None, db_index=True)
     files_path = models.CharField(max_length=500, blank=True, null=True)
+    # Готовые к выдаче данные объекта в формате API (полный формат и формат НАЗК)
+    api_json = models.TextField('Дані для API у форматі JSON', default=None, null=True, blank=True)
+    api_json_nacp = models.TextField('Дані для API у форматі JSON (НАЗК)', default=None, null=True, blank=True)
+    # Дата изменения записи (для получения изменений по курсору, pagination=since).
+    # При сохранении через bulk_update не обновляется автоматически (см. payloads.update)
+    modified = models.DateTimeField('Дата зміни запису', auto_now=True, db_index=True)
+
+    # Поля с готовыми к выдаче данными
+    payload_fields = ('api_json', 'api_json_nacp')
+
+    def save(self, *args, **kwargs):
+        # Готовые к выдаче данные формируются из остальных полей и после их изменения неактуальны
+        # (формируются повторно при выдаче или функцией payloads.update)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or not set(update_fields) & set(self.payload_fields):
+            for field_name in self.payload_fields:
+                setattr(self, field_name, None)
+            if update_fields is not None:
+                kwargs['update_fields'] = list(update_fields) + list(self.payload_fields)
+        super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = 'Відкриті дані'
@@ -0,0 +1,105 @@
+"""Выгрузка открытых данных одним файлом (NDJSON, сжатый gzip).
+
+Каждая строка файла - данные одного объекта в формате API (см. payloads). Объекты читаются из БД
+частями по CHUNK_SIZE (по возрастанию id, отдельным запросом для каждой части), поэтому выгрузка
+всего реестра не требует загрузки его в память.
+Ежедневные снимки всего реестра (в полном формате и в формате НАЗК) формируются заранее
+(задача create_open_data_snapshots, команда dump_open_data --snapshot) в каталоге OPEN_DATA_DUMP_ROOT.
+"""
+from typing import Iterable, Iterator, Optional
+import os
+import zlib
+
+from django.conf import settings
+
+from apps.api.services import payloads
+from apps.api.services.services import opendata_filter_queryset, opendata_get_applications
+
+# Количество объектов, которые читаются из БД за один раз
+CHUNK_SIZE = 2000
+
+
+def get_root() -> str:
+    """Возвращает путь к каталогу со снимками открытых данных."""
+    return getattr(settings, 'OPEN_DATA_DUMP_ROOT', os.path.join(settings.BASE_DIR, 'cache', 'open_data'))
+
+
+def get_snapshot_path(data_format: str) -> str:
+    """Возвращает путь к файлу снимка открытых данных в формате data_format."""
+    return os.path.join(get_root(), f"open-data-{data_format}.ndjson.gz")
+
+
+def iter_lines(filters: dict, data_format: str) -> Iterator[bytes]:
+    """Возвращает строки NDJSON с данными объектов (с применением фильтров API)."""
+    field_name = payloads.FORMATS[data_format][1]
+    queryset = opendata_filter_queryset(filters).order_by('pk').distinct().values_list('id', field_name)
+
+    last_pk = 0
+    while True:
+        # Драйвер MSSQL не поддерживает серверные курсоры (iterator() загружает в память весь результат),
+        # поэтому объекты читаются частями с условием по id
+        chunk = list(queryset.filter(pk__gt=last_pk)[:CHUNK_SIZE])
+        if not chunk:
+            return
+        last_pk = chunk[-1][0]
+
+        # Данные объектов, для которых они ещё не сформированы, формируются без сохранения
+        missing = [pk for pk, fragment in chunk if fragment is None]
+        rendered = {}
+        if missing:
+            rendered = {app['id']: payloads.render(app, data_format) for app in opendata_get_applications(missing)}
+
+        yield b''.join(
+            f"{fragment if fragment is not None else rendered[pk]}\n".encode('utf-8')
+            for pk, fragment in chunk if fragment is not None or pk in rendered
+        )
+
+
+def iter_gzip(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Сжимает поток данных в формате gzip."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def write(file_path: str, filters: dict, data_format: str) -> None:
+    """Записывает выгрузку в файл (через временный файл, чтобы не отдавать клиентам неполный файл)."""
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        for data in iter_gzip(iter_lines(filters, data_format)):
+            f.write(data)
+    os.replace(tmp_path, file_path)
+
+
+def create_snapshots() -> None:
+    """Формирует снимки всего реестра во всех форматах."""
+    for data_format in payloads.FORMATS:
+        write(get_snapshot_path(data_format), {}, data_format)
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[tuple]:
+    """Возвращает диапазон (начало, конец включительно) из заголовка Range (только один диапазон байт).
+    Возвращает None, если заголовок отсутствует или не поддерживается (отдаётся весь файл),
+    вызывает ValueError, если диапазон недопустим."""
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    start, sep, end = header[6:].strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if start:
+            start = int(start)
+            end = min(int(end), size - 1) if end else size - 1
+        else:
+            # Последние end байт
+            start = max(size - int(end), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise ValueError('Range not satisfiable')
+    return start, end
@@ -0,0 +1,75 @@
+"""Готовые к выдаче данные объектов открытых данных в формате API.
+
+Данные объекта в полном формате и в формате НАЗК (результат OpenDataSerializerV1, OpenDataSerializerNacpV1)
+формируются при заполнении таблицы открытых данных (fill_open_data_table) и хранятся в полях
+api_json, api_json_nacp. Списки объектов формируются из сохранённых фрагментов без разбора JSON.
+Данные зависят от настроек MEDIA_URL и CODE_441_BUL_NUMBER_FROM_JSON_SINCE_DATE, при их изменении
+данные необходимо сформировать повторно (fill_open_data_table --not_compare_last_update True).
+"""
+from typing import Dict, Iterable, List
+
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from apps.api.models import OpenData
+from apps.api.serializers import OpenDataSerializerV1, OpenDataSerializerNacpV1
+from apps.api.services.services import opendata_get_applications
+
+FULL = 'full'
+NACP = 'nacp'
+
+# Формат -> (сериализатор, поле модели)
+FORMATS = {
+    FULL: (OpenDataSerializerV1, 'api_json'),
+    NACP: (OpenDataSerializerNacpV1, 'api_json_nacp'),
+}
+
+
+def get_format(biblio_format: str) -> str:
+    """Возвращает формат данных по значению параметра biblio_format."""
+    return NACP if biblio_format == NACP else FULL
+
+
+def render(app: dict, data_format: str) -> str:
+    """Возвращает данные объекта (результат opendata_get_applications) в формате API."""
+    serializer_class = FORMATS[data_format][0]
+    return JSONRenderer().render(serializer_class(app).data).decode('utf-8')
+
+
+def render_all(apps: Iterable[dict]) -> List[OpenData]:
+    """Возвращает объекты OpenData (id и данные во всех форматах) для сохранения с помощью bulk_update."""
+    records = []
+    for app in apps:
+        record = OpenData(id=app['id'])
+        for data_format, (serializer_class, field_name) in FORMATS.items():
+            setattr(record, field_name, render(app, data_format))
+        records.append(record)
+    return records
+
+
+def update(ids: List[int]) -> None:
+    """Формирует и сохраняет данные объектов в формате API.
+    Обновляет дату изменения записей (bulk_update не обновляет поля с auto_now)."""
+    records = render_all(opendata_get_applications(ids))
+    modified = timezone.now()
+    for record in records:
+        record.modified = modified
+    OpenData.objects.bulk_update(
+        records,
+        [field_name for serializer_class, field_name in FORMATS.values()] + ['modified'],
+        batch_size=100
+    )
+
+
+def get_fragments(ids: List[int], data_format: str) -> List[str]:
+    """Возвращает данные объектов в формате API в порядке ids.
+    Данные объектов, для которых они ещё не сформированы, формируются без сохранения."""
+    field_name = FORMATS[data_format][1]
+    fragments: Dict[int, str] = dict(OpenData.objects.filter(pk__in=ids).values_list('id', field_name))
+
+    missing = [pk for pk, fragment in fragments.items() if fragment is None]
+    if missing:
+        for app in opendata_get_applications(missing):
+            fragments[app['id']] = render(app, data_format)
+
+    return [fragments[pk] for pk in ids if pk in fragments]
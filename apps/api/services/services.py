@@ -1,4 +1,4 @@
-from django.db.models import F, QuerySet
+from django.db.models import F, QuerySet, Q as Q_db
 from django.conf import settings
 
 from elasticsearch import Elasticsearch
@@ -10,19 +10,26 @@ import apps.search.services as search_services
 from apps.api.models import OpenData
 from apps.bulletin import services as bulletin_services
 
-from typing import List, Optional, Union, Set
+from typing import List, Optional, Union, Set, Tuple
 from datetime import datetime
 from abc import ABC, abstractmethod
+import base64
+import binascii
 import json
 
 
-def app_get_api_list(options: dict) -> List:
-    """Возвращает список объектов для добавления в API"""
-    apps = IpcAppList.objects.filter(
+def app_get_api_queryset() -> QuerySet[IpcAppList]:
+    """Возвращает queryset объектов, которые публикуются в API."""
+    return IpcAppList.objects.filter(
         elasticindexed=1
     ).exclude(
         obj_type_id__in=(9, 14)
-    ).annotate(
+    )
+
+
+def app_get_api_list(options: dict) -> List:
+    """Возвращает список объектов для добавления в API"""
+    apps = app_get_api_queryset().annotate(
         app_id=F('id'), last_update=F('lastupdate')
     ).values_list('app_id', 'last_update')
 
@@ -39,6 +46,10 @@ def app_get_api_list(options: dict) -> List:
         apps = apps.filter(obj_type_id__in=options['obj_type_ids'])
         api_apps = api_apps.filter(obj_type_id__in=options['obj_type_ids'])
 
+    # Объекты, проиндексированные после предыдущего запуска (журнал изменений)
+    if options.get('changes_range'):
+        return list(search_services.change_journal_filter(apps, *options['changes_range'], 'last_indexation_date'))
+
     # Объекты, которых нет в API (или которые имеют другое значение поля last_update)
     if options['not_compare_last_update']:
         diff = apps
@@ -323,8 +334,8 @@ def opendata_prepare_filters(query_params: dict) -> dict:
     return res
 
 
-def opendata_get_ids_queryset(filters: dict) -> QuerySet[OpenData]:
-    """Возвращает Queryset (с применением фильтров) с id заявок для API."""
+def opendata_filter_queryset(filters: dict) -> QuerySet[OpenData]:
+    """Возвращает Queryset заявок для API с применением фильтров."""
     queryset = OpenData.objects.order_by('pk').all()
 
     # Стан об'єкта
@@ -367,7 +378,73 @@ def opendata_get_ids_queryset(filters: dict) -> QuerySet[OpenData]:
     if filters.get('subject_name'):
         queryset = queryset.filter(person__person_name__contains_ft=' AND '.join(filters['subject_name'].split()))
 
-    return queryset.distinct().values_list('id', flat=True)
+    return queryset
+
+
+def opendata_get_ids_queryset(filters: dict) -> QuerySet[OpenData]:
+    """Возвращает Queryset (с применением фильтров) с id заявок для API."""
+    return opendata_filter_queryset(filters).distinct().values_list('id', flat=True)
+
+
+# Режимы постраничной выдачи по курсору (параметр pagination): по id и по (modified, id) - для получения изменений
+CURSOR_MODE_ID = 'cursor'
+CURSOR_MODE_SINCE = 'since'
+
+
+def opendata_encode_cursor(mode: str, last_id: int, modified: Optional[datetime] = None) -> str:
+    """Кодирует позицию последнего выданного объекта в курсор."""
+    data = {'m': mode, 'id': last_id}
+    if mode == CURSOR_MODE_SINCE:
+        data['md'] = modified.isoformat()
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode()
+
+
+def opendata_decode_cursor(cursor: str) -> dict:
+    """Декодирует курсор. Возвращает словарь с ключами mode, id, modified."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if data['m'] not in (CURSOR_MODE_ID, CURSOR_MODE_SINCE):
+            raise ValueError
+        res = {'mode': data['m'], 'id': int(data['id']), 'modified': None}
+        if res['mode'] == CURSOR_MODE_SINCE:
+            res['modified'] = datetime.fromisoformat(data['md'])
+    except (binascii.Error, ValueError, UnicodeError, KeyError, TypeError):
+        raise exceptions.ParseError("Невірне значення параметру cursor")
+    return res
+
+
+def opendata_get_keyset_page(filters: dict, mode: str, cursor: Optional[dict], page_size: int) -> Tuple[List[int], dict]:
+    """Возвращает id заявок страницы, следующих за позицией cursor (без OFFSET и COUNT), и курсоры:
+    next - курсор следующей страницы (None, если страница последняя),
+    last - курсор последнего объекта страницы (для получения изменений при следующей синхронизации).
+    В режиме since объекты упорядочены по (modified, id) - дате изменения записи в таблице открытых данных,
+    поэтому изменённый объект выдаётся повторно, даже если дата его изменения в источнике не менялась."""
+    queryset = opendata_filter_queryset(filters)
+
+    if mode == CURSOR_MODE_SINCE:
+        queryset = queryset.order_by('modified', 'id')
+        if cursor:
+            queryset = queryset.filter(
+                Q_db(modified__gt=cursor['modified'])
+                | Q_db(modified=cursor['modified'], id__gt=cursor['id'])
+            )
+    else:
+        queryset = queryset.order_by('id')
+        if cursor:
+            queryset = queryset.filter(id__gt=cursor['id'])
+
+    rows = list(queryset.distinct().values_list('id', 'modified')[:page_size + 1])
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if rows:
+        last = opendata_encode_cursor(mode, *rows[-1])
+    elif cursor:
+        last = opendata_encode_cursor(mode, cursor['id'], cursor['modified'])
+    else:
+        last = None
+
+    return [x[0] for x in rows], {'next': last if has_next else None, 'last': last}
 
 
 def opendata_get_applications(ids: List[int]) -> List[dict]:
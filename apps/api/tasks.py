@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from apps.api.services import dump
+
+
+@shared_task
+def create_open_data_snapshots():
+    """Формирует ежедневные снимки всего реестра открытых данных."""
+    dump.create_snapshots()
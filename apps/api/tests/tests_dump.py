@@ -0,0 +1,50 @@
+from django.test import TestCase
+from unittest.mock import patch
+
+from apps.api.models import OpenData
+from apps.api.services import dump, payloads
+from apps.search.models import IpcAppList
+
+import gzip
+import json
+
+
+class DumpTestCase(TestCase):
+    """Тестирует вспомогательные функции выгрузки открытых данных."""
+
+    def test_iter_gzip(self):
+        """Тестирует сжатие потока данных."""
+        chunks = [b'{"id":1}\n', b'{"id":2}\n' * 1000]
+        self.assertEqual(gzip.decompress(b''.join(dump.iter_gzip(chunks))), b''.join(chunks))
+
+    def test_parse_range(self):
+        """Тестирует разбор заголовка Range."""
+        self.assertIsNone(dump.parse_range(None, 100))
+        self.assertIsNone(dump.parse_range('bytes=0-1,5-6', 100))
+        self.assertIsNone(dump.parse_range('items=0-1', 100))
+        self.assertEqual(dump.parse_range('bytes=10-19', 100), (10, 19))
+        self.assertEqual(dump.parse_range('bytes=10-', 100), (10, 99))
+        self.assertEqual(dump.parse_range('bytes=50-500', 100), (50, 99))
+        self.assertEqual(dump.parse_range('bytes=-30', 100), (70, 99))
+        with self.assertRaises(ValueError):
+            dump.parse_range('bytes=100-', 100)
+
+    @patch.object(dump, 'CHUNK_SIZE', 2)
+    def test_iter_lines(self):
+        """Тестирует чтение объектов частями (по id) с формированием отсутствующих данных."""
+        for pk in range(1, 6):
+            IpcAppList.objects.create(id=pk, id_shedule_type=3)
+            OpenData.objects.create(id=pk, app_id=pk, obj_state=2 if pk != 4 else 1)
+            OpenData.objects.filter(pk=pk).update(api_json=json.dumps({'id': pk}))
+        OpenData.objects.filter(pk=5).update(api_json=None)
+
+        with patch.object(payloads, 'render', side_effect=lambda app, data_format: json.dumps({'id': app['id']})):
+            with self.assertNumQueries(4):
+                chunks = list(dump.iter_lines({'obj_state': 2}, payloads.FULL))
+
+        # Части: (1, 2), (3, 5) и пустая; данные объекта 5 формируются отдельным запросом
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(
+            [json.loads(x)['id'] for x in b''.join(chunks).decode().splitlines()],
+            [1, 2, 3, 5]
+        )
@@ -0,0 +1,69 @@
+from django.test import TestCase
+
+from apps.api.models import OpenData
+from apps.api.serializers import OpenDataSerializerV1, OpenDataSerializerNacpV1
+from apps.api.services import payloads
+from apps.search.models import IpcAppList, ObjType
+
+from datetime import datetime
+import json
+
+
+class PayloadsTestCase(TestCase):
+    """Тестирует формирование готовых к выдаче данных объектов."""
+
+    app = {
+        'id': 1,
+        'obj_type_id': 1,
+        'obj_state': 2,
+        'app_number': 'a202001234',
+        'app_date': datetime(2020, 1, 2),
+        'registration_number': '123456',
+        'registration_date': datetime(2021, 3, 4),
+        'last_update': datetime(2021, 5, 6, 7, 8, 9),
+        'data': json.dumps({'I_54': [{'I_54.U': 'Спосіб'}]}),
+        'data_docs': json.dumps([]),
+        'data_payments': None,
+        'obj_type__obj_type_ua': 'Винаходи',
+        'files_path': '\\\\bear\\share\\1\\',
+    }
+
+    def test_render(self):
+        """Тестирует соответствие данных результату сериализаторов."""
+        self.assertEqual(json.loads(payloads.render(self.app, payloads.FULL)), OpenDataSerializerV1(self.app).data)
+        self.assertEqual(
+            json.loads(payloads.render(self.app, payloads.NACP)),
+            json.loads(json.dumps(OpenDataSerializerNacpV1(self.app).data))
+        )
+
+    def test_get_format(self):
+        """Тестирует определение формата по параметру biblio_format."""
+        self.assertEqual(payloads.get_format('nacp'), payloads.NACP)
+        self.assertEqual(payloads.get_format(None), payloads.FULL)
+        self.assertEqual(payloads.get_format('qwe'), payloads.FULL)
+
+    def test_save_resets_payloads(self):
+        """Готовые данные сбрасываются при сохранении записи и формируются повторно функцией update."""
+        ObjType.objects.create(id=1, obj_type_ua='Винаходи', obj_type_en='Inventions')
+        IpcAppList.objects.create(id=1, id_shedule_type=3)
+        record = OpenData.objects.create(app_id=1, data=self.app['data'], obj_state=2, obj_type_id=1)
+        OpenData.objects.filter(pk=record.pk).update(api_json='{}', api_json_nacp='{}')
+
+        record.refresh_from_db()
+        record.data = json.dumps({'I_54': [{'I_54.U': 'Пристрій'}]})
+        record.save(update_fields=['data'])
+        record.refresh_from_db()
+        self.assertIsNone(record.api_json)
+        self.assertIsNone(record.api_json_nacp)
+
+        modified = record.modified
+        payloads.update([record.pk])
+        record.refresh_from_db()
+        self.assertGreater(record.modified, modified)
+        self.assertIn('Пристрій', json.loads(record.api_json)['data']['I_54'][0]['I_54.U'])
+
+        # Сохранение готовых данных не сбрасывает их
+        record.api_json = '{"id": 1}'
+        record.save(update_fields=['api_json'])
+        record.refresh_from_db()
+        self.assertEqual(record.api_json, '{"id": 1}')
@@ -3,9 +3,11 @@ from unittest.mock import patch
 
 from rest_framework import exceptions
 
+from apps.api.models import OpenData
 from apps.api.services import services
+from apps.search.models import IpcAppList
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 
 class ApiServicesTestCase(TestCase):
@@ -77,3 +79,93 @@ class ApiServicesTestCase(TestCase):
         input_data = {'app_number': 'm202300001'}
         output_data = services.opendata_prepare_filters(input_data)
         self.assertEqual(output_data['app_number'], 'm202300001')
+
+    def test_opendata_cursor(self):
+        """Тестирует кодирование и декодирование курсора постраничной выдачи."""
+        cursor = services.opendata_encode_cursor(services.CURSOR_MODE_ID, 10)
+        self.assertEqual(
+            services.opendata_decode_cursor(cursor),
+            {'mode': services.CURSOR_MODE_ID, 'id': 10, 'modified': None}
+        )
+
+        modified = datetime(2023, 3, 21, 10, 15, 30, 123000)
+        cursor = services.opendata_encode_cursor(services.CURSOR_MODE_SINCE, 10, modified)
+        self.assertEqual(
+            services.opendata_decode_cursor(cursor),
+            {'mode': services.CURSOR_MODE_SINCE, 'id': 10, 'modified': modified}
+        )
+
+        for value in ('qwe', 'eyJtIjoicXdlIiwiaWQiOjF9'):
+            with self.assertRaisesRegex(exceptions.ParseError, 'Невірне значення параметру cursor'):
+                services.opendata_decode_cursor(value)
+
+
+class KeysetPageTestCase(TestCase):
+    """Тестирует постраничную выдачу по курсору (opendata_get_keyset_page)."""
+
+    def setUp(self):
+        self.modified = datetime(2023, 3, 21, 10, 0, 0)
+        # Записи 1, 2 изменены одновременно, запись 3 - раньше, запись 4 - позже
+        for pk, minutes in ((1, 0), (2, 0), (3, -10), (4, 10)):
+            IpcAppList.objects.create(id=pk, id_shedule_type=3)
+            OpenData.objects.create(id=pk, app_id=pk, obj_state=2 if pk % 2 else 1)
+            OpenData.objects.filter(pk=pk).update(modified=self.modified + timedelta(minutes=minutes))
+
+    def get_all(self, filters: dict, mode: str, cursor: dict = None, page_size: int = 2) -> list:
+        """Возвращает id всех объектов, проходя по страницам по курсору next."""
+        res = []
+        while True:
+            ids, cursors = services.opendata_get_keyset_page(filters, mode, cursor, page_size)
+            res.extend(ids)
+            if not cursors['next']:
+                return res
+            cursor = services.opendata_decode_cursor(cursors['next'])
+
+    def test_id_mode(self):
+        """Тестирует выдачу по id."""
+        ids, cursors = services.opendata_get_keyset_page({}, services.CURSOR_MODE_ID, None, 3)
+        self.assertEqual(ids, [1, 2, 3])
+        self.assertEqual(cursors['next'], cursors['last'])
+        self.assertEqual(services.opendata_decode_cursor(cursors['next'])['id'], 3)
+
+        ids, cursors = services.opendata_get_keyset_page(
+            {}, services.CURSOR_MODE_ID, services.opendata_decode_cursor(cursors['next']), 3
+        )
+        self.assertEqual(ids, [4])
+        self.assertIsNone(cursors['next'])
+
+        self.assertEqual(self.get_all({}, services.CURSOR_MODE_ID, page_size=1), [1, 2, 3, 4])
+        self.assertEqual(self.get_all({'obj_state': 1}, services.CURSOR_MODE_ID), [2, 4])
+
+    def test_since_mode(self):
+        """Тестирует выдачу по дате изменения записи (в том числе записей с одинаковой датой)."""
+        self.assertEqual(self.get_all({}, services.CURSOR_MODE_SINCE, page_size=1), [3, 1, 2, 4])
+
+        ids, cursors = services.opendata_get_keyset_page({}, services.CURSOR_MODE_SINCE, None, 2)
+        self.assertEqual(ids, [3, 1])
+        cursor = services.opendata_decode_cursor(cursors['last'])
+        self.assertEqual((cursor['id'], cursor['modified']), (1, self.modified))
+
+        # Следующая страница начинается с записи с той же датой изменения
+        ids, cursors = services.opendata_get_keyset_page({}, services.CURSOR_MODE_SINCE, cursor, 10)
+        self.assertEqual(ids, [2, 4])
+        self.assertIsNone(cursors['next'])
+        last = services.opendata_decode_cursor(cursors['last'])
+
+        # Изменений нет - курсор остаётся прежним
+        ids, cursors = services.opendata_get_keyset_page({}, services.CURSOR_MODE_SINCE, last, 10)
+        self.assertEqual(ids, [])
+        self.assertEqual(services.opendata_decode_cursor(cursors['last']), last)
+
+        # Изменённая запись выдаётся повторно
+        record = OpenData.objects.get(pk=3)
+        record.data = '{}'
+        record.save()
+        ids, cursors = services.opendata_get_keyset_page({}, services.CURSOR_MODE_SINCE, last, 10)
+        self.assertEqual(ids, [3])
+
+    def test_empty(self):
+        """Тестирует выдачу без объектов."""
+        ids, cursors = services.opendata_get_keyset_page({'obj_type': 100}, services.CURSOR_MODE_SINCE, None, 10)
+        self.assertEqual(ids, [])
+        self.assertEqual(cursors, {'next': None, 'last': None})
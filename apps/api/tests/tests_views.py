@@ -0,0 +1,69 @@
+from django.test import TestCase, RequestFactory
+from django.utils.cache import get_conditional_response
+from unittest import mock
+
+from apps.api.models import OpenData
+from apps.api.services import payloads
+from apps.api.views import get_conditional_headers
+from apps.search.models import IpcAppList, ObjType
+
+from datetime import datetime
+import json
+
+
+class ConditionalHeadersTestCase(TestCase):
+    """Тестирует условные запросы к данным объекта."""
+
+    def test_etag(self):
+        """Тестирует изменение ETag при изменении записи."""
+        record = {'id': 1, 'modified': datetime(2023, 3, 21, 10, 15, 30)}
+        headers = get_conditional_headers('opendata', record)
+        self.assertEqual(headers, get_conditional_headers('opendata', dict(record)))
+        self.assertNotEqual(
+            headers['etag'],
+            get_conditional_headers('opendata', {'id': 1, 'modified': datetime(2023, 3, 21, 10, 15, 30, 1)})['etag']
+        )
+        self.assertNotEqual(headers['etag'], get_conditional_headers('opendata-docs', record)['etag'])
+        self.assertIsNone(get_conditional_headers('opendata', {'id': 1, 'modified': None})['last_modified'])
+
+    def test_not_modified(self):
+        """Тестирует ответ 304 при совпадении ETag."""
+        headers = get_conditional_headers('opendata', {'id': 1, 'modified': datetime(2023, 3, 21)})
+        request = RequestFactory().get('/', HTTP_IF_NONE_MATCH=headers['etag'])
+        self.assertEqual(get_conditional_response(request, **headers).status_code, 304)
+        request = RequestFactory().get('/', HTTP_IF_NONE_MATCH='"opendata-1-0"')
+        self.assertIsNone(get_conditional_response(request, **headers))
+
+    def test_detail_view(self):
+        """Тестирует изменение ETag при изменении данных объекта без изменения даты last_update."""
+        ObjType.objects.create(id=1, obj_type_ua='Винаходи', obj_type_en='Inventions')
+        IpcAppList.objects.create(id=1, id_shedule_type=3)
+        record = OpenData.objects.create(
+            app_id=1,
+            obj_type_id=1,
+            app_number='a202001234',
+            last_update=datetime(2023, 3, 21),
+            data=json.dumps({'I_54': [{'I_54.U': 'Спосіб'}]}),
+            files_path='\\\\bear\\share\\1\\',
+        )
+        url = '/api/v1/open-data/a202001234/'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # Данные объекта не формируются, если у клиента актуальные данные
+        self.assertIsNone(OpenData.objects.get(pk=record.pk).api_json)
+        with mock.patch.object(payloads, 'render') as render:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(
+                self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+            )
+        render.assert_not_called()
+
+        record.data = json.dumps({'I_54': [{'I_54.U': 'Пристрій'}]})
+        record.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)['data']['I_54'][0]['I_54.U'], 'Пристрій')
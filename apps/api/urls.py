@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import (OpenDataListView, OpenDataListViewV1, OpenDataDetailViewV1, OpenDataDocsView, SearchListView,
-                    json_schema)
+                    json_schema, open_data_dump, open_data_snapshot)
 
 app_name = 'api'
 urlpatterns = [
@@ -11,6 +11,8 @@ urlpatterns = [
 
     path('v1/open-data/', OpenDataListViewV1.as_view()),
     path('v1/open-data/search/', SearchListView.as_view()),
+    path('v1/open-data/dump/', open_data_dump),
+    path('v1/open-data/dump/snapshot/', open_data_snapshot),
     path('v1/open-data/<path:app_number>/', OpenDataDetailViewV1.as_view()),
     path('v1/open-data/documents/<path:app_number>/', OpenDataDocsView.as_view()),
 
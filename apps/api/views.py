@@ -1,16 +1,40 @@
-from django.http import Http404, JsonResponse
+from django.http import Http404, JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse
 from django.conf import settings
 from django.views.decorators.cache import cache_page
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
 from rest_framework import generics, exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from .serializers import OpenDataSerializer, OpenDataSerializerV1, OpenDataSerializerNacpV1, OpenDataDocsSerializer
 from .models import OpenData
 from apps.search.models import ObjType
-from apps.api.services import services
+from apps.api.services import services, payloads, dump
 import datetime
 import os
 import json
 
 
+def get_conditional_headers(prefix: str, record: dict) -> dict:
+    """Возвращает значения ETag и Last-Modified для данных объекта (по id и дате изменения записи,
+    которая обновляется при каждом изменении данных, в том числе готовых к выдаче данных)."""
+    modified = record['modified']
+    version = f"{modified:%Y%m%d%H%M%S%f}" if modified else '0'
+    return {
+        'etag': f'"{prefix}-{record["id"]}-{version}"',
+        'last_modified': int(modified.timestamp()) if modified else None,
+    }
+
+
+def set_conditional_headers(response, headers: dict):
+    response['ETag'] = headers['etag']
+    if headers['last_modified'] is not None:
+        response['Last-Modified'] = http_date(headers['last_modified'])
+    return response
+
+
 class OpenDataListView(generics.ListAPIView):
     serializer_class = OpenDataSerializer
 
@@ -74,13 +98,55 @@ class OpenDataListViewV1(generics.ListAPIView):
     def get(self, *args, **kwargs):
         return super().get(*args, **kwargs)
 
+    def get_results_response(self, envelope: dict, ids: list):
+        """Возвращает ответ со списком данных объектов (results) и данными пагинации (envelope)."""
+        fragments = payloads.get_fragments(ids, payloads.get_format(self.request.GET.get('biblio_format')))
+
+        # Сохранённые данные объектов вставляются в ответ без разбора JSON
+        if isinstance(self.request.accepted_renderer, JSONRenderer):
+            body = JSONRenderer().render(envelope)
+            return HttpResponse(
+                b''.join([body[:-1], b',"results":[', ','.join(fragments).encode('utf-8'), b']}']),
+                content_type='application/json'
+            )
+
+        return Response({**envelope, 'results': [json.loads(x) for x in fragments]})
+
+    def list_by_cursor(self, request):
+        """Постраничная выдача по курсору (без OFFSET и COUNT).
+        pagination=cursor - объекты упорядочены по id,
+        pagination=since - объекты упорядочены по (modified, id); курсор cursor последней страницы
+        при следующей синхронизации позволяет получить только изменённые и новые объекты."""
+        cursor = None
+        mode = request.query_params.get('pagination')
+        if request.query_params.get('cursor'):
+            cursor = services.opendata_decode_cursor(request.query_params['cursor'])
+            mode = cursor['mode']
+
+        ids, cursors = services.opendata_get_keyset_page(
+            services.opendata_prepare_filters(request.query_params),
+            mode,
+            cursor,
+            getattr(settings, 'OPEN_DATA_CURSOR_PAGE_SIZE', 100)
+        )
+
+        next_url = None
+        if cursors['next']:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', cursors['next'])
+        return self.get_results_response({'next': next_url, 'cursor': cursors['last']}, ids)
+
     def list(self, request, *args, **kwargs):
+        if request.query_params.get('cursor') \
+                or request.query_params.get('pagination') in (services.CURSOR_MODE_ID, services.CURSOR_MODE_SINCE):
+            return self.list_by_cursor(request)
+
         queryset = self.filter_queryset(self.get_queryset())
 
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.get_serializer(services.opendata_get_applications(page), many=True)
-            return self.get_paginated_response(serializer.data)
+            envelope = self.get_paginated_response([]).data
+            del envelope['results']
+            return self.get_results_response(envelope, list(page))
 
     def get_queryset(self):
         filters = services.opendata_prepare_filters(self.request.query_params)
@@ -107,7 +173,7 @@ class OpenDataDetailViewV1(generics.RetrieveAPIView):
         return queryset
 
     def get_object(self):
-        qs = self.get_queryset().filter(app_number=self.kwargs['app_number']).values(
+        obj = self.get_queryset().filter(app_number=self.kwargs['app_number']).values(
             'id',
             'obj_type_id',
             'obj_state',
@@ -121,11 +187,32 @@ class OpenDataDetailViewV1(generics.RetrieveAPIView):
             'data_payments',
             'obj_type__obj_type_ua',
             'files_path',
-        )
-
-        if qs.count() > 0:
-            return qs.first()
-        raise Http404
+            'api_json',
+            'modified',
+        ).first()
+
+        if obj is None:
+            raise Http404
+        return obj
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+
+        # Если у клиента актуальные данные, то они не формируются
+        headers = get_conditional_headers('opendata', instance)
+        response = get_conditional_response(request, **headers)
+        if response is not None:
+            return response
+
+        # Данные объекта отдаются без разбора JSON (если они ещё не сформированы, то формируются без сохранения)
+        if isinstance(request.accepted_renderer, JSONRenderer):
+            content = instance['api_json']
+            if content is None:
+                content = payloads.render(instance, payloads.FULL)
+            response = HttpResponse(content, content_type='application/json')
+        else:
+            response = Response(self.get_serializer(instance).data)
+        return set_conditional_headers(response, headers)
 
     def get(self, *args, **kwargs):
         return super().get(*args, **kwargs)
@@ -147,15 +234,37 @@ class OpenDataDocsView(generics.RetrieveAPIView):
                 raise Http404
 
         return queryset.values(
+            'id',
+            'last_update',
             'data_docs',
+            'modified',
         )
 
     def get_object(self):
-        qs = self.get_queryset().filter(app_number=self.kwargs['app_number'])
-
-        if qs.count() > 0:
-            return qs.first()
-        raise Http404
+        obj = self.get_queryset().filter(app_number=self.kwargs['app_number']).first()
+
+        if obj is None:
+            raise Http404
+        return obj
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+
+        # Если у клиента актуальные данные, то они не формируются
+        headers = get_conditional_headers('opendata-docs', instance)
+        response = get_conditional_response(request, **headers)
+        if response is not None:
+            return response
+
+        # Документы вставляются в ответ без разбора JSON
+        if instance['data_docs'] is not None and isinstance(request.accepted_renderer, JSONRenderer):
+            response = HttpResponse(
+                b''.join([b'{"documents":', instance['data_docs'].encode('utf-8'), b'}']),
+                content_type='application/json'
+            )
+        else:
+            response = Response(self.get_serializer(instance).data)
+        return set_conditional_headers(response, headers)
 
     def get(self, *args, **kwargs):
         return super().get(*args, **kwargs)
@@ -224,3 +333,75 @@ def json_schema(request, obj_type: str):
     except FileNotFoundError:
         raise Http404
     return JsonResponse(schema)
+
+
+@require_safe
+def open_data_dump(request):
+    """Выгрузка открытых данных (с применением фильтров API) в формате NDJSON, сжатом gzip."""
+    try:
+        filters = services.opendata_prepare_filters(request.GET)
+    except exceptions.ParseError as e:
+        return JsonResponse({'detail': e.detail}, status=400)
+    data_format = payloads.get_format(request.GET.get('biblio_format'))
+    response = StreamingHttpResponse(
+        dump.iter_gzip(dump.iter_lines(filters, data_format)),
+        content_type='application/gzip'
+    )
+    response['Content-Disposition'] = f'attachment; filename="open-data-{data_format}.ndjson.gz"'
+    return response
+
+
+def _read_file_range(file_path: str, start: int, length: int, block_size: int = 64 * 1024):
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(block_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+@require_safe
+def open_data_snapshot(request):
+    """Отдаёт ежедневный снимок всего реестра открытых данных (поддерживаются ETag, Last-Modified, Range)."""
+    file_path = dump.get_snapshot_path(payloads.get_format(request.GET.get('biblio_format')))
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        raise Http404
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    # Диапазон учитывается, только если снимок не изменился (If-Range)
+    byte_range = None
+    if request.headers.get('If-Range') in (None, etag):
+        try:
+            byte_range = dump.parse_range(request.headers.get('Range'), stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{stat.st_size}"
+            return response
+
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_file_range(file_path, start, end - start + 1),
+            status=206,
+            content_type='application/gzip'
+        )
+        response['Content-Range'] = f"bytes {start}-{end}/{stat.st_size}"
+        response['Content-Length'] = end - start + 1
+    else:
+        response = FileResponse(open(file_path, 'rb'), content_type='application/gzip')
+        response['Content-Length'] = stat.st_size
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
+    return response
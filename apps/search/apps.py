@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SearchConfig(AppConfig):
     name = 'apps.search'
     verbose_name = 'Пошук'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -3,20 +3,24 @@ from django.conf import settings
 import requests
 
 
+def recaptcha_is_valid(request):
+    """Проверяет токен reCAPTCHA из параметров запроса."""
+    try:
+        data = {
+            'response': request.GET['token'],
+            'secret': settings.RECAPTCHA_SECRET_KEY
+        }
+    except KeyError:
+        return False
+    resp = requests.post('https://www.google.com/recaptcha/api/siteverify', data=data, verify=settings.SSL_CERT_FILE)
+    result_json = resp.json()
+    return bool(result_json.get('success')) and (result_json.get('score') or 0) >= settings.RECAPTCHA_MIN_SCORE
+
+
 def check_recaptcha(view_func):
     def wrap(request, *args, **kwargs):
-        if settings.RECAPTCHA_ENABLED:
-            try:
-                data = {
-                    'response': request.GET['token'],
-                    'secret': settings.RECAPTCHA_SECRET_KEY
-                }
-            except KeyError:
-                return HttpResponseBadRequest()
-            resp = requests.post('https://www.google.com/recaptcha/api/siteverify', data=data, verify=settings.SSL_CERT_FILE)
-            result_json = resp.json()
-            if not result_json.get('success') or result_json.get('score') < settings.RECAPTCHA_MIN_SCORE:
-                return HttpResponseBadRequest()
+        if settings.RECAPTCHA_ENABLED and not recaptcha_is_valid(request):
+            return HttpResponseBadRequest()
         return view_func(request, *args, **kwargs)
 
     wrap.__doc__ = view_func.__doc__
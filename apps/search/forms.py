@@ -1,11 +1,9 @@
 from django import forms
-from django.conf import settings
 from django.forms import formset_factory
 from django.utils.translation import gettext as _
-from elasticsearch import Elasticsearch
-from elasticsearch_dsl import Q, Index
-from .models import SimpleSearchField, InidCodeSchedule, ObjType, IpcCode
-from .utils import prepare_query, get_transactions_types
+from .models import SimpleSearchField, ObjType, IpcCode
+from .utils import get_transactions_types
+from .services import query_compiler, query_validator
 from datetime import datetime
 
 
@@ -14,21 +12,6 @@ def get_param_type_choices():
     return [(x.pk, x.field_label_ua) for x in SimpleSearchField.objects.filter(is_visible=True)]
 
 
-def validate_query_elasticsearch(query, field):
-    """Отправляет запрос на валидацию в ElasticSearch."""
-    query = prepare_query(query, field)
-    client = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
-    i = Index(settings.ELASTIC_INDEX_NAME, using=client).validate_query(body={
-        'query': Q(
-            'query_string',
-            query=query,
-            default_field=field.field_name,
-            default_operator='AND'
-        ).to_dict()
-    })
-    return i['valid']
-
-
 def get_search_form(search_type, get_params):
     """Валидация поискового запроса."""
     # Подготовка данных
@@ -67,9 +50,9 @@ class SimpleSearchForm(forms.Form):
         param = cleaned_data.get('param_type')
         query = cleaned_data.get('value')
         if param and query:
-            elastic_field = SimpleSearchField.objects.get(pk=param).elastic_index_field
+            elastic_field = query_compiler.get_simple_search_field(param)
 
-            if not elastic_field or not validate_query_elasticsearch(query, elastic_field):
+            if not elastic_field or not query_validator.validate_field_query(query, elastic_field):
                 raise forms.ValidationError(
                     "Невірний запит"
                 )
@@ -104,15 +87,9 @@ class AdvancedSearchForm(forms.Form):
         query = cleaned_data.get('value')
 
         if param and query:
-            inid_code_schedule = InidCodeSchedule.objects.filter(
-                ipc_code=param,
-                enable_search=1,
-                elastic_index_field__isnull=False
-            ).first()
-            if inid_code_schedule:
-                elastic_field = inid_code_schedule.elastic_index_field
-
-            if not inid_code_schedule or not elastic_field or not validate_query_elasticsearch(query, elastic_field):
+            elastic_field = query_compiler.get_advanced_search_field(param)
+
+            if not elastic_field or not query_validator.validate_field_query(query, elastic_field):
                 raise forms.ValidationError(
                     "Невірний запит"
                 )
@@ -132,41 +109,19 @@ class QueryForm(forms.Form):
         param = cleaned_data.get("param")
         query = self.data['query']
         search_type = cleaned_data.get("search_type")
+        if param is None or not search_type:
+            return cleaned_data
 
         if search_type == 'simple':
-            try:
-                elastic_field = SimpleSearchField.objects.get(pk=param).elastic_index_field
-                query = prepare_simple_query(query, elastic_field.field_type)
-            except SimpleSearchField.DoesNotExist:
-                raise forms.ValidationError(
-                    "Невірний параметр запиту"
-                )
+            elastic_field = query_compiler.get_simple_search_field(param)
         else:
-            inid_code = InidCodeSchedule.objects.filter(
-                ipc_code=param,
-                enable_search=1,
-                elastic_index_field__isnull=False
-            ).first()
-            if inid_code:
-                elastic_field = inid_code.elastic_index_field
-                query = prepare_advanced_query(query, elastic_field.field_type)
-            else:
-                raise forms.ValidationError(
-                    "Невірний параметр запиту"
-                )
+            elastic_field = query_compiler.get_advanced_search_field(param)
+        if not elastic_field:
+            raise forms.ValidationError(
+                "Невірний параметр запиту"
+            )
 
-        # Валидация запроса в ElasticSearch
-        client = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
-        i = Index(settings.ELASTIC_INDEX_NAME, using=client).validate_query(body={
-            'query': Q(
-                'query_string',
-                query=query,
-                default_field=elastic_field.field_name,
-                default_operator='AND'
-            ).to_dict()
-        })
-
-        if not i['valid']:
+        if not query_validator.validate_field_query(query, elastic_field):
             raise forms.ValidationError(
                 "Невірний запит"
             )
@@ -1,25 +1,36 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from django.db import connections
-from django.db.models import Max, Q as Q_db
+from django.db.models import Max, F, Q as Q_db
 from django.utils import timezone
-from elasticsearch import Elasticsearch, exceptions as elasticsearch_exceptions
+from elasticsearch import Elasticsearch, exceptions as elasticsearch_exceptions, helpers as elasticsearch_helpers
 from elasticsearch_dsl import Search, Q
 from apps.search.models import IpcAppList, IndexationError, IndexationProcess
-from apps.search.services import services as search_services
+from apps.search.services import services as search_services, results_cache, thumbnails, derived_fields
 from apps.bulletin.models import EBulletinData, ClListOfficialBulletinsIp
-from ...utils import get_registration_status_color, filter_bad_apps
+from ...utils import get_registration_status_color, filter_bad_apps, get_tm_image_path
+from uma.utils import read_json_file
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import json
 import os
 import datetime
 import shutil
 import re
+import math
+import multiprocessing
 
 
 class Command(BaseCommand):
     help = 'Adds or updates documents in ElasticSearch index.'
     es = None
     indexation_process = None
+    change_journal_name = 'elasticsearch'
+    bulk = False
+    bulk_chunk_size = None
+    bulk_max_chunk_bytes = None
+    bulk_buffer = None
+    json_decode_time = 0
+    slowest_json = (None, 0)
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -49,6 +60,34 @@ class Command(BaseCommand):
             type=bool,
             help='Ignores elasticindexed=1'
         )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Writes documents to the index in chunks using the bulk API'
+        )
+        parser.add_argument(
+            '--chunk_size',
+            type=int,
+            default=getattr(settings, 'ELASTIC_BULK_CHUNK_SIZE', 500),
+            help='Number of documents in one bulk chunk (used with --bulk)'
+        )
+        parser.add_argument(
+            '--max_chunk_bytes',
+            type=int,
+            default=getattr(settings, 'ELASTIC_BULK_MAX_CHUNK_BYTES', 100 * 1024 * 1024),
+            help='Maximum size of one bulk request in bytes (used with --bulk)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of worker processes. Documents are split into id ranges per object type'
+        )
+        parser.add_argument(
+            '--changes',
+            action='store_true',
+            help='Index only records changed (LastUpdate) since the previous run with this flag'
+        )
 
     def get_doc_files_path(self, doc):
         # Путь к файлам объекта
@@ -94,37 +133,16 @@ class Command(BaseCommand):
 
         # Чтение содержимого JSON в data
         try:
-            f = open(json_path, 'r', encoding='utf16')
-            try:
-                file_content = str.encode(f.read())
-                file_content = file_content.replace(b'\xef\xbb\xbf', b'')
-                data = json.loads(file_content)
-            except json.decoder.JSONDecodeError as e:
-                self.stdout.write(self.style.ERROR(f"JSONDecodeError: {e}: {json_path}"))
-                IndexationError.objects.create(
-                    app_id=doc['id'],
-                    type='JSONDecodeError',
-                    text=e,
-                    json_path=json_path,
-                    indexation_process=self.indexation_process
-                )
-        except (UnicodeDecodeError, UnicodeError):            
-            try:
-                f = open(json_path, 'r', encoding='utf-8')
-                data = json.loads(f.read())
-            except json.decoder.JSONDecodeError as e:
-                try:
-                    f = open(json_path, 'r', encoding='utf-8-sig')
-                    data = json.loads(f.read())
-                except json.decoder.JSONDecodeError as e:
-                    self.stdout.write(self.style.ERROR(f"JSONDecodeError: {e}: {json_path}"))
-                    IndexationError.objects.create(
-                        app_id=doc['id'],
-                        type='JSONDecodeError',
-                        text=e,
-                        json_path=json_path,
-                        indexation_process=self.indexation_process
-                    )
+            data, decode_time = read_json_file(json_path)
+        except (json.decoder.JSONDecodeError, UnicodeDecodeError) as e:
+            self.stdout.write(self.style.ERROR(f"JSONDecodeError: {e}: {json_path}"))
+            IndexationError.objects.create(
+                app_id=doc['id'],
+                type='JSONDecodeError',
+                text=e,
+                json_path=json_path,
+                indexation_process=self.indexation_process
+            )
         except FileNotFoundError as e:
             self.stdout.write(self.style.ERROR(f"FileNotFoundError: {e}"))
             IndexationError.objects.create(
@@ -134,6 +152,10 @@ class Command(BaseCommand):
                 json_path=json_path,
                 indexation_process=self.indexation_process
             )
+        else:
+            self.json_decode_time += decode_time
+            if decode_time > self.slowest_json[1]:
+                self.slowest_json = (json_path, decode_time)
 
         return data
 
@@ -489,6 +511,9 @@ class Command(BaseCommand):
                 # Исправляет название файла на диске, если оно отлично от номера свидетельства или заявки
                 self._fix_tm_image(doc, res)
 
+            # Уменьшенные копии изображения
+            self.generate_thumbnails(res)
+
             # Запись в индекс
             self.write_to_es_index(doc, res)
 
@@ -749,14 +774,20 @@ class Command(BaseCommand):
                 '''Если это "Міжнародна реєстрація торговельної марки, що зареєстрована в Україні", которая появляется
                 позже чем "Міжнародна реєстрація торговельної марки з поширенням на територію України" с тем же номером,
                 то необхожимо обновить 450-й код у "Міжнародна реєстрація торговельної марки з поширенням на територію України"'''
-                q = Q(
-                    'bool',
-                    must=[
-                        Q('match', Document__idObjType=9),
-                        Q('match', search_data__protective_doc_number=doc['registration_number']),
-                    ],
-                )
-                s = Search(index=settings.ELASTIC_INDEX_NAME).using(self.es).query(q).execute()
+                buffered = self._get_buffered_body(9, doc['registration_number'])
+                if buffered:
+                    # Документ ещё не записан в индекс (ожидает отправки в пакете)
+                    buffered['MadridTradeMark']['TradeMarkDetails']['ENN'] = data['MadridTradeMark']['TradeMarkDetails']['ENN']
+                    s = None
+                else:
+                    q = Q(
+                        'bool',
+                        must=[
+                            Q('match', Document__idObjType=9),
+                            Q('match', search_data__protective_doc_number=doc['registration_number']),
+                        ],
+                    )
+                    s = Search(index=settings.ELASTIC_INDEX_NAME).using(self.es).query(q).execute()
                 if s:
                     hit = s[0].to_dict()
                     hit['MadridTradeMark']['TradeMarkDetails']['ENN'] = data['MadridTradeMark']['TradeMarkDetails']['ENN']
@@ -769,17 +800,24 @@ class Command(BaseCommand):
                 '''Если это "Міжнародна реєстрація торговельної марки з поширенням на територію України", 
                 то надо проверить есть ли аналогичная "Міжнародна реєстрація торговельної марки, що зареєстрована в Україні"
                 и взять у неё 450 код.'''
-                q = Q(
-                    'bool',
-                    must=[
-                        Q('match', Document__idObjType=14),
-                        Q('match', search_data__protective_doc_number=doc['registration_number']),
-                    ],
-                )
-                s = Search(index=settings.ELASTIC_INDEX_NAME).using(self.es).query(q).execute()
-                if s:
-                    hit = s[0].to_dict()
-                    data['MadridTradeMark']['TradeMarkDetails']['ENN'] = hit['MadridTradeMark']['TradeMarkDetails']['ENN']
+                buffered = self._get_buffered_body(14, doc['registration_number'])
+                if buffered:
+                    data['MadridTradeMark']['TradeMarkDetails']['ENN'] = buffered['MadridTradeMark']['TradeMarkDetails']['ENN']
+                else:
+                    q = Q(
+                        'bool',
+                        must=[
+                            Q('match', Document__idObjType=14),
+                            Q('match', search_data__protective_doc_number=doc['registration_number']),
+                        ],
+                    )
+                    s = Search(index=settings.ELASTIC_INDEX_NAME).using(self.es).query(q).execute()
+                    if s:
+                        hit = s[0].to_dict()
+                        data['MadridTradeMark']['TradeMarkDetails']['ENN'] = hit['MadridTradeMark']['TradeMarkDetails']['ENN']
+
+            # Уменьшенные копии изображения
+            self.generate_thumbnails(data)
 
             # Запись в индекс
             self.write_to_es_index(doc, data)
@@ -863,8 +901,28 @@ class Command(BaseCommand):
         censored_image_path = os.path.join(settings.BASE_DIR, 'assets', 'img', 'censored.jpg')
         shutil.copyfile(censored_image_path, image_json_path)
 
+    def generate_thumbnails(self, body):
+        """Формирует уменьшенные копии изображения ТМ, если включена настройка THUMBNAILS_GENERATE_ON_INDEX."""
+        if not getattr(settings, 'THUMBNAILS_GENERATE_ON_INDEX', False):
+            return
+        try:
+            img_path = get_tm_image_path(body)
+        except (KeyError, IndexError, TypeError):
+            return
+        thumbnails.generate(img_path)
+
     def write_to_es_index(self, doc, body):
         """Записывает в индекс ES."""
+        # Производные поля (общие для всех process_* методов)
+        derived_fields.set_derived_fields(body)
+        # Идентификатор заявки для однозначной сортировки результатов поиска (см. add_sort_tiebreaker)
+        body['search_data']['app_id'] = doc['id']
+
+        if self.bulk:
+            # Документ будет отправлен в индекс вместе с остальными документами пакета
+            self.bulk_buffer.append((doc, body))
+            return
+
         try:
             self.es.index(index=settings.ELASTIC_INDEX_NAME, doc_type='_doc', id=doc['id'], body=body,
                           request_timeout=30)
@@ -895,6 +953,71 @@ class Command(BaseCommand):
                 last_indexation_date=timezone.now()
             )
 
+    def _get_buffered_body(self, obj_type_id, registration_number):
+        """Возвращает данные документа, который ещё не отправлен в индекс в пакетном режиме."""
+        if not self.bulk:
+            return None
+        for doc, body in self.bulk_buffer:
+            if doc['obj_type_id'] == obj_type_id and doc['registration_number'] == registration_number:
+                return body
+        return None
+
+    def flush_bulk_buffer(self):
+        """Отправляет накопленные документы в индекс ES одним пакетом (bulk API)."""
+        if not self.bulk_buffer:
+            return
+
+        docs = {str(doc['id']): doc for doc, _ in self.bulk_buffer}
+        actions = (
+            {
+                '_index': settings.ELASTIC_INDEX_NAME,
+                '_type': '_doc',
+                '_id': doc['id'],
+                '_source': body,
+            } for doc, body in self.bulk_buffer
+        )
+
+        indexed_ids = []
+        errors = []
+        for ok, item in elasticsearch_helpers.streaming_bulk(
+                self.es,
+                actions,
+                chunk_size=self.bulk_chunk_size,
+                max_chunk_bytes=self.bulk_max_chunk_bytes,
+                raise_on_error=False,
+                raise_on_exception=False,
+                request_timeout=30
+        ):
+            result = item['index']
+            doc = docs[str(result['_id'])]
+            if ok:
+                indexed_ids.append(doc['id'])
+            else:
+                json_path = self.get_json_path(doc)
+                error = result.get('error') or result.get('exception')
+                self.stdout.write(self.style.ERROR(f"ElasticSearch BulkError: {error}: {json_path}"))
+                errors.append(
+                    IndexationError(
+                        app_id=doc['id'],
+                        type='ElasticSearch BulkError',
+                        text=error,
+                        json_path=json_path,
+                        indexation_process=self.indexation_process
+                    )
+                )
+
+        if errors:
+            IndexationError.objects.bulk_create(errors)
+
+        # Пометка в БД что документы пакета проиндексированы и обновление времени индексации
+        if indexed_ids:
+            IpcAppList.objects.filter(id__in=indexed_ids).update(
+                elasticindexed=1,
+                last_indexation_date=timezone.now()
+            )
+
+        self.bulk_buffer = []
+
     def fill_notification_date(self):
         """Заполняет поле NotificationDate в таблице IPC_AppList."""
         app_list = IpcAppList.objects.filter(obj_type__id__in=(1, 2))
@@ -917,11 +1040,8 @@ class Command(BaseCommand):
             ids.append(res.meta.id)
         IpcAppList.objects.filter(id__in=ids).update(notification_date=registration_date__max)
 
-    def handle(self, *args, **options):
-        # Инициализация клиента ElasticSearch
-        self.es = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
-
-        # Получение документов для индексации
+    def get_documents(self, options):
+        """Возвращает список документов для индексации с учётом параметров командной строки."""
         documents = IpcAppList.objects.exclude(
             Q_db(registration_date__gte=timezone.now()) | Q_db(app_number__in=['m202006737', 'm202006738'])
         ).values(
@@ -935,7 +1055,14 @@ class Command(BaseCommand):
             'app_input_date',
         )
         # Фильтрация по параметрам командной строки
-        if not options['ignore_indexed']:
+        if options.get('changes_range'):
+            # Записи, изменённые после предыдущего запуска (журнал изменений), а также записи,
+            # которые не удалось проиндексировать ранее (контрольная точка журнала уже сдвинута за них)
+            changes_q = search_services.change_journal_q(*options['changes_range'])
+            if not options['ignore_indexed']:
+                changes_q |= Q_db(elasticindexed=0)
+            documents = documents.filter(changes_q)
+        elif not options['ignore_indexed']:
             documents = documents.filter(elasticindexed=0)
         if options['id']:
             documents = documents.filter(id=options['id'])
@@ -947,37 +1074,73 @@ class Command(BaseCommand):
                 documents = documents.filter(registration_number__isnull=True)
             elif status == 2:
                 documents = documents.exclude(registration_number__isnull=True)
+        return documents
 
-        # Создание процесса индексации в БД
-        self.indexation_process = IndexationProcess.objects.create(
-            begin_date=timezone.now(),
-            not_indexed_count=documents.count()
+    def init_indexation(self, options, indexation_process):
+        """Инициализирует клиент ES, параметры пакетной записи и процесс индексации."""
+        self.es = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
+        self.bulk = options['bulk']
+        self.bulk_chunk_size = options['chunk_size']
+        self.bulk_max_chunk_bytes = options['max_chunk_bytes']
+        self.bulk_buffer = []
+        self.indexation_process = indexation_process
+
+    def process_document(self, doc):
+        """Обрабатывает документ в зависимости от его типа."""
+        # Изобретения, полезные модели, топографии интегральных микросхем
+        if doc['obj_type_id'] in (1, 2, 3):
+            self.process_inv_um_ld(doc)
+        # Знаки для товаров и услуг
+        elif doc['obj_type_id'] == 4:
+            self.process_tm(doc)
+        # КЗПТ
+        elif doc['obj_type_id'] == 5:
+            self.process_kzpt(doc)
+        # Пром. образцы
+        elif doc['obj_type_id'] == 6:
+            self.process_id(doc)
+        # Мадрид ТМ
+        elif doc['obj_type_id'] in (9, 14):
+            self.process_madrid_tm(doc)
+        # Авторское право
+        elif doc['obj_type_id'] in (10, 11, 12, 13):
+            self.process_cr(doc)
+
+    def update_progress(self, processed_count):
+        """Сохраняет в процесс индексации количество обработанных документов и время декодирования JSON."""
+        if not processed_count:
+            return
+        # Обновление через F() т.к. процесс может одновременно обновляться несколькими дочерними процессами
+        IndexationProcess.objects.filter(pk=self.indexation_process.pk).update(
+            processed_count=F('processed_count') + processed_count,
+            json_decode_time=F('json_decode_time') + self.json_decode_time,
         )
+        json_path, decode_time = self.slowest_json
+        if json_path:
+            IndexationProcess.objects.filter(
+                Q_db(slowest_json_decode_time__isnull=True) | Q_db(slowest_json_decode_time__lt=decode_time),
+                pk=self.indexation_process.pk,
+            ).update(
+                slowest_json_path=json_path,
+                slowest_json_decode_time=decode_time,
+            )
+        self.json_decode_time = 0
+        self.slowest_json = (None, 0)
 
-        self.stdout.write(self.style.SUCCESS('The list of documents has been successfully received.'))
-
+    def index_documents(self, documents):
+        """Индексирует документы из списка."""
+        processed_count = 0
         for doc in documents:
-            # Изобретения, полезные модели, топографии интегральных микросхем
-            if doc['obj_type_id'] in (1, 2, 3):
-                self.process_inv_um_ld(doc)
-            # Знаки для товаров и услуг
-            elif doc['obj_type_id'] == 4:
-                self.process_tm(doc)
-            # КЗПТ
-            elif doc['obj_type_id'] == 5:
-                self.process_kzpt(doc)
-            # Пром. образцы
-            elif doc['obj_type_id'] == 6:
-                self.process_id(doc)
-            # Мадрид ТМ
-            elif doc['obj_type_id'] in (9, 14):
-                self.process_madrid_tm(doc)
-            # Авторское право
-            elif doc['obj_type_id'] in (10, 11, 12, 13):
-                self.process_cr(doc)
-            # Увеличение счётчика обработанных документов
-            self.indexation_process.processed_count += 1
-            self.indexation_process.save()
+            self.process_document(doc)
+            processed_count += 1
+
+            if not self.bulk:
+                self.update_progress(processed_count)
+                processed_count = 0
+            elif len(self.bulk_buffer) >= self.bulk_chunk_size:
+                self.flush_bulk_buffer()
+                self.update_progress(processed_count)
+                processed_count = 0
 
             # Удаление JSON
             # try:
@@ -985,7 +1148,79 @@ class Command(BaseCommand):
             # except (FileNotFoundError, PermissionError):
             #     pass
 
+        # Отправка в индекс оставшихся документов пакета
+        if self.bulk:
+            self.flush_bulk_buffer()
+        self.update_progress(processed_count)
+
+    def get_partitions(self, documents, workers):
+        """Разбивает документы для индексации на диапазоны id в пределах типа объекта."""
+        ids_by_obj_type = {}
+        for obj_type_id, app_id in documents.values_list('obj_type_id', 'id').order_by('obj_type_id', 'id'):
+            # Мадридские ТМ (9, 14) ссылаются друг на друга, поэтому обрабатываются одним процессом
+            key = (9, 14) if obj_type_id in (9, 14) else (obj_type_id,)
+            ids_by_obj_type.setdefault(key, []).append(app_id)
+
+        partitions = []
+        for obj_type_ids, ids in ids_by_obj_type.items():
+            if obj_type_ids == (9, 14):
+                partitions.append((obj_type_ids, ids[0], ids[-1]))
+                continue
+            # Несколько диапазонов на процесс для равномерной загрузки
+            size = max(1, math.ceil(len(ids) / (workers * 4)))
+            for i in range(0, len(ids), size):
+                part = ids[i:i + size]
+                partitions.append((obj_type_ids, part[0], part[-1]))
+        return partitions
+
+    def index_documents_parallel(self, documents, options):
+        """Индексирует документы пулом процессов."""
+        workers = options['workers']
+        partitions = self.get_partitions(documents, workers)
+
+        # Соединения с БД не должны наследоваться дочерними процессами
+        connections.close_all()
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            futures = [
+                executor.submit(index_partition, self.indexation_process.pk, options, *partition)
+                for partition in partitions
+            ]
+            for future in as_completed(futures):
+                obj_type_ids, id_from, id_to = future.result()
+                self.stdout.write(
+                    self.style.SUCCESS(f"Indexed obj_type {obj_type_ids}, id {id_from} - {id_to}")
+                )
+
+    def handle(self, *args, **options):
+        # Диапазон изменений, которые ещё не проиндексированы
+        if options['changes']:
+            options['changes_range'] = search_services.change_journal_get_range(
+                self.change_journal_name,
+                self.get_documents({**options, 'ignore_indexed': True})
+            )
+
+        # Получение документов для индексации
+        documents = self.get_documents(options)
+
+        # Создание процесса индексации в БД
+        self.init_indexation(
+            options,
+            IndexationProcess.objects.create(
+                begin_date=timezone.now(),
+                not_indexed_count=documents.count()
+            )
+        )
+
+        self.stdout.write(self.style.SUCCESS('The list of documents has been successfully received.'))
+
+        if options['workers'] > 1:
+            self.index_documents_parallel(documents, options)
+        else:
+            self.index_documents(documents)
+
         # Время окончания процесса индексации и сохранение данных процесса индексации
+        self.indexation_process.refresh_from_db()
         self.indexation_process.finish_date = timezone.now()
 
         qs = Q('query_string', query='*')
@@ -998,7 +1233,34 @@ class Command(BaseCommand):
         self.indexation_process.documents_in_index = s.count()
         self.indexation_process.save()
 
+        # Закэшированные результаты поиска становятся недействительными
+        results_cache.bump_index_version()
+
+        # Сохранение контрольной точки журнала изменений
+        if options['changes']:
+            search_services.change_journal_commit(
+                self.change_journal_name,
+                options['changes_range'][1],
+                self.indexation_process.processed_count
+            )
+
         # Заполнение поля NotificationDate в таблице IPC_AppList
         self.fill_notification_date()
 
         self.stdout.write(self.style.SUCCESS('Finished'))
+
+
+def index_partition(indexation_process_id, options, obj_type_ids, id_from, id_to):
+    """Индексирует диапазон документов (выполняется в дочернем процессе)."""
+    command = Command()
+    command.init_indexation(options, IndexationProcess.objects.get(pk=indexation_process_id))
+    documents = command.get_documents(options).filter(
+        obj_type_id__in=obj_type_ids,
+        id__gte=id_from,
+        id__lte=id_to
+    ).order_by('id')
+    try:
+        command.index_documents(documents)
+    finally:
+        connections.close_all()
+    return obj_type_ids, id_from, id_to
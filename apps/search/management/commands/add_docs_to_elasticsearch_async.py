@@ -1,21 +1,11 @@
-from django.core.management.base import BaseCommand
-from django.conf import settings
-from elasticsearch import Elasticsearch
-from elasticsearch_dsl import Search, Q
-from asgiref.sync import sync_to_async
-import asyncio
+from .add_docs_to_elasticsearch import Command as IndexationCommand
+import os
 
 
-class Command(BaseCommand):
+class Command(IndexationCommand):
+    help = 'Adds or updates documents in ElasticSearch index using a pool of worker processes.'
 
-    async def main(self):
-        # Получение заявок
-        self.es = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
-
-    def handle(self, *args, **options):
-        loop = asyncio.get_event_loop()
-        try:
-            loop.run_until_complete(self.main())
-        finally:
-            loop.run_until_complete(loop.shutdown_asyncgens())
-            loop.close()
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        # По умолчанию - процесс на каждое ядро и пакетная запись в индекс
+        parser.set_defaults(workers=os.cpu_count() or 1, bulk=True)
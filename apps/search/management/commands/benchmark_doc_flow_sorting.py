@@ -0,0 +1,130 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from elasticsearch import Elasticsearch
+from elasticsearch_dsl import Search
+from apps.search.utils import sort_doc_flow, parse_iso_date
+from apps.search.services.services import application_sort_transactions
+import copy
+import time
+
+
+def sort_doc_flow_strptime(hit):
+    """Сортировка документов заявки по дате с помощью time.strptime (прежняя реализация, для сравнения)."""
+    def key(value):
+        return time.strptime(value, "%Y-%m-%d")
+
+    if hit['Document']['idObjType'] in (1, 2, 3):
+        if hit.get('DOCFLOW'):
+            hit['DOCFLOW'].get('DOCUMENTS', []).sort(
+                key=lambda document: key(document['DOCRECORD'].get(
+                    'DOCREGDATE', document['DOCRECORD'].get('DOCSENDINGDATE', '1970-01-01')
+                ))
+            )
+            hit['DOCFLOW'].get('PAYMENTS', []).sort(key=lambda document: key(document['PFRECORD'].get(
+                'PFDATE', '1970-01-01'
+            )))
+            hit['DOCFLOW'].get('COLLECTIONS', []).sort(key=lambda document: key(document['CLRECORD'].get(
+                'CLDATEBEGIN', '1970-01-01'
+            )))
+        hit.get('transactions', []).sort(key=lambda item: key(item.get('BULLETIN_DATE', '1970-01-01')))
+    else:
+        root = hit['TradeMark'] if hit['Document']['idObjType'] == 4 else hit['Design']
+        if root.get('DocFlow'):
+            root['DocFlow']['Documents'].sort(key=lambda document: key(document['DocRecord'].get(
+                'DocRegDate', '1970-01-01'
+            )))
+        if root.get('PaymentDetails'):
+            root['PaymentDetails']['Payment'].sort(key=lambda document: key(document.get(
+                'PaymentDate', '1970-01-01'
+            )))
+        root.get('Transactions', {}).get('Transaction', []).sort(
+            key=lambda item: key(item.get('@bulletinDate', '1970-01-01'))
+        )
+
+
+def sort_doc_flow_current(hit):
+    """Сортировка документов заявки по дате (текущая реализация)."""
+    sort_doc_flow(hit)
+    if hit['Document']['idObjType'] not in (1, 2, 3) or 'transactions' in hit:
+        application_sort_transactions(hit)
+
+
+class Command(BaseCommand):
+    help = 'Measures the time of sorting documents, payments and transactions of the applications ' \
+           'with the largest doc flows (time.strptime vs parse_iso_date).'
+
+    # Поле с документами заявки для каждого типа объекта
+    doc_flow_fields = {
+        1: 'DOCFLOW.DOCUMENTS',
+        2: 'DOCFLOW.DOCUMENTS',
+        3: 'DOCFLOW.DOCUMENTS',
+        4: 'TradeMark.DocFlow.Documents',
+        6: 'Design.DocFlow.Documents',
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=20,
+            help='Number of applications of every object type'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Number of sorting repeats'
+        )
+        parser.add_argument(
+            '--obj_types',
+            type=int,
+            nargs='+',
+            help='Object types (1, 2, 3, 4, 6 by default)'
+        )
+
+    def get_doc_flow_len(self, hit: dict) -> int:
+        """Возвращает количество документов заявки."""
+        value = hit
+        for key in self.doc_flow_fields[hit['Document']['idObjType']].split('.'):
+            value = value.get(key) or {}
+        return len(value)
+
+    def get_samples(self, es: Elasticsearch, obj_type_id: int, count: int) -> list:
+        """Возвращает данные объектов заданного типа с наибольшим количеством документов
+        (из count * 10 объектов, у которых есть документы)."""
+        s = Search(using=es, index=settings.ELASTIC_INDEX_NAME).filter(
+            'term', Document__idObjType=obj_type_id
+        ).filter(
+            'exists', field=self.doc_flow_fields[obj_type_id]
+        )[:count * 10]
+        hits = [hit.to_dict() for hit in s.execute()]
+        return sorted(hits, key=self.get_doc_flow_len, reverse=True)[:count]
+
+    def measure(self, func, samples: list, repeat: int) -> float:
+        """Возвращает время сортировки (сек.) данных объектов."""
+        total = 0
+        for _ in range(repeat):
+            data = copy.deepcopy(samples)
+            start = time.perf_counter()
+            for hit in data:
+                func(hit)
+            total += time.perf_counter() - start
+        return total
+
+    def handle(self, *args, **options):
+        es = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
+
+        self.stdout.write(f"{'Obj type':<10}{'Apps':>6}{'Max docs':>10}{'strptime, s':>14}{'parse_iso_date, s':>20}")
+        for obj_type_id in options['obj_types'] or self.doc_flow_fields:
+            samples = self.get_samples(es, obj_type_id, options['count'])
+            if not samples:
+                self.stdout.write(self.style.WARNING(f"{obj_type_id}: no documents in index"))
+                continue
+
+            max_docs = max(self.get_doc_flow_len(hit) for hit in samples)
+            old = self.measure(sort_doc_flow_strptime, samples, options['repeat'])
+            parse_iso_date.cache_clear()
+            new = self.measure(sort_doc_flow_current, samples, options['repeat'])
+            self.stdout.write(f"{obj_type_id:<10}{len(samples):>6}{max_docs:>10}{old:>14.3f}{new:>20.3f}")
+
+        self.stdout.write(self.style.SUCCESS('Finished'))
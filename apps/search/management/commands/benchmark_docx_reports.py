@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from elasticsearch import Elasticsearch
+from elasticsearch_dsl import Search
+from apps.search.services.reports import ReportWriterDocx, ReportWriterDocxCreator
+import apps.search.services as search_services
+import tempfile
+import time
+import os
+
+
+class Command(BaseCommand):
+    help = 'Measures the time of generating .docx reports with 10/100/1000 items for every report item class.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10, 100, 1000],
+            help='Numbers of items in a report'
+        )
+        parser.add_argument(
+            '--obj_types',
+            type=int,
+            nargs='+',
+            help='Object types (all object types which have report item classes by default)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=max(getattr(settings, 'SEARCH_RESULTS_DOCX_WORKERS', 4), 2),
+            help='Number of processes for parallel generation (at least 2)'
+        )
+        parser.add_argument(
+            '--lang',
+            type=str,
+            default='ua',
+        )
+
+    def get_sample(self, es: Elasticsearch, obj_type_id: int) -> dict | None:
+        """Возвращает данные одного объекта заданного типа из индекса."""
+        s = Search(using=es, index=settings.ELASTIC_INDEX_NAME).filter(
+            'term', Document__idObjType=obj_type_id
+        )[:1]
+        for hit in s.execute():
+            res = hit.to_dict()
+            res['meta'] = hit.meta.to_dict()
+            return res
+        return None
+
+    def measure(self, items: list, workers: int) -> float:
+        """Формирует отчёт и возвращает время формирования (сек.)."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            start = time.perf_counter()
+            ReportWriterDocx(items, workers=workers).generate(os.path.join(tmp_dir, 'report.docx'))
+            return time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        es = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
+        inid_data = search_services.inid_code_get_list(options['lang'])
+        classes = ReportWriterDocxCreator.report_item_classes
+
+        self.stdout.write(f"{'Class':<35}{'Items':>8}{'Serial, s':>12}{'Parallel, s':>14}")
+        for obj_type_id in options['obj_types'] or classes:
+            item_class = classes[obj_type_id]
+            sample = self.get_sample(es, obj_type_id)
+            if not sample:
+                self.stdout.write(self.style.WARNING(f"{item_class.__name__}: no documents in index"))
+                continue
+
+            for size in options['sizes']:
+                items = [item_class(sample, inid_data, options['lang']) for _ in range(size)]
+                serial = self.measure(items, 1)
+                parallel = self.measure(items, max(options['workers'], 2))
+                self.stdout.write(f"{item_class.__name__:<35}{size:>8}{serial:>12.2f}{parallel:>14.2f}")
+
+        self.stdout.write(self.style.SUCCESS('Finished'))
@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 from elasticsearch import Elasticsearch
 from elasticsearch_dsl import Search, Q
+from apps.search.services import derived_fields, results_cache
 from apps.bulletin.models import ClListOfficialBulletinsIp
 
 
@@ -34,6 +35,7 @@ class Command(BaseCommand):
             bulletin = ClListOfficialBulletinsIp.objects.get(bul_date=i_43_d)
             bull_str = f"{bulletin.bul_number}/{bulletin.bul_date.year}"
             body['Claim']['I_43_bul_str'] = bull_str
+            derived_fields.set_derived_fields(body)
             es.index(index=settings.ELASTIC_INDEX_NAME,
                      doc_type='_doc',
                      id=h.meta.id,
@@ -58,10 +60,12 @@ class Command(BaseCommand):
             bulletin = ClListOfficialBulletinsIp.objects.get(bul_date=i_45_d)
             bull_str = f"{bulletin.bul_number}/{bulletin.bul_date.year}"
             body['Patent']['I_45_bul_str'] = bull_str
+            derived_fields.set_derived_fields(body)
             es.index(index=settings.ELASTIC_INDEX_NAME,
                      doc_type='_doc',
                      id=h.meta.id,
                      body=body,
                      request_timeout=30)
 
+        results_cache.bump_index_version()
         self.stdout.write(self.style.SUCCESS('Finished'))
@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from elasticsearch import Elasticsearch, helpers as elasticsearch_helpers
+from apps.search.services import derived_fields, results_cache
+from apps.search.utils import DERIVED_FIELDS_VERSION
+
+
+class Command(BaseCommand):
+    help = 'Fills search_data.derived (and search_data.app_id) of indexed documents which have no derived fields ' \
+           'or have an old version of them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk_size',
+            type=int,
+            default=getattr(settings, 'ELASTIC_BULK_CHUNK_SIZE', 500),
+            help='Number of documents in one scroll page and bulk request'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recompute derived fields of all documents'
+        )
+
+    def get_query(self, options):
+        if options['all']:
+            return {'query': {'match_all': {}}}
+        return {
+            'query': {
+                'bool': {
+                    'should': [
+                        {'bool': {'must_not': [{'term': {'search_data.derived.version': DERIVED_FIELDS_VERSION}}]}},
+                        {'bool': {'must_not': [{'exists': {'field': 'search_data.app_id'}}]}},
+                    ],
+                    'minimum_should_match': 1,
+                }
+            }
+        }
+
+    def handle(self, *args, **options):
+        es = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
+
+        hits = elasticsearch_helpers.scan(
+            es,
+            index=settings.ELASTIC_INDEX_NAME,
+            query=self.get_query(options),
+            size=options['chunk_size'],
+            scroll='10m',
+            version=True,
+            request_timeout=settings.ELASTIC_TIMEOUT
+        )
+
+        def actions():
+            for hit in hits:
+                derived_fields.set_derived_fields(hit['_source'])
+                hit['_source']['search_data']['app_id'] = int(hit['_id'])
+                # Документ не перезаписывается, если он был переиндексирован после получения
+                yield {
+                    '_index': hit['_index'],
+                    '_type': '_doc',
+                    '_id': hit['_id'],
+                    '_version': hit['_version'],
+                    '_source': hit['_source'],
+                }
+
+        updated_count = 0
+        error_ids = []
+        for ok, item in elasticsearch_helpers.streaming_bulk(
+                es,
+                actions(),
+                chunk_size=options['chunk_size'],
+                raise_on_error=False,
+                raise_on_exception=False,
+                request_timeout=settings.ELASTIC_TIMEOUT
+        ):
+            if ok:
+                updated_count += 1
+                if updated_count % 10000 == 0:
+                    self.stdout.write(f"Updated: {updated_count}")
+            else:
+                error_ids.append(item['index']['_id'])
+
+        if error_ids:
+            self.stdout.write(self.style.ERROR(f"Not updated: {', '.join(error_ids)}"))
+
+        results_cache.bump_index_version()
+        self.stdout.write(self.style.SUCCESS(f"Finished. Updated: {updated_count}"))
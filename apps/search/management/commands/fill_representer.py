@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 from elasticsearch import Elasticsearch
 from elasticsearch_dsl import Search, Q
+from apps.search.services import derived_fields, results_cache
 
 
 class Command(BaseCommand):
@@ -41,12 +42,16 @@ class Command(BaseCommand):
                         name = representer['RepresentativeAddressBook']['FormattedNameAddress']['Name']['FreeFormatName'][
                             'FreeFormatNameDetails']['FreeFormatNameLine']
                     address = representer['RepresentativeAddressBook']['FormattedNameAddress']['Address']['FreeFormatAddress']['FreeFormatAddressLine']
-                    representers.append(f"{name}, {address}")
+                    representers.append({'name': f"{name}, {address}"})
 
             if representers:
                 body['search_data']['agent'] = representers
+                # Имена лиц для проверки доступа к документам зависят от представителей
+                derived_fields.set_derived_fields(body)
                 es.index(index=settings.ELASTIC_INDEX_NAME,
                          doc_type='_doc',
                          id=h.meta.id,
                          body=body,
                          request_timeout=30)
+
+        results_cache.bump_index_version()
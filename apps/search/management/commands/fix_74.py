@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 from elasticsearch import Elasticsearch
 from elasticsearch_dsl import Search, Q
+from apps.search.services import derived_fields, results_cache
 
 
 class Command(BaseCommand):
@@ -51,8 +52,12 @@ class Command(BaseCommand):
             else:
                 del body['search_data']['agent']
 
+            # Имена лиц для проверки доступа к документам зависят от представителей
+            derived_fields.set_derived_fields(body)
             es.index(index='uma3',
                      doc_type='_doc',
                      id=h.meta.id,
                      body=body,
                      request_timeout=60)
+
+        results_cache.bump_index_version()
@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 from elasticsearch import Elasticsearch
 from elasticsearch_dsl import Search, Q
+from apps.search.services import derived_fields, results_cache
 import datetime
 
 
@@ -46,10 +47,12 @@ class Command(BaseCommand):
                     if len(x.get('PublicationIdentifier')) < 6:
                         x['PublicationIdentifier'] = f"{x['PublicationIdentifier']}/{x['PublicationDate'][:4]}"
 
+            derived_fields.set_derived_fields(body)
             es.index(index=settings.ELASTIC_INDEX_NAME,
                      doc_type='_doc',
                      id=h.meta.id,
                      body=body,
                      request_timeout=30)
 
+        results_cache.bump_index_version()
         self.stdout.write(self.style.SUCCESS('Finished'))
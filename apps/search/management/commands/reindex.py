@@ -1,67 +1,287 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
-from elasticsearch import Elasticsearch
-from elasticsearch_dsl import Search, Q
+from django.utils import timezone
+from elasticsearch import Elasticsearch, helpers as elasticsearch_helpers
+from apps.search.models import IpcAppList
+from apps.search.services import results_cache, derived_fields
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import json
 
 
 class Command(BaseCommand):
-    source_host = '10.11.11.51:9200'
-    source_index = 'uma2'
-    dest_host = '10.11.11.51:9200'
-    dest_index = 'uma3'
+    help = 'Copies the index to a new versioned index and switches the alias to it without downtime.'
+    es = None
+
+    # Настройки индекса, которые устанавливаются ElasticSearch и не могут быть скопированы
+    readonly_settings = ('uuid', 'creation_date', 'provided_name', 'version', 'routing')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--alias',
+            type=str,
+            default=settings.ELASTIC_INDEX_NAME,
+            help='Alias which is switched to the new index (ELASTIC_INDEX_NAME by default)'
+        )
+        parser.add_argument(
+            '--source',
+            type=str,
+            help='Source index (the index the alias points to by default)'
+        )
+        parser.add_argument(
+            '--mapping',
+            type=str,
+            help='Path to JSON file with settings and mappings of the new index '
+                 '(settings and mappings of the source index are copied by default)'
+        )
+        parser.add_argument(
+            '--slices',
+            type=int,
+            default=4,
+            help='Number of scroll slices copied in parallel'
+        )
+        parser.add_argument(
+            '--chunk_size',
+            type=int,
+            default=getattr(settings, 'ELASTIC_BULK_CHUNK_SIZE', 500),
+            help='Number of documents in one scroll page and bulk request'
+        )
+        parser.add_argument(
+            '--no_swap',
+            action='store_true',
+            help='Do not switch the alias to the new index'
+        )
+        parser.add_argument(
+            '--replace_index',
+            action='store_true',
+            help='Delete the concrete index which has the same name as the alias (first migration to the alias)'
+        )
+
+    def get_source_index(self, alias):
+        """Возвращает имя индекса, на который указывает псевдоним."""
+        if self.es.indices.exists_alias(name=alias):
+            indices = list(self.es.indices.get_alias(name=alias).keys())
+            if len(indices) != 1:
+                raise CommandError(f"Alias {alias} points to several indices: {', '.join(indices)}")
+            return indices[0]
+        if self.es.indices.exists(index=alias):
+            return alias
+        raise CommandError(f"Index or alias {alias} does not exist")
+
+    def get_index_body(self, source_index, mapping_path):
+        """Возвращает настройки и маппинг нового индекса."""
+        if mapping_path:
+            with open(mapping_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        source = self.es.indices.get(index=source_index)[source_index]
+        index_settings = {
+            key: value for key, value in source['settings']['index'].items() if key not in self.readonly_settings
+        }
+        return {
+            'settings': {'index': index_settings},
+            'mappings': source['mappings'],
+        }
+
+    def transform(self, app_id, body):
+        """Преобразует документ перед записью в новый индекс."""
+        # Преобразование search_data (списки субъектов в виде объектов)
+        for t in ('agent', 'applicant', 'inventor', 'owner'):
+            if body.get('search_data', {}).get(t):
+                body['search_data'][t] = [
+                    {'name': item} if isinstance(item, str) else item for item in body['search_data'][t]
+                ]
+
+        # Fix CorrespondenceAddress
+        if body.get('TradeMark', {}).get('TrademarkDetails', {}).get('CorrespondenceAddress', {}):
+            if not body['TradeMark']['TrademarkDetails']['CorrespondenceAddress'].get('CorrespondenceAddressBook'):
+                body['TradeMark']['TrademarkDetails']['CorrespondenceAddress']['CorrespondenceAddressBook'] = \
+                    body['TradeMark']['TrademarkDetails']['CorrespondenceAddress']
+        if body.get('Design', {}).get('DesignDetails', {}).get('CorrespondenceAddress', {}):
+            if not body['Design']['DesignDetails']['CorrespondenceAddress'].get('CorrespondenceAddressBook'):
+                body['Design']['DesignDetails']['CorrespondenceAddress']['CorrespondenceAddressBook'] = \
+                    body['Design']['DesignDetails']['CorrespondenceAddress']
+
+        # Производные поля
+        if body.get('search_data') and body.get('Document'):
+            derived_fields.set_derived_fields(body)
+
+        # Идентификатор заявки для однозначной сортировки результатов поиска (см. add_sort_tiebreaker)
+        if body.get('search_data') is not None:
+            body['search_data']['app_id'] = int(app_id)
+
+        return body
+
+    def copy_slice(self, source_index, dest_index, slice_id, slices, chunk_size):
+        """Копирует часть (slice) документов исходного индекса в новый индекс."""
+        query = {'query': {'match_all': {}}}
+        if slices > 1:
+            query['slice'] = {'id': slice_id, 'max': slices}
+
+        hits = elasticsearch_helpers.scan(
+            self.es,
+            index=source_index,
+            query=query,
+            size=chunk_size,
+            scroll='10m',
+            request_timeout=settings.ELASTIC_TIMEOUT
+        )
+        actions = (
+            {
+                '_index': dest_index,
+                '_type': '_doc',
+                '_id': hit['_id'],
+                '_source': self.transform(hit['_id'], hit['_source']),
+            } for hit in hits
+        )
+
+        copied_count = 0
+        error_ids = []
+        for ok, item in elasticsearch_helpers.streaming_bulk(
+                self.es,
+                actions,
+                chunk_size=chunk_size,
+                raise_on_error=False,
+                raise_on_exception=False,
+                request_timeout=settings.ELASTIC_TIMEOUT
+        ):
+            if ok:
+                copied_count += 1
+            else:
+                error_ids.append(item['index']['_id'])
+        return copied_count, error_ids
+
+    def copy_changes(self, source_index, dest_index, since, chunk_size):
+        """Копирует в новый индекс документы, которые были проиндексированы (или удалены из индекса) после since,
+        т.е. изменения, сделанные индексатором во время копирования.
+        Возвращает время начала прохода (since для следующего прохода)."""
+        started = timezone.now()
+        ids = list(
+            IpcAppList.objects.filter(last_indexation_date__gte=since).order_by('pk').values_list('pk', flat=True)
+        )
+
+        error_ids = []
+        for i in range(0, len(ids), chunk_size):
+            response = self.es.mget(
+                body={'ids': ids[i:i + chunk_size]},
+                index=source_index,
+                doc_type='_doc',
+                request_timeout=settings.ELASTIC_TIMEOUT
+            )
+            actions = []
+            for doc in response['docs']:
+                action = {'_index': dest_index, '_type': '_doc', '_id': doc['_id']}
+                if doc.get('found'):
+                    action['_source'] = self.transform(doc['_id'], doc['_source'])
+                else:
+                    action['_op_type'] = 'delete'
+                actions.append(action)
+
+            for ok, item in elasticsearch_helpers.streaming_bulk(
+                    self.es,
+                    actions,
+                    chunk_size=chunk_size,
+                    raise_on_error=False,
+                    raise_on_exception=False,
+                    request_timeout=settings.ELASTIC_TIMEOUT
+            ):
+                # Удаление документа, которого нет в новом индексе, не является ошибкой
+                if not ok and 'index' in item:
+                    error_ids.append(item['index']['_id'])
+
+        self.stdout.write(f"Changes since {since:%Y-%m-%d %H:%M:%S}: {len(ids)}")
+        if error_ids:
+            self.stdout.write(self.style.ERROR(f"Not copied: {', '.join(error_ids)}"))
+        return started
+
+    def set_write_block(self, index, value):
+        """Запрещает (разрешает) запись в индекс."""
+        self.es.indices.put_settings(index=index, body={'index': {'blocks': {'write': value}}})
 
     def handle(self, *args, **options):
         # Инициализация клиента ElasticSearch
-        es_source = Elasticsearch(self.source_host, timeout=settings.ELASTIC_TIMEOUT)
-        es_dest = Elasticsearch(self.dest_host, timeout=settings.ELASTIC_TIMEOUT)
+        self.es = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
 
-        error_ids = []
-        query = Q(
-            "query_string",
-            # query="search_data.app_date:{2020-01-01 TO *}'"
-            query="*"
+        alias = options['alias']
+        source_index = options['source'] or self.get_source_index(alias)
+        alias_is_index = not self.es.indices.exists_alias(name=alias) and self.es.indices.exists(index=alias)
+        if alias_is_index and not options['no_swap'] and not options['replace_index']:
+            raise CommandError(
+                f"{alias} is an index, not an alias. Use --replace_index to replace it with the alias "
+                f"or --no_swap to only copy the data."
+            )
+
+        # Создание нового индекса (на время копирования без реплик и обновления)
+        dest_index = f"{alias}_{timezone.now().strftime('%Y%m%d%H%M%S')}"
+        body = self.get_index_body(source_index, options['mapping'])
+        index_settings = body.setdefault('settings', {}).setdefault('index', {})
+        replicas = index_settings.get('number_of_replicas', 1)
+        refresh_interval = index_settings.get('refresh_interval', '1s')
+        index_settings.update({'number_of_replicas': 0, 'refresh_interval': -1})
+        self.es.indices.create(index=dest_index, body=body)
+        self.stdout.write(self.style.SUCCESS(f"Index {dest_index} has been created."))
+
+        # Копирование документов
+        # (запас по времени на случай записи даты индексации в БД после записи документа в индекс)
+        overlap = datetime.timedelta(seconds=getattr(settings, 'CHANGE_JOURNAL_OVERLAP_SECONDS', 300))
+        copy_started = timezone.now()
+        slices = max(options['slices'], 1)
+        with ThreadPoolExecutor(max_workers=slices) as executor:
+            results = list(executor.map(
+                lambda slice_id: self.copy_slice(source_index, dest_index, slice_id, slices, options['chunk_size']),
+                range(slices)
+            ))
+        copied_count = sum(count for count, _ in results)
+        error_ids = [app_id for _, ids in results for app_id in ids]
+        if error_ids:
+            self.stdout.write(self.style.ERROR(f"Not copied: {', '.join(error_ids)}"))
+
+        self.es.indices.put_settings(
+            index=dest_index,
+            body={'index': {'number_of_replicas': replicas, 'refresh_interval': refresh_interval}}
         )
-        s = Search(index=self.source_index).using(es_source).query(query)
-        c = s.count()
-        i = 0
-
-        for h in s.params(size=10).scan():
-            i += 1
-            print(f"{i}/{c} - {h.meta.id}")
-
-            # Поиск в индексе назначения
-            dest_app = Search(using=es_dest, index=self.dest_index).query("match", _id=h.meta.id).execute()
-            if not dest_app:
-                body = h.to_dict()
-
-                # Преобразование search_data
-                for t in ('agent', 'applicant', 'inventor', 'owner'):
-                    if body['search_data'].get(t):
-                        items = []
-                        for item in body['search_data'][t]:
-                            items.append(
-                                {
-                                    'name': item
-                                }
-                            )
-                        body['search_data'][t] = items
-
-                # Fix CorrespondenceAddress
-                if body.get('TradeMark', {}).get('TrademarkDetails', {}).get('CorrespondenceAddress', {}):
-                    if not body['TradeMark']['TrademarkDetails']['CorrespondenceAddress'].get('CorrespondenceAddressBook'):
-                        body['TradeMark']['TrademarkDetails']['CorrespondenceAddress']['CorrespondenceAddressBook'] = \
-                        body['TradeMark']['TrademarkDetails']['CorrespondenceAddress']
-                if body.get('Design', {}).get('DesignDetails', {}).get('CorrespondenceAddress', {}):
-                    if not body['Design']['DesignDetails']['CorrespondenceAddress'].get('CorrespondenceAddressBook'):
-                        body['Design']['DesignDetails']['CorrespondenceAddress']['CorrespondenceAddressBook'] = \
-                        body['Design']['DesignDetails']['CorrespondenceAddress']
-
-                try:
-                    es_dest.index(index=self.dest_index,
-                                  doc_type='_doc',
-                                  id=h.meta.id,
-                                  body=body,
-                                  request_timeout=30)
-                except:
-                    error_ids.append(h.meta.id)
-        print(error_ids)
+
+        # Догоняющее копирование документов, изменённых индексатором во время копирования
+        changes_since = self.copy_changes(source_index, dest_index, copy_started - overlap, options['chunk_size'])
+
+        # Перед переключением псевдонима запись в исходный индекс запрещается, чтобы изменения,
+        # сделанные после последнего догоняющего прохода, не были потеряны
+        # (документы, которые не удалось записать, индексатор обработает при следующем запуске)
+        if not options['no_swap']:
+            self.set_write_block(source_index, True)
+        try:
+            if not options['no_swap']:
+                self.copy_changes(source_index, dest_index, changes_since - overlap, options['chunk_size'])
+            self.es.indices.refresh(index=dest_index)
+
+            # Сверка количества документов
+            source_count = self.es.count(index=source_index)['count']
+            dest_count = self.es.count(index=dest_index)['count']
+            self.stdout.write(f"Source: {source_count}, copied: {copied_count}, in new index: {dest_count}")
+            if source_count != dest_count:
+                raise CommandError(f"Documents count mismatch. The alias has not been switched to {dest_index}.")
+
+            if options['no_swap']:
+                self.stdout.write(self.style.SUCCESS('Finished'))
+                return
+
+            # Атомарное переключение псевдонима на новый индекс
+            if alias_is_index:
+                actions = [{'remove_index': {'index': alias}}]
+            elif self.es.indices.exists_alias(name=alias):
+                actions = [
+                    {'remove': {'index': index, 'alias': alias}} for index in self.es.indices.get_alias(name=alias)
+                ]
+            else:
+                actions = []
+            actions.append({'add': {'index': dest_index, 'alias': alias}})
+            self.es.indices.update_aliases(body={'actions': actions})
+        except Exception:
+            if not options['no_swap']:
+                self.set_write_block(source_index, False)
+            raise
+
+        # Закэшированные результаты поиска становятся недействительными
+        results_cache.bump_index_version()
+
+        self.stdout.write(self.style.SUCCESS(f"Alias {alias} now points to {dest_index}. Finished"))
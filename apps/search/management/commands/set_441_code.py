@@ -2,8 +2,10 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 from elasticsearch import Elasticsearch
 from elasticsearch_dsl import Search, Q
+from apps.search.services import derived_fields, results_cache
 from apps.bulletin.models import EBulletinData
 from apps.api.models import OpenData
+from apps.api.services import payloads
 import json
 
 
@@ -14,6 +16,7 @@ class Command(BaseCommand):
         # Инициализация клиента ElasticSearch
         es = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
 
+        updated_ids = []
         for app in EBulletinData.objects.filter(unit_id=1).all():
             query = Q(
                 'query_string',
@@ -24,6 +27,8 @@ class Command(BaseCommand):
             if s:
                 hit = s[0].to_dict()
                 hit['TradeMark']['TrademarkDetails']['Code_441'] = app.publication_date
+                # Производные поля (ограничение публикации, номер бюллетеня) зависят от 441 кода
+                derived_fields.set_derived_fields(hit)
                 es.index(index=settings.ELASTIC_INDEX_NAME,
                          doc_type='_doc',
                          id=s[0].meta.id,
@@ -41,5 +46,12 @@ class Command(BaseCommand):
                     data['Code_441'] = str(app.publication_date)
                     opendata_item.data = json.dumps(data)
                     opendata_item.save()
+                    updated_ids.append(opendata_item.pk)
+
+        results_cache.bump_index_version()
+
+        # Формирование данных в формате API для изменённых записей
+        for i in range(0, len(updated_ids), 100):
+            payloads.update(updated_ids[i:i + 100])
 
         self.stdout.write(self.style.SUCCESS('Finished'))
@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 from elasticsearch import Elasticsearch
 from elasticsearch_dsl import Search, Q
+from apps.search.services import derived_fields, results_cache
 from ...utils import get_registration_status_color
 import traceback
 
@@ -28,9 +29,11 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.ERROR(f"Error in {h.meta.id}"))
                 error_traceback = traceback.format_exc()
                 self.stdout.write(error_traceback)
+            derived_fields.set_derived_fields(body)
             es.index(index=settings.ELASTIC_INDEX_NAME,
                      doc_type='_doc',
                      id=h.meta.id,
                      body=body,
                      request_timeout=30)
+        results_cache.bump_index_version()
         self.stdout.write(self.style.SUCCESS('Finished'))
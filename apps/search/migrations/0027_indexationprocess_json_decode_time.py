@@ -0,0 +1,28 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0026_deliverydatecead_fvcicimporter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='indexationprocess',
+            name='json_decode_time',
+            field=models.FloatField(default=0, verbose_name='Час декодування JSON (сек.)'),
+        ),
+        migrations.AddField(
+            model_name='indexationprocess',
+            name='slowest_json_path',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Найповільніший JSON'),
+        ),
+        migrations.AddField(
+            model_name='indexationprocess',
+            name='slowest_json_decode_time',
+            field=models.FloatField(blank=True, null=True, verbose_name='Час декодування найповільнішого JSON (сек.)'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.7 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0027_indexationprocess_json_decode_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeJournalCursor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Споживач')),
+                ('watermark', models.DateTimeField(blank=True, null=True, verbose_name='Оброблено зміни до')),
+                ('processed_count', models.PositiveIntegerField(default=0, verbose_name='Опрацьовано змін під час останнього запуску')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата та час оновлення')),
+            ],
+            options={
+                'verbose_name': 'Контрольна точка журналу змін',
+                'verbose_name_plural': 'Контрольні точки журналу змін',
+            },
+        ),
+    ]
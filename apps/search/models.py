@@ -312,6 +312,9 @@ class IndexationProcess(models.Model):
     finish_date = models.DateTimeField("Дата та час закінчення індексації", null=True, blank=True)
     documents_in_index = models.PositiveIntegerField("Всього документів", null=True, blank=True)
     documents_in_index_shared = models.PositiveIntegerField("Всього документів опублікованих", null=True, blank=True)
+    json_decode_time = models.FloatField("Час декодування JSON (сек.)", default=0)
+    slowest_json_path = models.CharField("Найповільніший JSON", max_length=255, null=True, blank=True)
+    slowest_json_decode_time = models.FloatField("Час декодування найповільнішого JSON (сек.)", null=True, blank=True)
 
     def __str__(self):
         return self.finish_date
@@ -321,6 +324,21 @@ class IndexationProcess(models.Model):
         verbose_name_plural = 'Процеси індексації'
 
 
+class ChangeJournalCursor(models.Model):
+    """Модель контрольной точки журнала изменений IPC_AppList для потребителя (индексатор, API и т.д.)."""
+    name = models.CharField("Споживач", max_length=100, unique=True)
+    watermark = models.DateTimeField("Оброблено зміни до", null=True, blank=True)
+    processed_count = models.PositiveIntegerField("Опрацьовано змін під час останнього запуску", default=0)
+    updated_at = models.DateTimeField("Дата та час оновлення", auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = 'Контрольна точка журналу змін'
+        verbose_name_plural = 'Контрольні точки журналу змін'
+
+
 class SimpleSearchPage(models.Model):
     """Модель страниці простого поиска."""
     description_uk = RichTextUploadingField('Опис сторінки (укр.)', blank=True)
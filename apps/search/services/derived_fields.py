@@ -0,0 +1,64 @@
+"""Производные поля документа, которые зависят только от данных документа.
+
+Поля вычисляются при индексации и хранятся в search_data.derived вместе с версией набора полей
+(DERIVED_FIELDS_VERSION). Код поиска, выгрузки и страницы объекта использует их вместо повторного вычисления,
+если версия совпадает с текущей (см. get_derived_fields). При изменении состава или алгоритма вычисления полей
+необходимо увеличить DERIVED_FIELDS_VERSION, указать изменённые поля в DERIVED_FIELDS_CHANGES
+(остальные поля предыдущей версии продолжают использоваться) и заполнить поля командой fill_derived_fields.
+"""
+from typing import Callable, Optional
+
+from apps.bulletin.services import bulletin_get_number_441_code
+from apps.search.utils import (DERIVED_FIELDS_VERSION, get_fixed_mark_status_code, is_app_limited, sort_doc_flow,
+                               get_app_access_names)
+from apps.search.services.services import application_get_stages_statuses
+
+
+def _safe(func: Callable, *args) -> Optional[object]:
+    """Возвращает результат func или None, если данные документа не позволяют его вычислить."""
+    try:
+        return func(*args)
+    except (KeyError, IndexError, TypeError, ValueError, AttributeError):
+        return None
+
+
+def _get_code_441(body: dict) -> Optional[str]:
+    if body['Document']['idObjType'] == 4:
+        return body['TradeMark']['TrademarkDetails'].get('Code_441')
+    if body['Document']['idObjType'] in (9, 14):
+        return body['MadridTradeMark']['TradeMarkDetails'].get('Code_441')
+    return None
+
+
+def compute(body: dict) -> dict:
+    """Вычисляет производные поля документа."""
+    obj_type_id = body['Document']['idObjType']
+    derived = {
+        'version': DERIVED_FIELDS_VERSION,
+        'is_limited': _safe(is_app_limited, body),
+        'stages': _safe(application_get_stages_statuses, body),
+        'mark_status_code': _safe(get_fixed_mark_status_code, body) if obj_type_id == 4 else None,
+        'bul_number_441': None,
+        # Нормализованные имена лиц заявки для проверки доступа к документам (user_has_access_to_docs)
+        'access_names': _safe(get_app_access_names, body),
+    }
+
+    code_441 = _safe(_get_code_441, body)
+    if code_441:
+        derived['bul_number_441'] = bulletin_get_number_441_code(code_441)
+
+    return derived
+
+
+def set_derived_fields(body: dict) -> None:
+    """Сортирует документы заявки по дате и записывает производные поля в search_data.derived."""
+    # Поля, вычисленные для предыдущей версии, не должны использоваться при вычислении
+    body['search_data'].pop('derived', None)
+    derived = compute(body)
+    try:
+        sort_doc_flow(body)
+    except (KeyError, TypeError, ValueError):
+        derived['doc_flow_sorted'] = False
+    else:
+        derived['doc_flow_sorted'] = True
+    body['search_data']['derived'] = derived
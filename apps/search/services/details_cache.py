@@ -0,0 +1,39 @@
+"""Кэш подготовленных данных объекта для страницы объекта (до фильтрации filter_app_data).
+
+Ключ кэша содержит версию индекса, дату последнего изменения заявки и дату её последней индексации,
+поэтому после изменения или переиндексации заявки закэшированные данные не используются.
+Ключ также содержит текущую дату, т.к. от неё зависит фильтр заявок, которые не положено публиковать
+(filter_bad_apps).
+"""
+from typing import Callable, Optional
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.search.models import IpcAppList
+from apps.search.services import results_cache
+
+
+def get_key(id_app_number: int) -> Optional[str]:
+    """Возвращает ключ кэша для заявки или None, если заявки нет в БД."""
+    app = IpcAppList.objects.filter(pk=id_app_number).values_list('lastupdate', 'last_indexation_date').first()
+    if app is None:
+        return None
+    lastupdate, last_indexation_date = (int(x.timestamp()) if x else 0 for x in app)
+    today = datetime.datetime.now().strftime('%Y%m%d')
+    return f"app_details_{results_cache.get_index_version()}_{id_app_number}_{lastupdate}_{last_indexation_date}_" \
+           f"{today}"
+
+
+def get_app_details(id_app_number: int, prepare: Callable[[int], dict]) -> dict:
+    """Возвращает данные заявки из кэша или подготавливает их с помощью prepare и сохраняет в кэш."""
+    key = get_key(id_app_number)
+    if key is None:
+        return prepare(id_app_number)
+
+    data = cache.get(key)
+    if data is None:
+        data = prepare(id_app_number)
+        cache.set(key, data, getattr(settings, 'SEARCH_APP_DETAILS_CACHE_TIMEOUT', 86400))
+    return data
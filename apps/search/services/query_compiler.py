@@ -0,0 +1,213 @@
+"""Компиляция данных поисковых форм в запросы ElasticSearch.
+
+Соответствие параметров поиска полям индекса (SimpleSearchField, InidCodeSchedule, ElasticIndexField)
+загружается из БД один раз и хранится в памяти процесса. При изменении этих моделей
+(сохранение в админке и т.д.) версия соответствия в кэше увеличивается и процессы перезагружают его.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from elasticsearch import Elasticsearch
+from elasticsearch_dsl import Search, Q
+
+from apps.search.models import SimpleSearchField, InidCodeSchedule, ObjType
+from apps.search.utils import prepare_query, filter_bad_apps
+
+VERSION_CACHE_KEY = 'search_query_compiler_version'
+
+# Идентификаторы реестров (schedule_type) заявок и охранных документов
+SCHEDULE_TYPES = {
+    1: (10, 11, 12, 13, 14, 15),
+    2: (3, 4, 5, 6, 7, 8, 16, 17, 18, 19, 30, 32),
+}
+
+
+@dataclass(frozen=True)
+class SearchField:
+    """Поле индекса ElasticSearch, по которому выполняется поиск."""
+    field_name: str
+    field_type: str
+    nested_path: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class SearchMapping:
+    """Соответствие параметров поиска полям индекса."""
+    version: int
+    obj_type_ids: Tuple[int, ...]
+    simple: Dict[int, Optional[SearchField]]
+    # (ipc_code_id, obj_state) -> поле, если по параметру разрешён поиск
+    advanced: Dict[Tuple[int, int], Optional[SearchField]]
+    # ipc_code_id -> первое поле с разрешённым поиском (для валидации формы)
+    advanced_any: Dict[int, SearchField]
+
+
+_mapping: Optional[SearchMapping] = None
+_lock = threading.Lock()
+
+
+def _get_version() -> int:
+    return cache.get(VERSION_CACHE_KEY, 0)
+
+
+def invalidate() -> None:
+    """Сбрасывает соответствие параметров поиска во всех процессах."""
+    global _mapping
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+    _mapping = None
+
+
+def _to_search_field(elastic_index_field) -> Optional[SearchField]:
+    if elastic_index_field is None:
+        return None
+    return SearchField(
+        field_name=elastic_index_field.field_name,
+        field_type=elastic_index_field.field_type,
+        nested_path=elastic_index_field.parent.field_name if elastic_index_field.parent else None,
+    )
+
+
+def _load_mapping(version: int) -> SearchMapping:
+    """Загружает из БД соответствие параметров поиска полям индекса."""
+    simple = {
+        x.pk: _to_search_field(x.elastic_index_field)
+        for x in SimpleSearchField.objects.select_related('elastic_index_field__parent')
+    }
+
+    advanced = {}
+    advanced_any = {}
+    schedules = InidCodeSchedule.objects.select_related('elastic_index_field__parent').order_by('pk')
+    for schedule in schedules:
+        field = _to_search_field(schedule.elastic_index_field)
+        for obj_state, schedule_type_ids in SCHEDULE_TYPES.items():
+            key = (schedule.ipc_code_id, obj_state)
+            # Как и .first() - используется первая запись реестров заявок/охранных документов
+            if schedule.schedule_type_id in schedule_type_ids and key not in advanced:
+                advanced[key] = field if schedule.enable_search else None
+        if schedule.enable_search and field and schedule.ipc_code_id not in advanced_any:
+            advanced_any[schedule.ipc_code_id] = field
+
+    return SearchMapping(
+        version=version,
+        obj_type_ids=tuple(ObjType.objects.order_by('pk').values_list('pk', flat=True)),
+        simple=simple,
+        advanced=advanced,
+        advanced_any=advanced_any,
+    )
+
+
+def get_mapping() -> SearchMapping:
+    """Возвращает соответствие параметров поиска полям индекса (из памяти процесса)."""
+    global _mapping
+    version = _get_version()
+    mapping = _mapping
+    if mapping is None or mapping.version != version:
+        with _lock:
+            if _mapping is None or _mapping.version != version:
+                _mapping = _load_mapping(version)
+            mapping = _mapping
+    return mapping
+
+
+def get_simple_search_field(param_type) -> Optional[SearchField]:
+    """Возвращает поле индекса для параметра простого поиска."""
+    return get_mapping().simple.get(int(param_type))
+
+
+def get_advanced_search_field(ipc_code, obj_state: Optional[int] = None) -> Optional[SearchField]:
+    """Возвращает поле индекса для параметра расширенного поиска (код ИНИД)."""
+    mapping = get_mapping()
+    if obj_state is None:
+        return mapping.advanced_any.get(int(ipc_code))
+    return mapping.advanced.get((int(ipc_code), obj_state))
+
+
+def compile_field_query(value: str, field: SearchField) -> Q:
+    """Возвращает запрос ElasticSearch по значению одного поля."""
+    query = prepare_query(value, field)
+
+    if field.field_type == 'text':
+        fields = [
+            f"{field.field_name}^2",
+            f"{field.field_name}.exact^3",
+            f"{field.field_name}.*",
+        ]
+    else:
+        fields = [
+            f"{field.field_name}",
+        ]
+
+    q = Q(
+        'query_string',
+        query=query,
+        fields=fields,
+        quote_field_suffix=".exact",
+        default_operator='AND'
+    )
+
+    # Nested тип
+    if field.nested_path:
+        q = Q(
+            'nested',
+            path=field.nested_path,
+            query=q,
+        )
+
+    return q
+
+
+def compile_simple_query(cleaned_data: List[dict]) -> Optional[Q]:
+    """Формирует запрос ElasticSearch по данным формы простого поиска."""
+    qs = None
+    for item in cleaned_data:
+        if item:
+            field = get_simple_search_field(item['param_type'])
+            if field:
+                q = compile_field_query(item['value'], field)
+                qs = q if qs is None else qs & q
+
+    # Не включать в список результатов заявки, по которым выдан патент
+    return filter_bad_apps(qs)
+
+
+def compile_advanced_query(cleaned_data: List[dict]) -> Optional[Q]:
+    """Формирует запрос ElasticSearch по данным формы расширенного поиска.
+    Параметры разбиваются на группы по типу и статусу объекта, группы объединяются через OR."""
+    qs_result = None
+    for obj_type_id in get_mapping().obj_type_ids:
+        for obj_state in SCHEDULE_TYPES.keys():
+            qs = None
+            for item in cleaned_data:
+                if str(obj_type_id) not in item['obj_type'] or str(obj_state) not in item['obj_state']:
+                    continue
+                # Проверка доступно ли поле для поиска
+                field = get_advanced_search_field(item['ipc_code'], obj_state)
+                if field:
+                    q = compile_field_query(item['value'], field)
+                    qs = q if qs is None else qs & q
+
+            if qs is not None:
+                qs &= Q('query_string', query=f"{obj_type_id}", default_field='Document.idObjType')
+                qs &= Q('query_string', query=f"{obj_state}", default_field='search_data.obj_state')
+
+                # Не включать в список результатов заявки, по которым выдан патент
+                qs = filter_bad_apps(qs)
+
+                qs_result = qs if qs_result is None else qs_result | qs
+
+    return qs_result
+
+
+def get_search(qs: Optional[Q]) -> Search:
+    """Возвращает объект поиска ElasticSearch по запросу."""
+    client = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
+    return Search(using=client, index=settings.ELASTIC_INDEX_NAME).query(qs).source(
+        excludes=["*.DocBarCode", "*.DOCBARCODE"]
+    )
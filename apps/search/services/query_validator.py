@@ -0,0 +1,312 @@
+"""Валидация поисковых запросов без обращения к ElasticSearch.
+
+Проверяется синтаксис query_string (подмножество грамматики Lucene), в который prepare_query
+преобразует запрос пользователя: операторы AND/OR/NOT (ТА/АБО/НЕ), экранированные символы,
+точный поиск по полю .exact, диапазоны дат. Для полей с датами и числами проверяются значения.
+Если включена настройка SEARCH_VALIDATE_QUERY_ELASTICSEARCH, запросы, прошедшие локальную проверку,
+дополнительно проверяются средствами ElasticSearch.
+"""
+from typing import List, Optional, Tuple
+import datetime
+import re
+
+from django.conf import settings
+
+from elasticsearch import Elasticsearch
+from elasticsearch_dsl import Index, Q
+
+from apps.search.utils import prepare_query
+
+
+class QuerySyntaxError(ValueError):
+    """Синтаксическая ошибка в запросе."""
+
+
+# Символы, с которых не может начинаться термин
+_SPECIAL_CHARS = set(' \t\n\r\u3000+-!():^[]"{}~\\/')
+_WHITESPACE = set(' \t\n\r\u3000')
+_NUMBER_RE = re.compile(r'\d+(\.\d+)?')
+_INTEGER_RE = re.compile(r'-?\d+')
+_DATE_RE = re.compile(r'(\d{4})(?:-(\d{1,2})(?:-(\d{1,2}))?)?')
+
+# Типы лексем
+LPAREN, RPAREN, AND, OR, NOT, PLUS, MINUS, COLON, TERM, PHRASE, RANGE, REGEXP, BOOST, FUZZY = (
+    'LPAREN', 'RPAREN', 'AND', 'OR', 'NOT', 'PLUS', 'MINUS', 'COLON', 'TERM', 'PHRASE', 'RANGE', 'REGEXP', 'BOOST',
+    'FUZZY'
+)
+
+_client = None
+
+
+def _read_number(query: str, pos: int) -> Tuple[Optional[str], int]:
+    match = _NUMBER_RE.match(query, pos)
+    if match:
+        return match.group(), match.end()
+    return None, pos
+
+
+def _read_quoted(query: str, pos: int) -> Tuple[str, int]:
+    """Читает строку в кавычках, pos - позиция открывающей кавычки."""
+    value = []
+    pos += 1
+    while pos < len(query):
+        char = query[pos]
+        if char == '\\':
+            if pos + 1 >= len(query):
+                break
+            value.append(query[pos + 1])
+            pos += 2
+        elif char == '"':
+            return ''.join(value), pos + 1
+        else:
+            value.append(char)
+            pos += 1
+    raise QuerySyntaxError('Unterminated phrase')
+
+
+def _read_range(query: str, pos: int) -> Tuple[Tuple[str, str], int]:
+    """Читает диапазон [a TO b] или {a TO b}, pos - позиция открывающей скобки."""
+    values = []
+    pos += 1
+    while True:
+        while pos < len(query) and query[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= len(query):
+            raise QuerySyntaxError('Unterminated range')
+        char = query[pos]
+        if char in ']}':
+            if len(values) != 3 or values[1] != 'TO':
+                raise QuerySyntaxError('Invalid range')
+            return (values[0], values[2]), pos + 1
+        if char == '"':
+            value, pos = _read_quoted(query, pos)
+            values.append(value)
+            if len(values) == 2:
+                raise QuerySyntaxError('Invalid range')
+        else:
+            start = pos
+            while pos < len(query) and query[pos] not in _WHITESPACE and query[pos] not in ']}':
+                pos += 1
+            values.append(query[start:pos])
+        if len(values) > 3 or (len(values) == 2 and values[1] != 'TO'):
+            raise QuerySyntaxError('Invalid range')
+
+
+def tokenize(query: str) -> List[Tuple[str, object]]:
+    """Разбивает запрос на лексемы."""
+    tokens = []
+    pos = 0
+    length = len(query)
+    while pos < length:
+        char = query[pos]
+        if char in _WHITESPACE:
+            pos += 1
+        elif char == '(':
+            tokens.append((LPAREN, None))
+            pos += 1
+        elif char == ')':
+            tokens.append((RPAREN, None))
+            pos += 1
+        elif query.startswith('&&', pos):
+            tokens.append((AND, None))
+            pos += 2
+        elif query.startswith('||', pos):
+            tokens.append((OR, None))
+            pos += 2
+        elif char == '!':
+            tokens.append((NOT, None))
+            pos += 1
+        elif char == '+':
+            tokens.append((PLUS, None))
+            pos += 1
+        elif char == '-':
+            tokens.append((MINUS, None))
+            pos += 1
+        elif char == ':':
+            tokens.append((COLON, None))
+            pos += 1
+        elif char == '"':
+            value, pos = _read_quoted(query, pos)
+            tokens.append((PHRASE, value))
+        elif char in '[{':
+            value, pos = _read_range(query, pos)
+            tokens.append((RANGE, value))
+        elif char == '/':
+            # Регулярное выражение
+            end = pos + 1
+            while end < length and query[end] != '/':
+                end += 2 if query[end] == '\\' else 1
+            if end >= length:
+                raise QuerySyntaxError('Unterminated regular expression')
+            tokens.append((REGEXP, query[pos + 1:end]))
+            pos = end + 1
+        elif char == '^':
+            value, pos = _read_number(query, pos + 1)
+            if value is None:
+                raise QuerySyntaxError('Invalid boost')
+            tokens.append((BOOST, value))
+        elif char == '~':
+            value, pos = _read_number(query, pos + 1)
+            tokens.append((FUZZY, value))
+        elif char in ']}':
+            raise QuerySyntaxError('Unexpected range end')
+        else:
+            # Термин (в т.ч. с экранированными символами и масками * ?)
+            value = []
+            while pos < length:
+                char = query[pos]
+                if char == '\\':
+                    if pos + 1 >= length:
+                        raise QuerySyntaxError('Trailing escape character')
+                    value.append(query[pos:pos + 2])
+                    pos += 2
+                elif char in '+-' or char not in _SPECIAL_CHARS:
+                    value.append(char)
+                    pos += 1
+                else:
+                    break
+            value = ''.join(value)
+            if value == 'AND':
+                tokens.append((AND, None))
+            elif value == 'OR':
+                tokens.append((OR, None))
+            elif value == 'NOT':
+                tokens.append((NOT, None))
+            else:
+                tokens.append((TERM, value))
+    return tokens
+
+
+class _Parser:
+    """Синтаксический анализатор query_string. Собирает значения для поля по умолчанию."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+        # Термины (с признаком диапазона) без явного указания поля
+        self.values = []
+
+    def peek(self):
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect_clause(self):
+        if self.peek() not in (TERM, PHRASE, RANGE, REGEXP, LPAREN):
+            raise QuerySyntaxError('Term expected')
+
+    def parse(self):
+        if not self.tokens:
+            raise QuerySyntaxError('Empty query')
+        self.parse_query()
+        if self.pos < len(self.tokens):
+            raise QuerySyntaxError('Unexpected token')
+
+    def parse_query(self):
+        self.parse_modified_clause()
+        while self.peek() not in (None, RPAREN):
+            if self.peek() in (AND, OR):
+                self.next()
+            self.parse_modified_clause()
+
+    def parse_modified_clause(self):
+        if self.peek() in (PLUS, MINUS, NOT):
+            self.next()
+        self.expect_clause()
+        self.parse_clause()
+
+    def parse_clause(self):
+        field = None
+        if self.peek() == TERM and self.pos + 1 < len(self.tokens) and self.tokens[self.pos + 1][0] == COLON:
+            field = self.next()[1]
+            self.next()
+            self.expect_clause()
+
+        token_type, value = self.next()
+        if token_type == LPAREN:
+            if self.peek() == RPAREN:
+                raise QuerySyntaxError('Empty group')
+            self.parse_query()
+            if self.peek() != RPAREN:
+                raise QuerySyntaxError('Unbalanced parenthesis')
+            self.next()
+        elif field is None and token_type != REGEXP:
+            self.values.append((token_type, value))
+
+        modifiers = set()
+        while self.peek() in (BOOST, FUZZY):
+            modifier = self.next()[0]
+            if modifier in modifiers or (modifier == FUZZY and token_type in (RANGE, LPAREN)):
+                raise QuerySyntaxError('Invalid modifier')
+            modifiers.add(modifier)
+
+
+def _is_date(value: str) -> bool:
+    match = _DATE_RE.fullmatch(value)
+    if not match:
+        return False
+    year, month, day = (int(x) if x else 1 for x in match.groups())
+    try:
+        datetime.date(year, month, day)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_valid_value(token_type: str, value, field_type: str) -> bool:
+    """Проверяет значения запроса к полям с датами и числами."""
+    if field_type == 'date':
+        check = _is_date
+    elif field_type == 'integer':
+        check = _INTEGER_RE.fullmatch
+    else:
+        return True
+
+    if token_type == RANGE:
+        return all(x == '*' or check(x) for x in value)
+    return bool(check(value.replace('\\', '')))
+
+
+def is_valid_query(query: str, field_type: str = 'text') -> bool:
+    """Проверяет синтаксис запроса query_string (результат prepare_query) без обращения к ElasticSearch."""
+    try:
+        parser = _Parser(tokenize(query))
+        parser.parse()
+    except QuerySyntaxError:
+        return False
+    return all(_is_valid_value(token_type, value, field_type) for token_type, value in parser.values)
+
+
+def _get_client() -> Elasticsearch:
+    global _client
+    if _client is None:
+        _client = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
+    return _client
+
+
+def validate_query_elasticsearch(query: str, field) -> bool:
+    """Отправляет запрос (результат prepare_query) на валидацию в ElasticSearch."""
+    i = Index(settings.ELASTIC_INDEX_NAME, using=_get_client()).validate_query(body={
+        'query': Q(
+            'query_string',
+            query=query,
+            default_field=field.field_name,
+            default_operator='AND'
+        ).to_dict()
+    })
+    return i['valid']
+
+
+def validate_field_query(value: str, field) -> bool:
+    """Валидация запроса пользователя к полю индекса.
+    Проверка ElasticSearch выполняется только для запросов, прошедших локальную проверку,
+    и только если включена настройка SEARCH_VALIDATE_QUERY_ELASTICSEARCH."""
+    query = prepare_query(value, field)
+    if not is_valid_query(query, field.field_type):
+        return False
+    if getattr(settings, 'SEARCH_VALIDATE_QUERY_ELASTICSEARCH', False):
+        return validate_query_elasticsearch(query, field)
+    return True
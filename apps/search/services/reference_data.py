@@ -0,0 +1,100 @@
+"""Справочные данные, которые используются при отображении результатов поиска и страниц объектов.
+
+Типы объектов (ObjType), параметры сортировки (SortParameter), настройки платных услуг (PaidServicesSettings)
+и последний законченный процесс индексации (IndexationProcess) загружаются из БД один раз и хранятся
+в памяти процесса. При изменении этих моделей версия данных в кэше увеличивается (см. signals.py)
+и процессы перезагружают их. Версия проверяется один раз за запрос (данные запоминаются в объекте запроса).
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+import datetime
+import threading
+
+from django.core.cache import cache
+
+from apps.search.models import ObjType, SortParameter, PaidServicesSettings, IndexationProcess
+
+VERSION_CACHE_KEY = 'search_reference_data_version'
+
+
+@dataclass(frozen=True)
+class ReferenceData:
+    """Справочные данные."""
+    version: int
+    # id -> (название укр., название англ.)
+    obj_types: Dict[int, Tuple[str, str]]
+    # Включённые параметры сортировки (по убыванию веса): (название укр., название англ., значение)
+    sort_params: Tuple[Tuple[str, str, str], ...]
+    paid_services_enabled: bool
+    documents_count: Optional[int]
+    last_finished_indexation_date: Optional[datetime.datetime]
+
+    def get_obj_type_title(self, obj_type_id: int, lang: str) -> Optional[str]:
+        """Возвращает название типа объекта на языке lang."""
+        titles = self.obj_types.get(int(obj_type_id))
+        if titles is None:
+            return None
+        return titles[0] if lang == 'ua' else titles[1]
+
+    def get_sort_params(self, lang: str) -> list:
+        """Возвращает включённые параметры сортировки (title, value) на языке lang."""
+        return [{'title': title_en if lang == 'en' else title_uk, 'value': value}
+                for title_uk, title_en, value in self.sort_params]
+
+
+_data: Optional[ReferenceData] = None
+_lock = threading.Lock()
+
+
+def _get_version() -> int:
+    return cache.get(VERSION_CACHE_KEY, 0)
+
+
+def invalidate() -> None:
+    """Сбрасывает справочные данные во всех процессах."""
+    global _data
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+    _data = None
+
+
+def _load(version: int) -> ReferenceData:
+    """Загружает справочные данные из БД."""
+    paid_services_settings, created = PaidServicesSettings.objects.get_or_create()
+    indexation_process = IndexationProcess.objects.filter(finish_date__isnull=False).order_by('-pk').first()
+
+    return ReferenceData(
+        version=version,
+        obj_types={x.pk: (x.obj_type_ua, x.obj_type_en) for x in ObjType.objects.all()},
+        sort_params=tuple(
+            SortParameter.objects.filter(is_enabled=True).order_by('-weight').values_list(
+                'title_uk', 'title_en', 'value'
+            )
+        ),
+        paid_services_enabled=paid_services_settings.enabled,
+        documents_count=indexation_process.documents_in_index if indexation_process else None,
+        last_finished_indexation_date=indexation_process.finish_date if indexation_process else None,
+    )
+
+
+def get_reference_data(request=None) -> ReferenceData:
+    """Возвращает справочные данные (из памяти процесса).
+    Если передан объект запроса, то данные запоминаются в нём и версия больше не проверяется."""
+    global _data
+    data = getattr(request, '_reference_data', None)
+    if data is not None:
+        return data
+
+    version = _get_version()
+    data = _data
+    if data is None or data.version != version:
+        with _lock:
+            if _data is None or _data.version != version:
+                _data = _load(version)
+            data = _data
+
+    if request is not None:
+        request._reference_data = data
+    return data
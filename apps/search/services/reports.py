@@ -7,13 +7,17 @@ from typing import List
 from abc import ABC, abstractmethod
 from pathlib import Path
 from datetime import datetime
+import io
 
+import billiard
 from docx import Document
 from docx.shared import Inches, Pt
 from docx.text.paragraph import Paragraph
+from docx.oxml.ns import qn
 from docx.image.exceptions import UnrecognizedImageError, UnexpectedEndOfFileError
 
 from django.conf import settings
+from django.db import connections
 
 
 class ReportItem(ABC):
@@ -2158,14 +2162,19 @@ class ReportWriterDocx(ReportWriter):
         },
     ]
 
-    def _set_font(self, document: Document(), font_name='Times New Roman'):
-        style = document.styles['Normal']
-        font = style.font
+    def __init__(self, items: List[ReportItemDocx], chunk_size: int = None, workers: int = None):
+        super().__init__(items)
+        self.chunk_size = chunk_size or getattr(settings, 'SEARCH_RESULTS_DOCX_CHUNK_SIZE', 50)
+        self.workers = workers or getattr(settings, 'SEARCH_RESULTS_DOCX_WORKERS', 4)
+
+    @staticmethod
+    def _create_document(font_name='Times New Roman') -> Document:
+        """Создаёт документ. Шрифт задаётся один раз в стиле Normal, который используют все абзацы отчёта."""
+        document = Document()
+        font = document.styles['Normal'].font
         font.name = font_name
         font.size = Pt(12)
-
-        for paragraph in document.paragraphs:
-            paragraph.style = document.styles['Normal']
+        return document
 
     def _get_obj_type_title(self, obj_type_id: int, obj_state: int, lang_code: str) -> str:
         for item in self._obj_type_titles:
@@ -2173,11 +2182,12 @@ class ReportWriterDocx(ReportWriter):
                 return item[lang_code]
         return ''
 
-    def generate(self, file_path: Path):
-        document = Document()
-        for i, item in enumerate(self.items):
+    def render(self, start: int = 0) -> Document:
+        """Записывает объекты в новый документ. start - количество объектов в предыдущих частях отчёта."""
+        document = self._create_document()
+        for i, item in enumerate(self.items, start + 1):
             p = document.add_paragraph()
-            p.add_run(f"{str(i + 1)}. ").bold = True
+            p.add_run(f"{str(i)}. ").bold = True
             obj_type_title = self._get_obj_type_title(
                 item.application_data['Document']['idObjType'],
                 item.application_data['search_data']['obj_state'],
@@ -2186,10 +2196,68 @@ class ReportWriterDocx(ReportWriter):
             if obj_type_title:
                 p.add_run(f" {obj_type_title}").bold = True
             item.write(document)
-        self._set_font(document)
+        return document
+
+    @staticmethod
+    def _append_document(document: Document, part: Document) -> None:
+        """Переносит содержимое документа part в конец документа document."""
+        body = document.element.body
+        sect_pr = body.sectPr
+        for element in list(part.element.body):
+            if element.tag == qn('w:sectPr'):
+                continue
+            # Изображения переносятся в пакет основного документа и привязываются к нему
+            for blip in element.iter(qn('a:blip')):
+                r_id = blip.get(qn('r:embed'))
+                if r_id:
+                    image_part = part.part.related_parts[r_id]
+                    new_r_id, _ = document.part.get_or_add_image(io.BytesIO(image_part.blob))
+                    blip.set(qn('r:embed'), new_r_id)
+            if sect_pr is not None:
+                sect_pr.addprevious(element)
+            else:
+                body.append(element)
+
+    def _render_parallel(self) -> Document:
+        """Формирует части отчёта в пуле процессов и объединяет их в один документ.
+        Используется пул billiard, т.к. отчёты формируются в процессах Celery worker (пул prefork),
+        которые являются демоническими, а multiprocessing не позволяет им создавать дочерние процессы."""
+        chunks = [self.items[i:i + self.chunk_size] for i in range(0, len(self.items), self.chunk_size)]
+        starts = range(0, len(self.items), self.chunk_size)
+
+        document = self._create_document()
+        with billiard.Pool(processes=min(self.workers, len(chunks)), initializer=_init_docx_worker) as pool:
+            for data in pool.starmap(_render_docx_chunk, zip(chunks, starts)):
+                self._append_document(document, Document(io.BytesIO(data)))
+
+        # Идентификаторы изображений должны быть уникальны в пределах документа
+        for i, doc_pr in enumerate(document.element.body.iter(qn('wp:docPr')), 1):
+            doc_pr.set('id', str(i))
+
+        return document
+
+    def generate(self, file_path: Path):
+        if self.workers > 1 and len(self.items) > self.chunk_size:
+            document = self._render_parallel()
+        else:
+            document = self.render()
         document.save(str(file_path))
 
 
+def _init_docx_worker() -> None:
+    """Дочерний процесс не должен использовать соединения с БД, унаследованные от родительского процесса
+    (их закрытие повлияло бы на родительский процесс), поэтому они заменяются новыми при первом запросе."""
+    for conn in connections.all():
+        conn.connection = None
+
+
+def _render_docx_chunk(items: List[ReportItemDocx], start: int) -> bytes:
+    """Формирует часть отчёта (выполняется в дочернем процессе) и возвращает содержимое файла .docx."""
+    stream = io.BytesIO()
+    ReportWriterDocx(items, workers=1).render(start).save(stream)
+    return stream.getvalue()
+
+
 class ReportWriterCreator(ABC):
     """Интерфейс создателя генератора отчётов."""
     @staticmethod
@@ -2207,25 +2275,27 @@ class ReportWriterCreator(ABC):
 
 class ReportWriterDocxCreator(ReportWriterCreator):
     """Класс, задачей которого есть создание объекта генератора отчётов в формате .docx."""
+    # Классы объектов отчёта по типам объектов пром. собств.
+    report_item_classes = {
+        1: ReportItemInv,
+        2: ReportItemUM,
+        3: ReportItemLD,
+        4: ReportItemDocxTM,
+        5: ReportItemDocxGeo,
+        6: ReportItemDocxID,
+        9: ReportItemDocxMadrid9,
+        10: ReportItemCopyright,
+        11: ReportItemAgreement,
+        12: ReportItemAgreementTransfer,
+        13: ReportItemCopyrightOfficialWork,
+        14: ReportItemDocxMadrid14,
+    }
+
     @staticmethod
     def create(applications: List[dict], inid_data: List[InidCode], lang_code: str = 'ua') -> ReportWriterDocx:
-        report_item_classes = {
-            1: ReportItemInv,
-            2: ReportItemUM,
-            3: ReportItemLD,
-            4: ReportItemDocxTM,
-            5: ReportItemDocxGeo,
-            6: ReportItemDocxID,
-            9: ReportItemDocxMadrid9,
-            10: ReportItemCopyright,
-            11: ReportItemAgreement,
-            12: ReportItemAgreementTransfer,
-            13: ReportItemCopyrightOfficialWork,
-            14: ReportItemDocxMadrid14,
-        }
         report_items = []
         for app in applications:
-            report_item = report_item_classes[app['Document']['idObjType']](
+            report_item = ReportWriterDocxCreator.report_item_classes[app['Document']['idObjType']](
                 application_data=app,
                 ipc_fields=inid_data,
                 lang_code=lang_code,
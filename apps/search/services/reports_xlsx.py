@@ -0,0 +1,92 @@
+"""Потоковое формирование Excel-файлов с результатами поиска.
+
+Документы получаются из ElasticSearch с помощью scroll частями по chunk_size,
+строки записываются в режиме constant_memory (в памяти находится только текущая строка листа).
+Уменьшенные изображения ТМ получаются из хранилища thumbnails в пуле потоков.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Optional
+import os
+
+from django.conf import settings
+
+from elasticsearch_dsl import Search
+import xlsxwriter
+
+from apps.search.models import ObjType
+from uma.utils import get_unique_filename
+from apps.search.utils import get_search_report_titles, get_search_report_row
+from apps.search.services import thumbnails as thumbnails_store
+
+# Номер столбца с изображением ТМ
+IMAGE_COLUMN = 15
+
+
+def _chunks(iterable: Iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_search_results_xlsx(s: Search, file_path: str, lang_code: str, user=None,
+                              on_progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """Записывает результаты поиска в Excel-файл. Возвращает количество записанных строк.
+    on_progress - функция, которая вызывается после записи каждой части документов (записано, всего)."""
+    chunk_size = getattr(settings, 'SEARCH_RESULTS_EXPORT_CHUNK_SIZE', 1000)
+    total = s.count()
+    obj_types = list(ObjType.objects.order_by('id').values_list('id', f"obj_type_{lang_code}"))
+
+    workbook = xlsxwriter.Workbook(file_path, {'constant_memory': True})
+    worksheet = workbook.add_worksheet()
+    bold = workbook.add_format({'bold': True})
+    worksheet.write_row(0, 0, get_search_report_titles(), bold)
+
+    row_num = 0
+    hits = s.params(size=chunk_size, preserve_order=True).scan()
+    with ThreadPoolExecutor(max_workers=getattr(settings, 'SEARCH_RESULTS_EXPORT_IMAGE_WORKERS', 8)) as executor:
+        for chunk in _chunks(hits, chunk_size):
+            rows = [get_search_report_row(h, obj_types, user) for h in chunk]
+            thumbnails = executor.map(
+                lambda img_path: thumbnails_store.get_thumbnail(img_path, 'report'),
+                [row[IMAGE_COLUMN] for row in rows]
+            )
+
+            for row, thumbnail in zip(rows, thumbnails):
+                row_num += 1
+                worksheet.write_row(row_num, 0, row[:IMAGE_COLUMN])
+                if thumbnail:
+                    worksheet.insert_image(
+                        row_num,
+                        IMAGE_COLUMN,
+                        thumbnail,
+                        {
+                            'x_offset': 2,
+                            'y_offset': 2,
+                            'x_scale': 0.3,
+                            'y_scale': 0.3,
+                        }
+                    )
+                else:
+                    worksheet.write(row_num, IMAGE_COLUMN, row[IMAGE_COLUMN])
+
+            if on_progress:
+                on_progress(row_num, total)
+
+    workbook.close()
+    return row_num
+
+
+def create_search_results_xlsx(s: Search, file_prefix: str, lang_code: str, user=None,
+                               on_progress: Optional[Callable[[int, int], None]] = None) -> str:
+    """Формирует Excel-файл с результатами поиска в каталоге MEDIA_ROOT/search_results и возвращает его url."""
+    directory_path = os.path.join(settings.MEDIA_ROOT, 'search_results')
+    os.makedirs(directory_path, exist_ok=True)
+    file_name = f"{get_unique_filename(file_prefix)}.xlsx"
+
+    write_search_results_xlsx(s, os.path.join(directory_path, file_name), lang_code, user, on_progress)
+
+    return os.path.join(settings.MEDIA_URL, 'search_results', file_name)
@@ -0,0 +1,198 @@
+"""Кэш результатов поиска.
+
+Для поискового запроса в кэше хранятся агрегация для фильтров в сайдбаре, общее количество результатов
+и идентификаторы (вместе со значениями сортировки для курсоров пагинации) первых SEARCH_RESULTS_CACHE_SIZE
+результатов. Страницы в пределах этого списка получаются из ElasticSearch только по идентификаторам.
+Страницы за пределами этого списка получаются с помощью search_after по курсору из ссылок пагинации,
+поэтому стоимость запроса не зависит от номера страницы.
+Ключ кэша содержит версию индекса, которая увеличивается по окончании индексации.
+"""
+from typing import List, Optional, Tuple
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from elasticsearch import Elasticsearch, exceptions as elasticsearch_exceptions
+from elasticsearch_dsl import Search, MultiSearch, Q
+
+from apps.search.utils import get_filters_aggregations, reverse_sort, get_user_access_data
+
+INDEX_VERSION_CACHE_KEY = 'search_index_version'
+
+# Параметры запроса, которые не влияют на результаты поиска
+IGNORED_PARAMS = ('page', 'after', 'before', 'csrfmiddlewaretoken', 'g-recaptcha-response')
+
+
+def get_index_version() -> int:
+    """Возвращает текущую версию индекса."""
+    return cache.get(INDEX_VERSION_CACHE_KEY, 0)
+
+
+def bump_index_version() -> None:
+    """Увеличивает версию индекса (все ранее закэшированные результаты становятся недействительными)."""
+    try:
+        cache.incr(INDEX_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(INDEX_VERSION_CACHE_KEY, 1, None)
+
+
+def get_user_access_class(user) -> str:
+    """Возвращает класс доступа пользователя к данным."""
+    if user.is_anonymous:
+        return 'anonymous'
+    if get_user_access_data(user)['is_vip']:
+        return 'vip'
+    return 'user'
+
+
+def get_key(search_type: str, get_params: dict, user) -> str:
+    """Возвращает ключ кэша для поискового запроса."""
+    params = {}
+    for key, value in get_params.items():
+        if key in IGNORED_PARAMS:
+            continue
+        values = value if isinstance(value, list) else [value]
+        values = [str(x).strip() for x in values]
+        # Порядок значений фильтров не имеет значения
+        params[key] = sorted(values) if key.startswith('filter_') else values
+
+    canonical = json.dumps(
+        [search_type, get_user_access_class(user), sorted(params.items())],
+        ensure_ascii=False
+    )
+    digest = hashlib.sha1(canonical.encode()).hexdigest()
+    return f"search_results_{get_index_version()}_{digest}"
+
+
+def _get_client() -> Elasticsearch:
+    return Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
+
+
+def _get_request_timeout(deadline: Optional[float]) -> Optional[float]:
+    """Возвращает время (сек.), оставшееся до deadline (значение time.monotonic()).
+    Вызывает ConnectionTimeout, если время истекло."""
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise elasticsearch_exceptions.ConnectionTimeout('TIMEOUT', 'Search time budget exceeded', None)
+    return remaining
+
+
+def _hit_to_dict(hit) -> dict:
+    item = hit.to_dict()
+    item['meta'] = hit.meta.to_dict()
+    return item
+
+
+def _get_hits_by_ids(s: Search, ids: List[str], sort_values: Optional[List[list]] = None,
+                     request_timeout: Optional[float] = None) -> List[dict]:
+    """Возвращает документы по их идентификаторам в порядке следования идентификаторов.
+    sort_values - значения сортировки документов (meta.sort) в том же порядке, что и ids."""
+    if not ids:
+        return []
+    s_ids = Search(using=_get_client(), index=settings.ELASTIC_INDEX_NAME).query(Q('ids', values=ids))
+    if request_timeout:
+        s_ids = s_ids.params(request_timeout=request_timeout)
+    source = s.to_dict().get('_source')
+    if source is not None:
+        s_ids = s_ids.extra(_source=source)
+    hits = {hit.meta.id: _hit_to_dict(hit) for hit in s_ids[0:len(ids)].execute()}
+    if sort_values:
+        # Значения сортировки необходимы для курсоров пагинации (см. get_page_cursors)
+        for x, sort in zip(ids, sort_values):
+            if x in hits:
+                hits[x]['meta']['sort'] = sort
+    return [hits[x] for x in ids if x in hits]
+
+
+def _get_hits_by_cursor(s: Search, size: int, search_after: Optional[list], search_before: Optional[list],
+                        with_aggregations: bool, request_timeout: Optional[float] = None):
+    """Выполняет запрос страницы результатов, следующей за документом с search_after
+    или предшествующей документу с search_before."""
+    body = s.to_dict()
+    if not with_aggregations:
+        body.pop('aggs', None)
+    body.update({'from': 0, 'size': size})
+    if search_after is not None:
+        body['search_after'] = search_after
+    else:
+        # Предыдущая страница: обратный порядок сортировки, документы затем разворачиваются
+        body['sort'] = reverse_sort(body.get('sort', []))
+        body['search_after'] = search_before
+    s_cursor = Search(using=_get_client(), index=settings.ELASTIC_INDEX_NAME).update_from_dict(body)
+    if request_timeout:
+        s_cursor = s_cursor.params(request_timeout=request_timeout)
+    response = s_cursor.execute()
+    hits = [_hit_to_dict(hit) for hit in response]
+    if search_after is None:
+        hits.reverse()
+    return hits, response
+
+
+def get_results_page(s: Search, key: Optional[str], res_from: int, res_to: int,
+                     deadline: Optional[float] = None, search_after: Optional[list] = None,
+                     search_before: Optional[list] = None) -> Tuple[List[dict], int, dict]:
+    """Возвращает документы страницы результатов, общее количество результатов и агрегацию для фильтров.
+    s - запрос, подготовленный функцией filter_results (с однозначной сортировкой, см. add_sort_tiebreaker).
+    deadline - время (time.monotonic()), до которого должны быть выполнены все запросы к ElasticSearch
+    (иначе вызывается ConnectionTimeout).
+    search_after, search_before - значения сортировки последнего документа предыдущей страницы
+    или первого документа следующей страницы (курсор пагинации)."""
+    cache_size = getattr(settings, 'SEARCH_RESULTS_CACHE_SIZE', 1000)
+    cached = cache.get(key) if key else None
+
+    if cached and (res_to <= len(cached['ids']) or len(cached['ids']) >= cached['total']):
+        hits = _get_hits_by_ids(
+            s,
+            cached['ids'][res_from:res_to],
+            cached.get('sort', [])[res_from:res_to],
+            _get_request_timeout(deadline)
+        )
+        return hits, cached['total'], cached['aggregations']
+
+    if search_after is not None or search_before is not None:
+        hits, response = _get_hits_by_cursor(
+            s, res_to - res_from, search_after, search_before, cached is None, _get_request_timeout(deadline)
+        )
+        if cached:
+            return hits, cached['total'], cached['aggregations']
+        return hits, response.hits.total, get_filters_aggregations(response)
+
+    request_timeout = _get_request_timeout(deadline)
+    if not key or res_to > cache_size:
+        if request_timeout:
+            s = s.params(request_timeout=request_timeout)
+        response = s[res_from:res_to].execute()
+        return [_hit_to_dict(hit) for hit in response], response.hits.total, get_filters_aggregations(response)
+
+    # Страница и идентификаторы первых результатов получаются одним запросом (msearch)
+    ids_body = s.to_dict()
+    ids_body.pop('aggs', None)
+    ids_body.update({'_source': False, 'from': 0, 'size': cache_size})
+    ms = MultiSearch(using=_get_client(), index=settings.ELASTIC_INDEX_NAME)
+    if request_timeout:
+        ms = ms.params(request_timeout=request_timeout)
+    ms = ms.add(
+        s[res_from:res_to]
+    ).add(
+        Search.from_dict(ids_body)
+    )
+    response, ids_response = ms.execute()
+
+    aggregations = get_filters_aggregations(response)
+    cache.set(
+        key,
+        {
+            'ids': [hit.meta.id for hit in ids_response],
+            'sort': [hit.meta.to_dict().get('sort') for hit in ids_response],
+            'total': response.hits.total,
+            'aggregations': aggregations,
+        },
+        getattr(settings, 'SEARCH_RESULTS_CACHE_TIMEOUT', 600)
+    )
+
+    return [_hit_to_dict(hit) for hit in response], response.hits.total, aggregations
@@ -8,13 +8,15 @@ from zipfile import ZipFile
 from django.utils.translation import gettext as _
 from django.conf import settings
 from django.utils import translation
+from django.db.models import Max, Q as Q_db, QuerySet
 
 from elasticsearch import Elasticsearch
 from elasticsearch_dsl import Search, Q
 
-from apps.search.models import IpcAppList, DeliveryDateCead, OrderService, OrderDocument
+from apps.search.models import IpcAppList, DeliveryDateCead, OrderService, OrderDocument, ChangeJournalCursor
 from apps.bulletin import services as bulletin_services
-from apps.search.utils import filter_bad_apps, user_has_access_to_docs
+from apps.search.utils import filter_bad_apps, user_has_access_to_docs, get_derived_fields, parse_iso_date
+from apps.search.services import source_fields
 from apps.search.dataclasses import InidCode, ApplicationDocument, ServiceExecuteResult, ServiceExecuteResultError
 
 from uma.utils import get_user_or_anonymous
@@ -22,6 +24,10 @@ from uma.utils import get_user_or_anonymous
 
 def application_get_stages_statuses(app_data: dict) -> Optional[List]:
     """Возвращает список со статусами этапов рассмотрения заявки."""
+    derived = get_derived_fields(app_data)
+    if derived and 'stages' in derived:
+        return derived['stages']
+
     obj_types_funcs = {
         1: application_get_inv_um_ld_stages_statuses,
         2: application_get_inv_um_ld_stages_statuses,
@@ -261,6 +267,10 @@ def application_get_tm_stages_statuses(app_data: dict) -> List:
 
 def application_get_tm_fixed_mark_status_code(app_data):
     """Анализирует список документов ТМ и возвращает код статуса согласно их наличию."""
+    derived = get_derived_fields(app_data)
+    if derived and derived.get('mark_status_code') is not None:
+        return derived['mark_status_code']
+
     result = int(app_data['Document'].get('MarkCurrentStatusCodeType', 0))
     for doc in app_data['TradeMark'].get('DocFlow', {}).get('Documents', []):
         if ('ТM-1.1' in doc['DocRecord']['DocType'] or 'ТМ-1.1' in doc['DocRecord']['DocType']) and result < 2000:
@@ -346,7 +356,7 @@ def application_sort_transactions(app_data: dict) -> None:
     if app_data['Document']['idObjType'] in (1, 2, 3):
         transactions = app_data['transactions']
         transactions.sort(
-            key=lambda item: time.strptime(item.get('BULLETIN_DATE', '1970-01-01'), "%Y-%m-%d")
+            key=lambda item: parse_iso_date(item.get('BULLETIN_DATE', '1970-01-01'))
         )
 
     # Торговые марки
@@ -357,7 +367,7 @@ def application_sort_transactions(app_data: dict) -> None:
             pass
         else:
             transactions.sort(
-                key=lambda item: time.strptime(item.get('@bulletinDate', '1970-01-01'), "%Y-%m-%d")
+                key=lambda item: parse_iso_date(item.get('@bulletinDate', '1970-01-01'))
             )
 
     # Геогр. зазначення
@@ -368,7 +378,7 @@ def application_sort_transactions(app_data: dict) -> None:
             pass
         else:
             transactions.sort(
-                key=lambda item: time.strptime(item.get('@bulletinDate', '1970-01-01'), "%Y-%m-%d")
+                key=lambda item: parse_iso_date(item.get('@bulletinDate', '1970-01-01'))
             )
 
     # Пром. образцы
@@ -379,7 +389,7 @@ def application_sort_transactions(app_data: dict) -> None:
             pass
         else:
             transactions.sort(
-                key=lambda item: time.strptime(item.get('@bulletinDate', '1970-01-01'), "%Y-%m-%d")
+                key=lambda item: parse_iso_date(item.get('@bulletinDate', '1970-01-01'))
             )
 
 
@@ -491,7 +501,7 @@ def application_get_app_elasticsearch_data(app_id: int, exclude_bad_apps: bool =
         q = filter_bad_apps(q)
 
     s = Search(index=settings.ELASTIC_INDEX_NAME).using(client).query(q).source(
-        excludes=["*.DocBarCode", "*.DOCBARCODE"]
+        **source_fields.get_source(source_fields.DETAIL)
     ).execute()
 
     if not s:
@@ -1037,6 +1047,49 @@ def inid_code_get_list(lang: str) -> List[InidCode]:
     return res
 
 
+def change_journal_q(since: datetime.datetime | None, watermark: datetime.datetime | None,
+                     field: str = 'lastupdate') -> Q_db:
+    """Возвращает условие отбора записей, значение поля field которых попадает в диапазон (since, watermark]."""
+    q = Q_db()
+    if since:
+        q &= Q_db(**{f"{field}__gt": since})
+    if watermark:
+        q &= Q_db(**{f"{field}__lte": watermark})
+    return q
+
+
+def change_journal_filter(queryset: QuerySet, since: datetime.datetime | None, watermark: datetime.datetime | None,
+                          field: str = 'lastupdate') -> QuerySet:
+    """Оставляет в queryset записи, значение поля field которых попадает в диапазон (since, watermark]."""
+    return queryset.filter(change_journal_q(since, watermark, field))
+
+
+def change_journal_get_range(name: str, queryset: QuerySet,
+                             field: str = 'lastupdate') -> tuple[datetime.datetime | None, datetime.datetime | None]:
+    """Возвращает диапазон изменений (since, watermark] записей queryset,
+    которые ещё не обработаны потребителем name."""
+    cursor, created = ChangeJournalCursor.objects.get_or_create(name=name)
+    since = None
+    if cursor.watermark:
+        # Перекрытие защищает от пропуска записей, транзакции которых зафиксированы с опозданием
+        since = cursor.watermark - datetime.timedelta(
+            seconds=getattr(settings, 'CHANGE_JOURNAL_OVERLAP_SECONDS', 300)
+        )
+
+    # Записи, изменённые во время обработки, попадут в следующий запуск
+    watermark = change_journal_filter(queryset, since, None, field).aggregate(watermark=Max(field))['watermark']
+
+    return since, watermark
+
+
+def change_journal_commit(name: str, watermark: datetime.datetime | None, processed_count: int) -> None:
+    """Сохраняет контрольную точку потребителя name после успешной обработки изменений."""
+    values = {'processed_count': processed_count}
+    if watermark:
+        values['watermark'] = watermark
+    ChangeJournalCursor.objects.update_or_create(name=name, defaults=values)
+
+
 def document_get_receive_date_cead(id_doc_cead: int) -> datetime.datetime | None:
     """Получает (из ЦЕАД) дату получения документа заявителем."""
     item = DeliveryDateCead.objects.using('e_archive').filter(id_doc_cead=id_doc_cead).first()
@@ -0,0 +1,162 @@
+"""Наборы полей документов индекса (_source), которые запрашиваются из ElasticSearch.
+
+Для каждого представления (список результатов поиска, выгрузка в Excel, выгрузка в docx, страница объекта)
+задаются поля по типам объектов. Поля search_data и Document, а также поля, которые необходимы
+для проверки доступа к данным заявки (filter_app_data, user_has_access_to_docs), запрашиваются всегда.
+Для страницы объекта запрашивается документ полностью.
+"""
+from typing import Iterable, Optional
+
+LIST = 'list'
+EXPORT_XLSX = 'export-xlsx'
+EXPORT_DOCX = 'export-docx'
+DETAIL = 'detail'
+
+EXCLUDES = ['*.DocBarCode', '*.DOCBARCODE']
+
+COMMON = ['search_data', 'Document']
+
+
+def _biblio(*fields: str) -> list:
+    """Поля заявки (Claim) и охранного документа (Patent) на изобретение, полезную модель, топографию."""
+    return [f"{root}.{field}" for root in ('Claim', 'Patent') for field in fields]
+
+
+# Поля, необходимые для проверки доступа к данным заявки
+ACCESS = {
+    1: ['Claim.I_43.D', *_biblio('I_98')],
+    2: _biblio('I_98'),
+    3: _biblio('I_98'),
+    4: [
+        'TradeMark.TrademarkDetails.Code_441',
+        'TradeMark.TrademarkDetails.CorrespondenceAddress',
+        'TradeMark.DocFlow.Documents.DocRecord.DocType',
+    ],
+    5: ['Geo.GeoDetails.ApplicationPublicationDetails'],
+    6: ['Design.DesignDetails.CorrespondenceAddress'],
+}
+
+_TM_NICE_CLASSES = 'TradeMark.TrademarkDetails.GoodsServicesDetails.GoodsServices.ClassDescriptionDetails.' \
+                   'ClassDescription.ClassNumber'
+
+PROJECTIONS = {
+    # Список результатов поиска (шаблоны search/advanced/_partials/*_item.html)
+    LIST: {
+        1: _biblio('IPC', 'I_11', 'I_12', 'I_21', 'I_22', 'I_45.D', 'I_71', 'I_72', 'I_73'),
+        2: _biblio('IPC', 'I_11', 'I_12', 'I_21', 'I_22', 'I_45.D', 'I_71', 'I_72', 'I_73'),
+        3: _biblio('I_11', 'I_21', 'I_22', 'I_24', 'I_54', 'I_71', 'I_72', 'I_73'),
+        4: [
+            'TradeMark.TrademarkDetails.ApplicationNumber',
+            'TradeMark.TrademarkDetails.ApplicationDate',
+            'TradeMark.TrademarkDetails.RegistrationNumber',
+            'TradeMark.TrademarkDetails.RegistrationDate',
+            'TradeMark.TrademarkDetails.ApplicantDetails',
+            'TradeMark.TrademarkDetails.HolderDetails',
+            'TradeMark.TrademarkDetails.MarkImageDetails',
+            _TM_NICE_CLASSES,
+        ],
+        5: [
+            'Geo.GeoDetails.ApplicationNumber',
+            'Geo.GeoDetails.ApplicationDate',
+            'Geo.GeoDetails.RegistrationNumber',
+            'Geo.GeoDetails.RegistrationDate',
+            'Geo.GeoDetails.ProductName',
+            'Geo.GeoDetails.HolderDetails',
+            'Geo.GeoDetails.GeoImageDetails',
+        ],
+        6: [
+            'Design.DesignDetails.DesignApplicationNumber',
+            'Design.DesignDetails.DesignApplicationDate',
+            'Design.DesignDetails.RegistrationNumber',
+            'Design.DesignDetails.RecordEffectiveDate',
+            'Design.DesignDetails.ApplicantDetails',
+            'Design.DesignDetails.HolderDetails',
+            'Design.DesignDetails.IndicationProductDetails',
+            'Design.DesignDetails.DesignSpecimenDetails',
+        ],
+        9: [
+            'MadridTradeMark.TradeMarkDetails.@INTREGN',
+            'MadridTradeMark.TradeMarkDetails.@INTREGD',
+            'MadridTradeMark.TradeMarkDetails.HOLGR',
+            'MadridTradeMark.TradeMarkDetails.BASICGS.GSGR.@NICCLAI',
+        ],
+        10: [
+            'Certificate.CopyrightDetails.Name',
+            'Certificate.CopyrightDetails.ApplicantDetails',
+            'Certificate.CopyrightDetails.AuthorDetails',
+        ],
+        11: [
+            'Decision.DecisionDetails.Name',
+            'Decision.DecisionDetails.CopyrightObjectKindDetails',
+            'Decision.DecisionDetails.AuthorDetails',
+            'Decision.DecisionDetails.LicensorDetails',
+            'Decision.DecisionDetails.LicenseeDetails',
+        ],
+    },
+    # Выгрузка результатов поиска в Excel (get_search_report_row)
+    EXPORT_XLSX: {
+        1: _biblio('IPC', 'I_71', 'I_72', 'I_73'),
+        2: _biblio('IPC', 'I_71', 'I_72', 'I_73'),
+        3: _biblio('I_71', 'I_72', 'I_73'),
+        4: [
+            'TradeMark.TrademarkDetails.ApplicantDetails',
+            'TradeMark.TrademarkDetails.HolderDetails',
+            'TradeMark.TrademarkDetails.MarkImageDetails',
+            _TM_NICE_CLASSES,
+        ],
+        5: ['Geo.GeoDetails.HolderDetails'],
+        6: [
+            'Design.DesignDetails.ApplicantDetails',
+            'Design.DesignDetails.HolderDetails',
+            'Design.DesignDetails.DesignerDetails',
+            'Design.DesignDetails.IndicationProductDetails',
+        ],
+        9: [
+            'MadridTradeMark.TradeMarkDetails.HOLGR',
+            'MadridTradeMark.TradeMarkDetails.Code_441',
+            'MadridTradeMark.TradeMarkDetails.BASICGS.GSGR.@NICCLAI',
+        ],
+        10: [
+            'Certificate.CopyrightDetails.ApplicantDetails',
+            'Certificate.CopyrightDetails.HolderDetails',
+            'Certificate.CopyrightDetails.AuthorDetails',
+        ],
+        11: ['Decision.DecisionDetails.ApplicantDetails', 'Decision.DecisionDetails.AuthorDetails'],
+    },
+    # Выгрузка результатов поиска в docx (ReportItemDocx*)
+    EXPORT_DOCX: {
+        1: _biblio('*'),
+        2: _biblio('*'),
+        3: _biblio('*'),
+        4: ['TradeMark.TrademarkDetails'],
+        5: ['Geo.GeoDetails'],
+        6: ['Design.DesignDetails'],
+        9: ['MadridTradeMark.TradeMarkDetails'],
+        10: ['Certificate.CopyrightDetails'],
+        11: ['Decision.DecisionDetails'],
+    },
+    # Страница объекта (документ полностью)
+    DETAIL: None,
+}
+
+# Типы объектов, данные которых имеют одинаковую структуру
+for _projection in PROJECTIONS.values():
+    if _projection:
+        _projection[12] = _projection[11]
+        _projection[13] = _projection[10]
+        _projection[14] = _projection[9]
+
+
+def get_source(view: str, obj_types: Optional[Iterable[int]] = None) -> dict:
+    """Возвращает параметры _source (includes, excludes) для представления view
+    и типов объектов obj_types (по умолчанию - все типы объектов)."""
+    projection = PROJECTIONS[view]
+    if projection is None:
+        return {'excludes': EXCLUDES}
+
+    includes = list(COMMON)
+    for obj_type_id in obj_types or projection:
+        for field in projection.get(obj_type_id, []) + ACCESS.get(obj_type_id, []):
+            if field not in includes:
+                includes.append(field)
+    return {'includes': includes, 'excludes': EXCLUDES}
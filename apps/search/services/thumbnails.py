@@ -0,0 +1,142 @@
+"""Хранилище уменьшенных изображений (ТМ, промышленные образцы и т.д.).
+
+Исходные изображения находятся в MEDIA_ROOT (сетевой диск), уменьшенные копии нескольких фиксированных
+размеров хранятся на локальном диске в THUMBNAILS_ROOT. Ключ копии - путь к исходному файлу
+и время его изменения, поэтому при замене исходного изображения формируется новая копия.
+Копии формируются при первом обращении (или при индексации, см. THUMBNAILS_GENERATE_ON_INDEX).
+Время изменения копии обновляется при обращении к ней, копии, к которым давно не обращались,
+удаляются периодической задачей evict_thumbnails (см. uma/celery.py), если общий размер хранилища превышает THUMBNAILS_MAX_SIZE.
+"""
+from typing import Optional
+import hashlib
+import io
+import os
+import tempfile
+import time
+
+from django.conf import settings
+
+from PIL import Image
+
+# Размеры копий: высота изображения (пикс.) и качество JPEG
+SIZES = {
+    'report': {'height': 120, 'quality': 50},
+    'list': {'height': 300, 'quality': 80},
+}
+
+# Интервал (сек.), чаще которого время последнего обращения к копии не обновляется
+TOUCH_INTERVAL = 3600
+
+# Доля THUMBNAILS_MAX_SIZE, до которой уменьшается хранилище при очистке,
+# чтобы очистка не запускалась на каждое новое изображение
+EVICT_TARGET_RATIO = 0.9
+
+
+def get_root() -> str:
+    """Возвращает путь к каталогу хранилища."""
+    return getattr(settings, 'THUMBNAILS_ROOT', os.path.join(settings.BASE_DIR, 'cache', 'thumbnails'))
+
+
+def resize_image(img_path: str, height: int, quality: int) -> bytes:
+    """Изменяет размер изображения (с сохранением пропорций) и возвращает его в формате JPEG."""
+    image = Image.open(img_path)
+
+    height_percent = (height / float(image.size[1]))
+    width_size = max(int((float(image.size[0]) * float(height_percent))), 1)
+    image = image.resize((width_size, height), Image.LANCZOS)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    img_byte_arr = io.BytesIO()
+    image.save(img_byte_arr, format='JPEG', optimize=True, quality=quality)
+    return img_byte_arr.getvalue()
+
+
+def _get_path(img_path: str, mtime: int, size: str) -> str:
+    digest = hashlib.sha1(f"{img_path}:{mtime}".encode()).hexdigest()
+    return os.path.join(get_root(), size, digest[:2], f"{digest}.jpg")
+
+
+def get_thumbnail(img_path: str, size: str = 'list') -> Optional[str]:
+    """Возвращает путь к уменьшенной копии изображения (формирует её, если она ещё не сформирована).
+    Возвращает None, если исходное изображение не существует или не может быть прочитано."""
+    if not img_path:
+        return None
+    try:
+        mtime = os.stat(img_path).st_mtime_ns
+    except OSError:
+        return None
+
+    thumbnail_path = _get_path(img_path, mtime, size)
+    try:
+        if os.stat(thumbnail_path).st_mtime < time.time() - TOUCH_INTERVAL:
+            os.utime(thumbnail_path)
+    except FileNotFoundError:
+        # Копия ещё не сформирована или удалена при очистке хранилища
+        pass
+    else:
+        return thumbnail_path
+
+    try:
+        data = resize_image(img_path, **SIZES[size])
+    except (OSError, ValueError):
+        return None
+
+    os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+    # Запись во временный файл (уникальный для каждого потока) и переименование,
+    # чтобы параллельные процессы и потоки не прочли неполный файл
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(thumbnail_path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, thumbnail_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+    return thumbnail_path
+
+
+def generate(img_path: str) -> None:
+    """Формирует копии изображения всех размеров."""
+    for size in SIZES:
+        get_thumbnail(img_path, size)
+
+
+def evict(max_size: Optional[int] = None) -> int:
+    """Если общий размер хранилища превышает max_size (по умолчанию THUMBNAILS_MAX_SIZE), удаляет копии,
+    к которым дольше всего не обращались, пока размер не станет меньше max_size * EVICT_TARGET_RATIO.
+    Возвращает количество удалённых файлов."""
+    if max_size is None:
+        max_size = getattr(settings, 'THUMBNAILS_MAX_SIZE', 2 * 1024 ** 3)
+
+    files = []
+    total_size = 0
+    for dir_path, dir_names, file_names in os.walk(get_root()):
+        for file_name in file_names:
+            path = os.path.join(dir_path, file_name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+    if total_size <= max_size:
+        return 0
+
+    target_size = max_size * EVICT_TARGET_RATIO
+    removed_count = 0
+    for mtime, file_size, path in sorted(files):
+        if total_size <= target_size:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= file_size
+        removed_count += 1
+    return removed_count
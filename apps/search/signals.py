@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (SimpleSearchField, InidCodeSchedule, ElasticIndexField, ObjType, SortParameter,
+                     PaidServicesSettings, IndexationProcess)
+from .services import query_compiler, reference_data
+
+
+@receiver([post_save, post_delete], sender=SimpleSearchField)
+@receiver([post_save, post_delete], sender=InidCodeSchedule)
+@receiver([post_save, post_delete], sender=ElasticIndexField)
+@receiver([post_save, post_delete], sender=ObjType)
+def invalidate_query_compiler(sender, **kwargs):
+    """Сбрасывает соответствие параметров поиска полям индекса при их изменении."""
+    query_compiler.invalidate()
+
+
+@receiver([post_save, post_delete], sender=ObjType)
+@receiver([post_save, post_delete], sender=SortParameter)
+@receiver([post_save, post_delete], sender=PaidServicesSettings)
+@receiver([post_save, post_delete], sender=IndexationProcess)
+def invalidate_reference_data(sender, **kwargs):
+    """Сбрасывает справочные данные при их изменении."""
+    reference_data.invalidate()
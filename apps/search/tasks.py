@@ -8,15 +8,17 @@ from django.utils.translation import gettext as _
 from django.db.models import F
 from django_celery_results.models import TaskResult
 from django.utils.timezone import now
-from .models import SimpleSearchField, AppDocuments, ObjType, IpcAppList, OrderService
-from .utils import (prepare_query, sort_results, filter_results, extend_doc_flow, get_search_groups,
-                    get_elastic_results, get_search_in_transactions, get_transactions_types, get_completed_order,
+from .models import AppDocuments, ObjType, IpcAppList, OrderService
+from .utils import (sort_results, filter_results, get_filters_aggregations, apply_filters, extend_doc_flow,
+                    get_search_in_transactions, get_transactions_types, get_completed_order,
                     create_selection_inv_um_ld, get_data_for_selection_tm, create_selection_tm,
-                    prepare_data_for_search_report, create_search_res_doc, sort_doc_flow,
-                    filter_app_data, filter_bad_apps)
+                    sort_doc_flow, get_derived_fields,
+                    filter_app_data, add_sort_tiebreaker, decode_search_cursor, get_page_cursors)
 from .dataclasses import ServiceExecuteResult, ServiceExecuteResultError
 from apps.search.services.reports import ReportWriterDocxCreator
-from uma.utils import get_unique_filename, get_user_or_anonymous
+from apps.search.services.reports_xlsx import create_search_results_xlsx
+from apps.search.services import query_compiler, results_cache, thumbnails, source_fields, details_cache
+from uma.utils import get_unique_filename, get_user_or_anonymous, get_progress_callback
 from .forms import AdvancedSearchForm, SimpleSearchForm, get_search_form
 import apps.search.services as search_services
 import os
@@ -30,8 +32,11 @@ from typing import List
 
 
 @shared_task
-def perform_simple_search(user_id, get_params):
-    """Задача для выполнения простого поиска."""
+def perform_simple_search(user_id, get_params, request_timeout=None):
+    """Задача для выполнения простого поиска.
+    request_timeout - ограничение общего времени поиска (сек.) при выполнении поиска в процессе веб-сервера
+    (при превышении вызывается ConnectionTimeout)."""
+    deadline = time.monotonic() + request_timeout if request_timeout else None
     formset = get_search_form('simple', get_params)
     # Валидация запроса
     try:
@@ -49,66 +54,22 @@ def perform_simple_search(user_id, get_params):
             'get_params': get_params
         }
 
-    # Формирование поискового запроса ElasticSearch
-    client = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
-
     # Пользователь
     user = get_user_or_anonymous(user_id)
 
-    qs = None
-    for s in formset.cleaned_data:
-        if s:
-            elastic_field = SimpleSearchField.objects.get(pk=s['param_type']).elastic_index_field
-            if elastic_field:
-                query = prepare_query(s['value'], elastic_field)
-
-                if elastic_field.field_type == 'text':
-                    fields = [
-                        f"{elastic_field.field_name}^2",
-                        f"{elastic_field.field_name}.exact^3",
-                        f"{elastic_field.field_name}.*",
-                    ]
-                else:
-                    fields = [
-                        f"{elastic_field.field_name}",
-                    ]
-
-                q = Q(
-                    'query_string',
-                    query=query,
-                    fields=fields,
-                    quote_field_suffix=".exact",
-                    default_operator='AND'
-                )
-
-                # Nested тип
-                if elastic_field.parent:
-                    q = Q(
-                        'nested',
-                        path=elastic_field.parent.field_name,
-                        query=q,
-                    )
-
-                if qs is not None:
-                    qs &= q
-                else:
-                    qs = q
-
-    # Не включать в список результатов заявки, по которым выдан патент
-    qs = filter_bad_apps(qs)
-
-    s = Search(using=client, index=settings.ELASTIC_INDEX_NAME).query(qs).source(
-        excludes=["*.DocBarCode", "*.DOCBARCODE"]
-    )
+    # Формирование поискового запроса ElasticSearch
+    s = query_compiler.get_search(query_compiler.compile_simple_query(formset.cleaned_data))
+    s = s.source(**source_fields.get_source(source_fields.LIST))
 
     # Сортировка
     if get_params.get('sort_by'):
         s = sort_results(s, get_params['sort_by'][0])
     else:
         s = s.sort('_score')
+    s = add_sort_tiebreaker(s)
 
     # Фильтрация, агрегация
-    s, aggregations = filter_results(s, get_params)
+    s = filter_results(s, get_params)
 
     results_on_page = int(get_params.get('show', [10])[0])
     if results_on_page > 100:
@@ -117,14 +78,21 @@ def perform_simple_search(user_id, get_params):
         results_on_page = 10
     res_from = results_on_page * (int(get_params['page'][0]) - 1) if get_params.get('page') else 0
     res_to = res_from + results_on_page
-    items = []
-    for i in s[res_from:res_to]:
-        item = i.to_dict()
-        item['meta'] = i.meta.to_dict()
-        items.append(filter_app_data(item, user))
+    # Курсор пагинации действителен только для той же сортировки и количества результатов на странице
+    cursor_context = f"{get_params.get('sort_by', [''])[0]}:{results_on_page}"
+    hits, total, aggregations = results_cache.get_results_page(
+        s,
+        results_cache.get_key('simple', get_params, user),
+        res_from,
+        res_to,
+        deadline,
+        search_after=decode_search_cursor(get_params.get('after', [None])[0], cursor_context) if res_from else None,
+        search_before=decode_search_cursor(get_params.get('before', [None])[0], cursor_context) if res_from else None,
+    )
     results = {
-        'items': items,
-        'total': s.count()
+        'items': [filter_app_data(item, user) for item in hits],
+        'total': total,
+        **get_page_cursors(hits, cursor_context)
     }
 
     return {
@@ -136,7 +104,7 @@ def perform_simple_search(user_id, get_params):
 
 @shared_task(expires=10)
 def validate_query(get_params):
-    """Задача для выполнения валидации запрсоа на поиск средствами ElasticSearch."""
+    """Задача для выполнения валидации запроса на поиск (см. query_validator)."""
     for key, value in get_params.items():
         if len(value) == 1 and key not in ('obj_state', 'obj_type'):
             get_params[key] = value[0]
@@ -151,15 +119,12 @@ def validate_query(get_params):
     return form.is_valid()
 
 
-@shared_task
-def get_app_details(id_app_number: int, user_id: int) -> dict:
-    """Задача для получения деталей по заявке."""
+def prepare_app_details(id_app_number: int) -> dict:
+    """Возвращает данные заявки для страницы объекта (до фильтрации данных для пользователя)."""
     hit = search_services.application_get_app_elasticsearch_data(id_app_number)
     if not hit:
         return {}
 
-    user = get_user_or_anonymous(user_id)
-
     if hit['Document']['idObjType'] in (1, 2, 3):
         hit['biblio_data'] = hit['Claim'] if hit['search_data']['obj_state'] == 1 else hit['Patent']
 
@@ -201,8 +166,12 @@ def get_app_details(id_app_number: int, user_id: int) -> dict:
                 hit['Design'].get('DocFlow', {}).get('Documents', [])
             )
 
-    # Сортировка документов заявки по дате
-    sort_doc_flow(hit)
+    # Сортировка документов заявки по дате (если документы не отсортированы при индексации
+    # или были добавлены документы заявки)
+    derived = get_derived_fields(hit)
+    if not (derived and derived.get('doc_flow_sorted')) \
+            or (hit['Document']['idObjType'] in (1, 2, 3) and hit['search_data']['obj_state'] == 2):
+        sort_doc_flow(hit)
 
     # Сортировка оповещений
     if hit['search_data']['obj_state'] == 2:
@@ -210,12 +179,26 @@ def get_app_details(id_app_number: int, user_id: int) -> dict:
 
     hit['meta'] = {'id': id_app_number}
 
+    return hit
+
+
+@shared_task
+def get_app_details(id_app_number: int, user_id: int) -> dict:
+    """Задача для получения деталей по заявке."""
+    hit = details_cache.get_app_details(id_app_number, prepare_app_details)
+    if not hit:
+        return {}
+
+    user = get_user_or_anonymous(user_id)
     return filter_app_data(hit, user)
 
 
 @shared_task
-def perform_advanced_search(user_id, get_params):
-    """Задача для выполнения расширенного поиска."""
+def perform_advanced_search(user_id, get_params, request_timeout=None):
+    """Задача для выполнения расширенного поиска.
+    request_timeout - ограничение общего времени поиска (сек.) при выполнении поиска в процессе веб-сервера
+    (при превышении вызывается ConnectionTimeout)."""
+    deadline = time.monotonic() + request_timeout if request_timeout else None
     formset = get_search_form('advanced', get_params)
     # Валидация запроса
     try:
@@ -233,23 +216,22 @@ def perform_advanced_search(user_id, get_params):
             'get_params': get_params
         }
 
-    # Разбивка поисковых данных на поисковые группы
-    search_groups = get_search_groups(formset.cleaned_data)
-
     # Пользователь
     user = get_user_or_anonymous(user_id)
 
-    # Поиск в ElasticSearch по каждой группе
-    s = get_elastic_results(search_groups, user)
+    # Поиск в ElasticSearch по каждой группе (тип и статус объекта)
+    s = query_compiler.get_search(query_compiler.compile_advanced_query(formset.cleaned_data))
+    s = s.source(**source_fields.get_source(source_fields.LIST))
 
     # Сортировка
     if get_params.get('sort_by'):
         s = sort_results(s, get_params['sort_by'][0])
     else:
         s = s.sort('_score')
+    s = add_sort_tiebreaker(s)
 
     # Фильтрация, агрегация
-    s, aggregations = filter_results(s, get_params)
+    s = filter_results(s, get_params)
 
     # Пагинация
     results_on_page = int(get_params.get('show', [10])[0])
@@ -259,14 +241,21 @@ def perform_advanced_search(user_id, get_params):
         results_on_page = 10
     res_from = results_on_page * (int(get_params['page'][0]) - 1) if get_params.get('page') else 0
     res_to = res_from + results_on_page
-    items = []
-    for i in s[res_from:res_to]:
-        item = i.to_dict()
-        item['meta'] = i.meta.to_dict()
-        items.append(filter_app_data(item, user))
+    # Курсор пагинации действителен только для той же сортировки и количества результатов на странице
+    cursor_context = f"{get_params.get('sort_by', [''])[0]}:{results_on_page}"
+    hits, total, aggregations = results_cache.get_results_page(
+        s,
+        results_cache.get_key('advanced', get_params, user),
+        res_from,
+        res_to,
+        deadline,
+        search_after=decode_search_cursor(get_params.get('after', [None])[0], cursor_context) if res_from else None,
+        search_before=decode_search_cursor(get_params.get('before', [None])[0], cursor_context) if res_from else None,
+    )
     results = {
-        'items': items,
-        'total': s.count()
+        'items': [filter_app_data(item, user) for item in hits],
+        'total': total,
+        **get_page_cursors(hits, cursor_context)
     }
 
     return {
@@ -302,7 +291,7 @@ def perform_transactions_search(get_params):
         s = s.sort('_score')
 
     # Фильтрация, агрегация
-    s, aggregations = filter_results(s, get_params)
+    s = filter_results(s, get_params)
 
     # Пагинация
     results_on_page = int(get_params.get('show', [10])[0])
@@ -313,17 +302,18 @@ def perform_transactions_search(get_params):
     res_from = results_on_page * (int(get_params['page'][0]) - 1) if get_params.get('page') else 0
     res_to = res_from + results_on_page
     items = []
-    for i in s[res_from:res_to]:
+    response = s[res_from:res_to].execute()
+    for i in response:
         item = i.to_dict()
         item['meta'] = i.meta.to_dict()
         items.append(item)
     results = {
         'items': items,
-        'total': s.count()
+        'total': response.hits.total
     }
 
     return {
-        'aggregations': aggregations,
+        'aggregations': get_filters_aggregations(response),
         'results': results,
         'get_params': get_params
     }
@@ -359,7 +349,7 @@ def perform_favorites_search(favorites_ids, user_id, get_params):
         must=[Q('terms', _id=favorites_ids)],
     )
     s = Search(using=client, index=settings.ELASTIC_INDEX_NAME).source(
-        excludes=["*.DocBarCode", "*.DOCBARCODE"]
+        **source_fields.get_source(source_fields.LIST)
     ).query(q)
 
     # Сортировка
@@ -377,13 +367,14 @@ def perform_favorites_search(favorites_ids, user_id, get_params):
     res_from = results_on_page * (int(get_params['page'][0]) - 1) if get_params.get('page') else 0
     res_to = res_from + results_on_page
     items = []
-    for i in s[res_from:res_to]:
+    response = s[res_from:res_to].execute()
+    for i in response:
         item = i.to_dict()
         item['meta'] = i.meta.to_dict()
         items.append(filter_app_data(item, user))
     results = {
         'items': items,
-        'total': s.count()
+        'total': response.hits.total
     }
 
     return {
@@ -485,49 +476,9 @@ def create_simple_search_results_file_docx(user_id, get_params, lang_code):
     formset = get_search_form('simple', get_params)
     # Валидация запроса
     if formset.is_valid():
-        client = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
         user = get_user_or_anonymous(user_id)
-        qs = None
-        for s in formset.cleaned_data:
-            elastic_field = SimpleSearchField.objects.get(pk=s['param_type']).elastic_index_field
-            if elastic_field:
-                query = prepare_query(s['value'], elastic_field)
-
-                if elastic_field.field_type == 'text':
-                    fields = [
-                        f"{elastic_field.field_name}^2",
-                        f"{elastic_field.field_name}.exact^3",
-                        f"{elastic_field.field_name}.*",
-                    ]
-                else:
-                    fields = [
-                        f"{elastic_field.field_name}",
-                    ]
-
-                q = Q(
-                    'query_string',
-                    query=query,
-                    fields=fields,
-                    quote_field_suffix=".exact",
-                    default_operator='AND'
-                )
-
-                # Nested тип
-                if elastic_field.parent:
-                    q = Q(
-                        'nested',
-                        path=elastic_field.parent.field_name,
-                        query=q,
-                    )
-
-                if qs is not None:
-                    qs &= q
-                else:
-                    qs = q
-
-        qs = filter_bad_apps(qs)
-
-        s = Search(using=client, index=settings.ELASTIC_INDEX_NAME).query(qs)
+        s = query_compiler.get_search(query_compiler.compile_simple_query(formset.cleaned_data))
+        s = s.source(**source_fields.get_source(source_fields.EXPORT_DOCX))
 
         # Сортировка
         if get_params.get('sort_by'):
@@ -536,26 +487,7 @@ def create_simple_search_results_file_docx(user_id, get_params, lang_code):
             s = s.sort('_score')
 
         # Фильтрация
-        # Возможные фильтры
-        filters = [
-            {
-                'title': 'obj_type',
-                'field': 'Document.idObjType'
-            },
-            {
-                'title': 'obj_state',
-                'field': 'search_data.obj_state'
-            },
-            {
-                'title': 'registration_status_color',
-                'field': 'search_data.registration_status_color'
-            },
-        ]
-
-        for item in filters:
-            if get_params.get(f"filter_{item['title']}"):
-                # Фильтрация в основном запросе
-                s = s.filter('terms', **{item['field']: get_params.get(f"filter_{item['title']}")})
+        s = apply_filters(s, get_params)
 
         if s.count() <= 500:
             # Получение заявок и фильтрация данных
@@ -593,55 +525,14 @@ def create_simple_search_results_file_docx(user_id, get_params, lang_code):
     return json.dumps(dataclasses.asdict(ServiceExecuteResult(status='error')))
 
 
-@shared_task
-def create_simple_search_results_file_xlsx(user_id, get_params, lang_code):
+@shared_task(bind=True)
+def create_simple_search_results_file_xlsx(self, user_id, get_params, lang_code):
     """Возвращает url файла с результатами простого поиска (.xlsx)."""
     formset = get_search_form('simple', get_params)
     # Валидация запроса
     if formset.is_valid():
-        client = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
         user = get_user_or_anonymous(user_id)
-        qs = None
-        for s in formset.cleaned_data:
-            elastic_field = SimpleSearchField.objects.get(pk=s['param_type']).elastic_index_field
-            if elastic_field:
-                query = prepare_query(s['value'], elastic_field)
-
-                if elastic_field.field_type == 'text':
-                    fields = [
-                        f"{elastic_field.field_name}^2",
-                        f"{elastic_field.field_name}.exact^3",
-                        f"{elastic_field.field_name}.*",
-                    ]
-                else:
-                    fields = [
-                        f"{elastic_field.field_name}",
-                    ]
-
-                q = Q(
-                    'query_string',
-                    query=query,
-                    fields=fields,
-                    quote_field_suffix=".exact",
-                    default_operator='AND'
-                )
-
-                # Nested тип
-                if elastic_field.parent:
-                    q = Q(
-                        'nested',
-                        path=elastic_field.parent.field_name,
-                        query=q,
-                    )
-
-                if qs is not None:
-                    qs &= q
-                else:
-                    qs = q
-
-        qs = filter_bad_apps(qs)
-
-        s = Search(using=client, index=settings.ELASTIC_INDEX_NAME).query(qs)
+        s = query_compiler.get_search(query_compiler.compile_simple_query(formset.cleaned_data))
 
         # Сортировка
         if get_params.get('sort_by'):
@@ -650,60 +541,22 @@ def create_simple_search_results_file_xlsx(user_id, get_params, lang_code):
             s = s.sort('_score')
 
         # Фильтрация
-        # Возможные фильтры
-        filters = [
-            {
-                'title': 'obj_type',
-                'field': 'Document.idObjType'
-            },
-            {
-                'title': 'obj_state',
-                'field': 'search_data.obj_state'
-            },
-            {
-                'title': 'registration_status_color',
-                'field': 'search_data.registration_status_color'
-            },
-        ]
-
-        for item in filters:
-            if get_params.get(f"filter_{item['title']}"):
-                # Фильтрация в основном запросе
-                s = s.filter('terms', **{item['field']: get_params.get(f"filter_{item['title']}")})
+        s = apply_filters(s, get_params)
 
-        if s.count() <= 500:
-            s = s.source(['search_data', 'Document', 'Claim', 'Patent', 'TradeMark', 'MadridTradeMark', 'Design', 'Geo',
-                          'Certificate'])
-
-            # Данные для Excel-файла
-            data = prepare_data_for_search_report(s, lang_code, user)
+        s = s.source(**source_fields.get_source(source_fields.EXPORT_XLSX))
 
-            directory_path = os.path.join(
-                settings.MEDIA_ROOT,
-                'search_results',
-            )
-            os.makedirs(directory_path, exist_ok=True)
-            # Имя файла с результатами поиска
-            file_name = f"{get_unique_filename('simple_search')}.xlsx"
-            file_path = os.path.join(directory_path, file_name)
+        # Формировние и сохранение Excel-файла
+        res = create_search_results_xlsx(s, 'simple_search', lang_code, user, get_progress_callback(self))
 
-            # Формировние и сохранение Excel-файла
-            create_search_res_doc(data, file_path)
-
-            # Возврат url сформированного файла с результатами поиска
-            res = os.path.join(
-                settings.MEDIA_URL,
-                'search_results',
-                file_name
-            )
-            return json.dumps(
-                dataclasses.asdict(
-                    ServiceExecuteResult(
-                        status='success',
-                        data={'file_path': res}
-                    )
+        # Возврат url сформированного файла с результатами поиска
+        return json.dumps(
+            dataclasses.asdict(
+                ServiceExecuteResult(
+                    status='success',
+                    data={'file_path': res}
                 )
             )
+        )
     return json.dumps(dataclasses.asdict(ServiceExecuteResult(status='error')))
 
 
@@ -713,34 +566,13 @@ def create_advanced_search_results_file_docx(user_id, get_params, lang_code):
     formset = get_search_form('advanced', get_params)
     # Валидация запроса
     if formset.is_valid():
-        # Разбивка поисковых данных на поисковые группы
-        search_groups = get_search_groups(formset.cleaned_data)
-
-        # Поиск в ElasticSearch по каждой группе
+        # Поиск в ElasticSearch по каждой группе (тип и статус объекта)
         user = get_user_or_anonymous(user_id)
-        s = get_elastic_results(search_groups, user)
+        s = query_compiler.get_search(query_compiler.compile_advanced_query(formset.cleaned_data))
+        s = s.source(**source_fields.get_source(source_fields.EXPORT_DOCX))
 
         # Фильтрация
-        # Возможные фильтры
-        filters = [
-            {
-                'title': 'obj_type',
-                'field': 'Document.idObjType'
-            },
-            {
-                'title': 'obj_state',
-                'field': 'search_data.obj_state'
-            },
-            {
-                'title': 'registration_status_color',
-                'field': 'search_data.registration_status_color'
-            },
-        ]
-
-        for item in filters:
-            if get_params.get(f"filter_{item['title']}"):
-                # Фильтрация в основном запросе
-                s = s.filter('terms', **{item['field']: get_params.get(f"filter_{item['title']}")})
+        s = apply_filters(s, get_params)
 
         if s.count() <= 500:
             # Получение заявок и фильтрация данных
@@ -778,80 +610,39 @@ def create_advanced_search_results_file_docx(user_id, get_params, lang_code):
     return json.dumps(dataclasses.asdict(ServiceExecuteResult(status='error')))
 
 
-@shared_task
-def create_advanced_search_results_file_xlsx(user_id, get_params, lang_code):
-    """Возвращает url файла с результатами расширенного поиска (.docx)."""
+@shared_task(bind=True)
+def create_advanced_search_results_file_xlsx(self, user_id, get_params, lang_code):
+    """Возвращает url файла с результатами расширенного поиска (.xlsx)."""
     formset = get_search_form('advanced', get_params)
     # Валидация запроса
     if formset.is_valid():
-        # Разбивка поисковых данных на поисковые группы
-        search_groups = get_search_groups(formset.cleaned_data)
-
-        # Поиск в ElasticSearch по каждой группе
+        # Поиск в ElasticSearch по каждой группе (тип и статус объекта)
         user = get_user_or_anonymous(user_id)
-        s = get_elastic_results(search_groups, user)
+        s = query_compiler.get_search(query_compiler.compile_advanced_query(formset.cleaned_data))
 
         # Фильтрация
-        # Возможные фильтры
-        filters = [
-            {
-                'title': 'obj_type',
-                'field': 'Document.idObjType'
-            },
-            {
-                'title': 'obj_state',
-                'field': 'search_data.obj_state'
-            },
-            {
-                'title': 'registration_status_color',
-                'field': 'search_data.registration_status_color'
-            },
-        ]
-
-        for item in filters:
-            if get_params.get(f"filter_{item['title']}"):
-                # Фильтрация в основном запросе
-                s = s.filter('terms', **{item['field']: get_params.get(f"filter_{item['title']}")})
-
-        if s.count() <= 500:
-            s = s.source(['search_data', 'Document', 'Claim', 'Patent', 'TradeMark', 'MadridTradeMark', 'Design', 'Geo',
-                          'Certificate'])
+        s = apply_filters(s, get_params)
 
-            # Сортировка
-            if get_params.get('sort_by'):
-                s = sort_results(s, get_params['sort_by'][0])
-            else:
-                s = s.sort('_score')
-
-            # Данные для Excel-файла
-            data = prepare_data_for_search_report(s, lang_code, user)
+        s = s.source(**source_fields.get_source(source_fields.EXPORT_XLSX))
 
-            directory_path = os.path.join(
-                settings.MEDIA_ROOT,
-                'search_results',
-            )
-            os.makedirs(directory_path, exist_ok=True)
-            # Имя файла с результатами поиска
-            file_name = f"{get_unique_filename('advanced_search')}.xlsx"
-            file_path = os.path.join(directory_path, file_name)
+        # Сортировка
+        if get_params.get('sort_by'):
+            s = sort_results(s, get_params['sort_by'][0])
+        else:
+            s = s.sort('_score')
 
-            # Формировние и сохранение Excel-файла
-            create_search_res_doc(data, file_path)
+        # Формировние и сохранение Excel-файла
+        res = create_search_results_xlsx(s, 'advanced_search', lang_code, user, get_progress_callback(self))
 
-            # Возврат url сформированного файла с результатами поиска
-            res = os.path.join(
-                settings.MEDIA_URL,
-                'search_results',
-                file_name
-            )
-            return json.dumps(
-                dataclasses.asdict(
-                    ServiceExecuteResult(
-                        status='success',
-                        data={'file_path': res}
-                    )
+        # Возврат url сформированного файла с результатами поиска
+        return json.dumps(
+            dataclasses.asdict(
+                ServiceExecuteResult(
+                    status='success',
+                    data={'file_path': res}
                 )
             )
+        )
     return json.dumps(dataclasses.asdict(ServiceExecuteResult(status='error')))
 
 
@@ -863,6 +654,7 @@ def create_transactions_search_results_file_docx(get_params, lang_code):
     if form.is_valid():
         s = get_search_in_transactions(form.cleaned_data)
         if s and s.count() <= 500:
+            s = s.source(**source_fields.get_source(source_fields.EXPORT_DOCX))
             directory_path = Path(settings.MEDIA_ROOT) / 'search_results'
             os.makedirs(str(directory_path), exist_ok=True)
 
@@ -891,15 +683,15 @@ def create_transactions_search_results_file_docx(get_params, lang_code):
     return json.dumps(dataclasses.asdict(ServiceExecuteResult(status='error')))
 
 
-@shared_task
-def create_transactions_search_results_file_xlsx(get_params, lang_code):
+@shared_task(bind=True)
+def create_transactions_search_results_file_xlsx(self, get_params, lang_code):
     """Возвращает url файла с результатами поиска по оповещениям."""
     form = get_search_form('transactions', get_params)
     # Валидация запроса
     if form.is_valid():
         s = get_search_in_transactions(form.cleaned_data)
-        if s and s.count() <= 500:
-            s = s.source(['search_data', 'Document', 'Claim', 'Patent', 'TradeMark', 'Design', 'Geo'])
+        if s:
+            s = s.source(**source_fields.get_source(source_fields.EXPORT_XLSX))
 
             # Сортировка
             if get_params.get('sort_by'):
@@ -907,27 +699,10 @@ def create_transactions_search_results_file_xlsx(get_params, lang_code):
             else:
                 s = s.sort('_score')
 
-            # Данные для Excel-файла
-            data = prepare_data_for_search_report(s, lang_code)
-
-            directory_path = os.path.join(
-                settings.MEDIA_ROOT,
-                'search_results',
-            )
-            os.makedirs(directory_path, exist_ok=True)
-            # Имя файла с результатами поиска
-            file_name = f"{get_unique_filename('transactions_search')}.xlsx"
-            file_path = os.path.join(directory_path, file_name)
-
             # Формировние и сохранение Excel-файла
-            create_search_res_doc(data, file_path)
+            res = create_search_results_xlsx(s, 'transactions_search', lang_code, on_progress=get_progress_callback(self))
 
             # Возврат url сформированного файла с результатами поиска
-            res = os.path.join(
-                settings.MEDIA_URL,
-                'search_results',
-                file_name
-            )
             return json.dumps(
                 dataclasses.asdict(
                     ServiceExecuteResult(
@@ -1055,3 +830,10 @@ def clear_old_files(path, older_than_minutes=10):
             full_path = os.path.join(address, dir_)
             if not os.listdir(full_path):
                 os.rmdir(full_path)
+
+
+@shared_task
+def evict_thumbnails(max_size=None):
+    """Удаляет уменьшенные изображения, к которым дольше всего не обращались,
+    если размер хранилища превышает max_size (по умолчанию THUMBNAILS_MAX_SIZE)."""
+    return thumbnails.evict(max_size)
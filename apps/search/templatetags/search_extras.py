@@ -1,10 +1,11 @@
 from django import template
 from django.conf import settings
-from django.db.models import F
 from django.utils.translation import gettext as _
-from ..models import ObjType, SortParameter, IndexationProcess, PaidServicesSettings
+from django.urls import reverse
+from django.utils.http import urlencode
 from ..utils import (user_has_access_to_docs as user_has_access_to_docs_, get_registration_status_color,
-                     user_has_access_to_tm_app, get_fixed_mark_status_code)
+                     user_has_access_to_tm_app, get_fixed_mark_status_code, get_user_access_data)
+from ..services.reference_data import get_reference_data
 from apps.bulletin.services import bulletin_get_number_441_code
 import re
 
@@ -78,41 +79,61 @@ def document_path(file_name):
     return file_name.replace("\\\\bear\share\\", settings.MEDIA_URL).replace("\\", "/")
 
 
-@register.filter
-def get_image_url(file_path, image_name):
+def get_image_relative_path(file_path, image_name):
+    """Возвращает путь к изображению относительно MEDIA_ROOT."""
     splitted_path = file_path.replace("\\", "/").split('/')
     splitted_path_len = len(splitted_path)
 
-    return f"{settings.MEDIA_URL}/" \
-           f"{splitted_path[splitted_path_len-4]}" \
+    return f"{splitted_path[splitted_path_len-4]}" \
            f"/{splitted_path[splitted_path_len-3]}/" \
            f"{splitted_path[splitted_path_len-2]}/{image_name}"
 
 
-@register.filter
-def get_image_url_madrid_tm(file_path, image_name):
+def get_image_relative_path_madrid_tm(file_path, image_name):
+    """Возвращает путь к изображению мадридской ТМ относительно MEDIA_ROOT."""
     splitted_path = file_path.replace("\\", "/").split('/')
     splitted_path_len = len(splitted_path)
 
-    return f"{settings.MEDIA_URL}/" \
-           f"{splitted_path[splitted_path_len-5].upper()}/" \
+    return f"{splitted_path[splitted_path_len-5].upper()}/" \
            f"{splitted_path[splitted_path_len-4]}/" \
            f"{splitted_path[splitted_path_len-3]}/" \
            f"{splitted_path[splitted_path_len-2]}/{image_name}"
 
 
+def get_thumbnail_url_by_path(relative_path, size='list'):
+    return f"{reverse('search:thumbnail', args=[size])}?{urlencode({'path': relative_path})}"
+
+
+@register.filter
+def get_image_url(file_path, image_name):
+    return f"{settings.MEDIA_URL}/{get_image_relative_path(file_path, image_name)}"
+
+
+@register.filter
+def get_image_url_madrid_tm(file_path, image_name):
+    return f"{settings.MEDIA_URL}/{get_image_relative_path_madrid_tm(file_path, image_name)}"
+
+
+@register.filter
+def get_thumbnail_url(file_path, image_name):
+    """Возвращает url уменьшенной копии изображения (для списков результатов)."""
+    return get_thumbnail_url_by_path(get_image_relative_path(file_path, image_name))
+
+
+@register.filter
+def get_thumbnail_url_madrid_tm(file_path, registration_number):
+    """Возвращает url уменьшенной копии изображения мадридской ТМ (для списков результатов)."""
+    return get_thumbnail_url_by_path(get_image_relative_path_madrid_tm(file_path, f"{registration_number}.jpg"))
+
+
 @register.inclusion_tag('search/detail/document_pdf.html')
 def document_pdf(path, height=500):
     return {'document_path': path, 'height': height}
 
 
-@register.simple_tag
-def obj_type_title(id, lang):
-    obj_type = ObjType.objects.get(id=id)
-    if lang == 'ua':
-        return obj_type.obj_type_ua
-    else:
-        return obj_type.obj_type_en
+@register.simple_tag(takes_context=True)
+def obj_type_title(context, id, lang):
+    return get_reference_data(context.get('request')).get_obj_type_title(id, lang)
 
 
 @register.inclusion_tag('search/templatetags/registration_status.html')
@@ -124,31 +145,27 @@ def registration_status(hit):
 @register.simple_tag
 def registration_status_color(hit):
     """Возвращает статус охранного документа (зелёный, желтый, красный)."""
-    return get_registration_status_color(hit)
+    # Статус охранного документа вычисляется при индексации
+    return hit['search_data'].get('registration_status_color') or get_registration_status_color(hit)
 
 
 @register.simple_tag
 def user_can_watch_docs(user):
-    return user.is_superuser or user.groups.filter(name='Посадовці (чиновники)').exists()
+    if user.is_anonymous:
+        return False
+    return get_user_access_data(user)['is_vip']
 
 
-@register.simple_tag
-def documents_count():
+@register.simple_tag(takes_context=True)
+def documents_count(context):
     """Возвращает количество документов доступных для поиска"""
-    record = IndexationProcess.objects.order_by('-pk').filter(finish_date__isnull=False)
-    doc_count = None
-    if record.count() > 0:
-        doc_count = record.first().documents_in_index
-    return doc_count or '-'
+    return get_reference_data(context.get('request')).documents_count or '-'
 
 
-@register.simple_tag
-def last_finished_indexation_date():
+@register.simple_tag(takes_context=True)
+def last_finished_indexation_date(context):
     """Возвращает дату и время последней законченной индексации."""
-    p = IndexationProcess.objects.order_by('-pk').filter(finish_date__isnull=False)
-    if p.count() > 0:
-        return p.first().finish_date
-    return '-'
+    return get_reference_data(context.get('request')).last_finished_indexation_date or '-'
 
 
 @register.simple_tag
@@ -163,17 +180,9 @@ def get_field(ipc_code, ipc_fields):
 @register.inclusion_tag('search/templatetags/sort_params.html', takes_context=True)
 def sort_params(context):
     """Отображает элемент для выбора параметра сортировки результатов поиска."""
+    request = context['request']
     return {
-        'sort_params': SortParameter.objects.filter(
-            is_enabled=True
-        ).order_by(
-            '-weight'
-        ).annotate(
-            title=F(f"title_{context['request'].LANGUAGE_CODE}")
-        ).values(
-            'title',
-            'value'
-        ),
+        'sort_params': get_reference_data(request).get_sort_params(request.LANGUAGE_CODE),
         'request_get_params': context['get_params']
     }
 
@@ -202,11 +211,10 @@ def user_has_access_to_app(user, hit):
     return user_has_access_to_tm_app(user, hit)
 
 
-@register.simple_tag
-def is_paid_services_enabled():
+@register.simple_tag(takes_context=True)
+def is_paid_services_enabled(context):
     """Возвращает значения того включены ли платные услуги."""
-    paid_services_settings, created = PaidServicesSettings.objects.get_or_create()
-    return paid_services_settings.enabled
+    return get_reference_data(context.get('request')).paid_services_enabled
 
 
 @register.inclusion_tag('search/templatetags/app_stages_tm.html')
@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+from django.test import TestCase
+
+from apps.search.utils import user_has_access_to_docs, get_app_access_names, get_names_matcher
+
+
+class UserHasAccessToDocsTestCase(TestCase):
+    """Тестирует проверку доступа пользователя к документам заявки."""
+
+    @staticmethod
+    def get_user(names, is_vip=False):
+        user = SimpleNamespace(pk=None, is_anonymous=False)
+        user._access_data = {'is_vip': is_vip, 'names': names, 'matcher': get_names_matcher(names)}
+        return user
+
+    def test_access_names(self):
+        """Тестирует нормализацию имён лиц заявки."""
+        hit = {
+            'search_data': {'applicant': [{'name': 'Iванов Іван'}], 'owner': None},
+            'Claim': {'I_98': 'O’Brien'},
+        }
+        self.assertEqual(get_app_access_names(hit), ['ІВАНОВ ІВАН', "O'BRІEN"])
+
+    def test_access(self):
+        """Тестирует вхождение имени пользователя в имена лиц заявки."""
+        hit = {'search_data': {'applicant': [{'name': 'ТОВ "Кава" (Іванов Іван)'}]}}
+        self.assertTrue(user_has_access_to_docs(self.get_user(['ІВАНОВ ІВАН']), hit))
+        self.assertFalse(user_has_access_to_docs(self.get_user(['ПЕТРОВ ПЕТРО']), hit))
+        self.assertFalse(user_has_access_to_docs(self.get_user([]), hit))
+        self.assertTrue(user_has_access_to_docs(self.get_user([], is_vip=True), hit))
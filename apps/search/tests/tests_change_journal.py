@@ -0,0 +1,78 @@
+import datetime
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.search.management.commands.add_docs_to_elasticsearch import Command
+from apps.search.models import IpcAppList, ChangeJournalCursor
+from apps.search.services import services
+
+
+@override_settings(CHANGE_JOURNAL_OVERLAP_SECONDS=60)
+class ChangeJournalTestCase(TestCase):
+    """Тестирует журнал изменений IPC_AppList."""
+
+    def setUp(self):
+        self.now = timezone.now().replace(microsecond=0)
+        for i, minutes in enumerate((30, 20, 10)):
+            IpcAppList.objects.create(
+                id=i + 1,
+                id_shedule_type=3,
+                lastupdate=self.now - datetime.timedelta(minutes=minutes),
+                elasticindexed=1,
+            )
+
+    def _get_ids(self, since, watermark):
+        return list(
+            services.change_journal_filter(IpcAppList.objects.order_by('pk'), since, watermark).values_list(
+                'pk', flat=True
+            )
+        )
+
+    def test_first_run(self):
+        """При первом запуске обрабатываются все записи до максимальной даты изменения."""
+        since, watermark = services.change_journal_get_range('test', IpcAppList.objects.all())
+        self.assertIsNone(since)
+        self.assertEqual(watermark, self.now - datetime.timedelta(minutes=10))
+        self.assertEqual(self._get_ids(since, watermark), [1, 2, 3])
+        self.assertTrue(ChangeJournalCursor.objects.filter(name='test', watermark__isnull=True).exists())
+
+    def test_overlap(self):
+        """Следующий запуск повторно обрабатывает записи из интервала перекрытия."""
+        services.change_journal_commit('test', self.now - datetime.timedelta(minutes=20), 2)
+        IpcAppList.objects.filter(pk=1).update(lastupdate=self.now - datetime.timedelta(seconds=1210))
+
+        since, watermark = services.change_journal_get_range('test', IpcAppList.objects.all())
+        self.assertEqual(since, self.now - datetime.timedelta(minutes=21))
+        self.assertEqual(watermark, self.now - datetime.timedelta(minutes=10))
+        self.assertEqual(self._get_ids(since, watermark), [1, 2, 3])
+
+    def test_commit(self):
+        """Контрольная точка не сбрасывается, если изменений не было, и не сдвигается назад."""
+        watermark = self.now - datetime.timedelta(minutes=10)
+        services.change_journal_commit('test', watermark, 3)
+        services.change_journal_commit('test', None, 0)
+        cursor = ChangeJournalCursor.objects.get(name='test')
+        self.assertEqual(cursor.watermark, watermark)
+        self.assertEqual(cursor.processed_count, 0)
+
+        since, new_watermark = services.change_journal_get_range('test', IpcAppList.objects.all())
+        self.assertEqual(since, watermark - datetime.timedelta(seconds=60))
+        self.assertEqual(new_watermark, watermark)
+
+    def test_get_documents(self):
+        """В режиме --changes индексируются также записи, которые не удалось проиндексировать ранее."""
+        IpcAppList.objects.filter(pk=1).update(elasticindexed=0)
+        options = {
+            'changes_range': (self.now - datetime.timedelta(minutes=15), self.now),
+            'ignore_indexed': False,
+            'id': None,
+            'obj_type': None,
+            'status': None,
+        }
+        ids = sorted(x['id'] for x in Command().get_documents(options))
+        self.assertEqual(ids, [1, 3])
+
+        options['ignore_indexed'] = True
+        ids = sorted(x['id'] for x in Command().get_documents(options))
+        self.assertEqual(ids, [3])
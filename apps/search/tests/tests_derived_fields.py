@@ -0,0 +1,207 @@
+from unittest import mock
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase
+from elasticsearch_dsl.response import Hit
+
+from apps.bulletin.models import ClListOfficialBulletinsIp
+from apps.search.management.commands.fill_derived_fields import Command as FillDerivedFieldsCommand
+from apps.search.management.commands.fill_representer import Command as FillRepresenterCommand
+from apps.search.management.commands.set_441_code import Command as Set441CodeCommand
+from apps.search.services import derived_fields
+from apps.search.utils import (DERIVED_FIELDS_VERSION, get_derived_fields, is_app_limited, get_441_code,
+                               get_app_access_names)
+
+
+def get_tm_body(**trademark_details):
+    return {
+        'Document': {'idObjType': 4, 'MarkCurrentStatusCodeType': '1000'},
+        'search_data': {
+            'obj_state': 1,
+            'app_date': '2021-01-01T00:00:00',
+            'applicant': [{'name': 'Іванов Іван'}],
+        },
+        'TradeMark': {'TrademarkDetails': trademark_details},
+    }
+
+
+class DerivedFieldsTestCase(TestCase):
+    """Тестирует производные поля документа."""
+
+    def setUp(self):
+        cache.clear()
+        ClListOfficialBulletinsIp.objects.create(
+            bul_number=5,
+            bul_date='2021-02-05',
+            date_from='2021-02-01',
+            date_to='2021-02-07',
+        )
+
+    def test_compute(self):
+        """Тестирует вычисление производных полей ТМ."""
+        derived = derived_fields.compute(get_tm_body(Code_441='2021-02-03'))
+        self.assertEqual(derived['version'], DERIVED_FIELDS_VERSION)
+        self.assertFalse(derived['is_limited'])
+        self.assertEqual(derived['mark_status_code'], 1000)
+        self.assertEqual(derived['bul_number_441'], 5)
+        self.assertEqual(derived['access_names'], ['ІВАНОВ ІВАН'])
+
+        derived = derived_fields.compute(get_tm_body())
+        self.assertTrue(derived['is_limited'])
+        self.assertIsNone(derived['bul_number_441'])
+
+    def test_compute_invalid_data(self):
+        """Поле, которое невозможно вычислить по данным документа, имеет значение None."""
+        body = get_tm_body()
+        del body['search_data']['app_date']
+        self.assertIsNone(derived_fields.compute(body)['is_limited'])
+
+    def test_set_derived_fields(self):
+        """Поля предыдущей версии заменяются, документы заявки сортируются."""
+        body = get_tm_body(Code_441='2021-02-03')
+        body['search_data']['derived'] = {'version': 0, 'is_limited': True}
+        derived_fields.set_derived_fields(body)
+        self.assertEqual(body['search_data']['derived']['version'], DERIVED_FIELDS_VERSION)
+        self.assertFalse(body['search_data']['derived']['is_limited'])
+        self.assertTrue(body['search_data']['derived']['doc_flow_sorted'])
+        self.assertEqual(get_derived_fields(body), body['search_data']['derived'])
+
+    def test_previous_version(self):
+        """Поля предыдущей версии используются, кроме изменённых с тех пор."""
+        body = get_tm_body()
+        body['search_data']['derived'] = {'version': 1, 'is_limited': False, 'access_names': ['Іванов']}
+        self.assertEqual(get_derived_fields(body), {'version': 1, 'is_limited': False})
+        self.assertFalse(is_app_limited(body))
+        self.assertEqual(get_app_access_names(body), ['ІВАНОВ ІВАН'])
+
+    def test_is_app_limited(self):
+        """Значение вычисляется заново, если производные поля отсутствуют или имеют другую версию."""
+        body = get_tm_body()
+        self.assertTrue(is_app_limited(body))
+
+        body['search_data']['derived'] = {'version': DERIVED_FIELDS_VERSION, 'is_limited': False}
+        self.assertFalse(is_app_limited(body))
+
+        body['search_data']['derived']['version'] = DERIVED_FIELDS_VERSION + 1
+        self.assertTrue(is_app_limited(body))
+
+    def test_get_441_code(self):
+        """Номер бюллетеня берётся из производных полей без запроса к БД."""
+        body = get_tm_body(Code_441='2021-02-03')
+        self.assertEqual(get_441_code(body), '03.02.2021, бюл. №5')
+
+        body['search_data']['derived'] = {'version': DERIVED_FIELDS_VERSION, 'bul_number_441': 7}
+        with self.assertNumQueries(0):
+            self.assertEqual(get_441_code(body), '03.02.2021, бюл. №7')
+
+        body['search_data']['derived']['version'] = DERIVED_FIELDS_VERSION + 1
+        self.assertEqual(get_441_code(body), '03.02.2021, бюл. №5')
+
+
+class FillDerivedFieldsTestCase(TestCase):
+    """Тестирует команду fill_derived_fields."""
+
+    def test_fill(self):
+        """Документы записываются с производными полями и с проверкой версии документа."""
+        hits = [{'_index': 'uma', '_id': '10', '_version': 3, '_source': get_tm_body()}]
+        actions = []
+
+        def streaming_bulk(es, items, **kwargs):
+            for item in items:
+                actions.append(item)
+                yield True, item
+
+        command_module = 'apps.search.management.commands.fill_derived_fields'
+        with mock.patch(f"{command_module}.Elasticsearch"), \
+                mock.patch(f"{command_module}.elasticsearch_helpers.scan", return_value=iter(hits)) as scan, \
+                mock.patch(f"{command_module}.elasticsearch_helpers.streaming_bulk", side_effect=streaming_bulk), \
+                mock.patch(f"{command_module}.results_cache.bump_index_version") as bump_index_version:
+            command = FillDerivedFieldsCommand()
+            command.stdout = mock.Mock()
+            command.handle(chunk_size=100, all=False)
+
+        # Документы без производных полей текущей версии или без идентификатора заявки
+        self.assertEqual(scan.call_args.kwargs['query']['query']['bool']['minimum_should_match'], 1)
+        self.assertEqual(len(actions), 1)
+        self.assertEqual(actions[0]['_id'], '10')
+        self.assertEqual(actions[0]['_version'], 3)
+        self.assertEqual(actions[0]['_source']['search_data']['derived']['version'], DERIVED_FIELDS_VERSION)
+        self.assertEqual(actions[0]['_source']['search_data']['app_id'], 10)
+        bump_index_version.assert_called_once()
+
+    def test_query_all(self):
+        """С параметром --all обрабатываются все документы."""
+        self.assertEqual(FillDerivedFieldsCommand().get_query({'all': True}), {'query': {'match_all': {}}})
+
+
+class Set441CodeTestCase(TestCase):
+    """Тестирует команду set_441_code."""
+
+    def setUp(self):
+        cache.clear()
+        ClListOfficialBulletinsIp.objects.create(
+            bul_number=5,
+            bul_date='2021-02-05',
+            date_from='2021-02-01',
+            date_to='2021-02-07',
+        )
+
+    def test_derived_fields(self):
+        """Производные поля документа вычисляются заново после добавления 441 кода."""
+        body = get_tm_body()
+        derived_fields.set_derived_fields(body)
+        self.assertTrue(body['search_data']['derived']['is_limited'])
+        bulletin_data = mock.Mock(app_number='m202100001', publication_date=datetime.date(2021, 2, 3))
+
+        command_module = 'apps.search.management.commands.set_441_code'
+        with mock.patch(f"{command_module}.Elasticsearch") as elasticsearch, \
+                mock.patch(f"{command_module}.Search") as search, \
+                mock.patch(f"{command_module}.EBulletinData") as e_bulletin_data, \
+                mock.patch(f"{command_module}.results_cache.bump_index_version") as bump_index_version:
+            e_bulletin_data.objects.filter.return_value.all.return_value = [bulletin_data]
+            search.return_value.using.return_value.query.return_value.execute.return_value = [
+                Hit({'_id': '10', '_source': body})
+            ]
+            command = Set441CodeCommand()
+            command.stdout = mock.Mock()
+            command.handle()
+
+        indexed = elasticsearch.return_value.index.call_args.kwargs
+        self.assertEqual(indexed['id'], '10')
+        self.assertFalse(is_app_limited(indexed['body']))
+        self.assertEqual(indexed['body']['search_data']['derived']['bul_number_441'], 5)
+        bump_index_version.assert_called_once()
+
+
+class FillRepresenterTestCase(TestCase):
+    """Тестирует команду fill_representer."""
+
+    def test_access_names(self):
+        """Имена лиц для проверки доступа к документам вычисляются заново после изменения представителей."""
+        body = get_tm_body(RepresentativeDetails={'Representative': [{'RepresentativeAddressBook': {
+            'FormattedNameAddress': {
+                'Name': {'FreeFormatName': {'FreeFormatNameDetails': {'FreeFormatNameDetails': {
+                    'FreeFormatNameLine': 'Петров Петро'
+                }}}},
+                'Address': {'FreeFormatAddress': {'FreeFormatAddressLine': 'Київ'}},
+            }
+        }}]})
+        body['search_data']['app_number'] = 'm202100001'
+        derived_fields.set_derived_fields(body)
+        self.assertEqual(body['search_data']['derived']['access_names'], ['ІВАНОВ ІВАН'])
+
+        command_module = 'apps.search.management.commands.fill_representer'
+        with mock.patch(f"{command_module}.Elasticsearch") as elasticsearch, \
+                mock.patch(f"{command_module}.Search") as search, \
+                mock.patch(f"{command_module}.results_cache.bump_index_version") as bump_index_version:
+            s = search.return_value.using.return_value.query.return_value
+            s.count.return_value = 1
+            s.scan.return_value = [Hit({'_id': '10', '_source': body})]
+            with mock.patch('builtins.print'):
+                FillRepresenterCommand().handle()
+
+        indexed = elasticsearch.return_value.index.call_args.kwargs['body']
+        self.assertEqual(indexed['search_data']['agent'], [{'name': 'Петров Петро, Київ'}])
+        self.assertEqual(get_app_access_names(indexed), ['ІВАНОВ ІВАН', 'ПЕТРОВ ПЕТРО, КИЇВ'])
+        bump_index_version.assert_called_once()
@@ -0,0 +1,53 @@
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.search.models import IpcAppList
+from apps.search.services import details_cache, results_cache
+
+
+class DetailsCacheTestCase(TestCase):
+    """Тестирует кэш подготовленных данных объекта."""
+
+    def setUp(self):
+        cache.clear()
+        self.app = IpcAppList.objects.create(
+            id=1,
+            id_shedule_type=3,
+            lastupdate=timezone.now() - datetime.timedelta(days=1),
+            last_indexation_date=timezone.now(),
+        )
+
+    def test_key(self):
+        """Ключ меняется при изменении заявки, индексации, смене версии индекса и даты."""
+        key = details_cache.get_key(1)
+        self.assertEqual(details_cache.get_key(1), key)
+        self.assertIsNone(details_cache.get_key(2))
+
+        IpcAppList.objects.filter(pk=1).update(lastupdate=timezone.now())
+        self.assertNotEqual(details_cache.get_key(1), key)
+        key = details_cache.get_key(1)
+
+        results_cache.bump_index_version()
+        self.assertNotEqual(details_cache.get_key(1), key)
+        key = details_cache.get_key(1)
+
+        # Фильтр заявок, которые не положено публиковать, зависит от текущей даты
+        tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
+        with mock.patch('apps.search.services.details_cache.datetime') as dt:
+            dt.datetime.now.return_value = tomorrow
+            self.assertNotEqual(details_cache.get_key(1), key)
+
+    def test_get_app_details(self):
+        """Данные подготавливаются один раз, данные заявки, которой нет в БД, не кэшируются."""
+        prepare = mock.Mock(return_value={'meta': {'id': 1}})
+        self.assertEqual(details_cache.get_app_details(1, prepare), {'meta': {'id': 1}})
+        self.assertEqual(details_cache.get_app_details(1, prepare), {'meta': {'id': 1}})
+        self.assertEqual(prepare.call_count, 1)
+
+        details_cache.get_app_details(2, prepare)
+        details_cache.get_app_details(2, prepare)
+        self.assertEqual(prepare.call_count, 3)
@@ -0,0 +1,44 @@
+from django.test import TestCase
+from uma.utils import read_json_file, detect_json_encoding
+
+from pathlib import Path
+import codecs
+import tempfile
+
+
+class ReadJsonFileTestCase(TestCase):
+    """Тестирует чтение файлов JSON с данными объектов."""
+    data = {'TradeMark': {'TrademarkDetails': {'ApplicationNumber': 'm202012345', 'Title': 'Знак'}}}
+    content = '{"TradeMark": {"TrademarkDetails": {"ApplicationNumber": "m202012345", "Title": "Знак"}}}'
+
+    def _read(self, raw: bytes):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / 'data.json'
+            path.write_bytes(raw)
+            return read_json_file(str(path))
+
+    def test_encodings(self):
+        """Тестирует определение кодировки по BOM и первым байтам."""
+        self.assertEqual(detect_json_encoding(codecs.BOM_UTF8 + b'{}'), 'utf-8-sig')
+        self.assertEqual(detect_json_encoding(self.content.encode('utf-16')), 'utf-16')
+        self.assertEqual(detect_json_encoding(self.content.encode('utf-16-le')), 'utf-16-le')
+        self.assertEqual(detect_json_encoding(self.content.encode('utf-16-be')), 'utf-16-be')
+        self.assertEqual(detect_json_encoding(self.content.encode('utf-8')), 'utf-8')
+
+    def test_read(self):
+        """Тестирует корректность чтения данных в разных кодировках."""
+        for raw in (
+            self.content.encode('utf-16'),
+            self.content.encode('utf-8'),
+            codecs.BOM_UTF8 + self.content.encode('utf-8'),
+            # BOM внутри содержимого UTF-16
+            ('\ufeff' + self.content).encode('utf-16'),
+        ):
+            data, decode_time = self._read(raw)
+            self.assertEqual(data, self.data)
+            self.assertGreaterEqual(decode_time, 0)
+
+    def test_invalid_json(self):
+        """Тестирует ошибку декодирования некорректного JSON."""
+        with self.assertRaises(ValueError):
+            self._read('{"TradeMark": '.encode('utf-16'))
@@ -0,0 +1,62 @@
+import time
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.cache import SessionStore
+from django.test import TestCase, RequestFactory, override_settings
+from elasticsearch import exceptions as elasticsearch_exceptions
+
+from apps.search import views
+from apps.search.services import results_cache
+
+
+class SearchDeadlineTestCase(TestCase):
+    """Тестирует ограничение общего времени поиска в процессе веб-сервера."""
+
+    def test_request_timeout(self):
+        """Запросы к ElasticSearch ограничиваются оставшимся временем."""
+        self.assertIsNone(results_cache._get_request_timeout(None))
+        self.assertLessEqual(results_cache._get_request_timeout(time.monotonic() + 2), 2)
+        with self.assertRaises(elasticsearch_exceptions.ConnectionTimeout):
+            results_cache._get_request_timeout(time.monotonic() - 0.1)
+
+    def test_expired(self):
+        """Если время истекло, запрос к ElasticSearch не выполняется."""
+        s = mock.MagicMock()
+        with self.assertRaises(elasticsearch_exceptions.ConnectionTimeout):
+            results_cache.get_results_page(s, None, 0, 10, time.monotonic() - 0.1)
+        s.execute.assert_not_called()
+
+
+@override_settings(RECAPTCHA_ENABLED=True, SEARCH_INLINE_TIME_BUDGET=3)
+class GetResultsHtmlTestCase(TestCase):
+    """Тестирует получение результатов поиска, выполняемого Celery."""
+
+    def get_request(self, session, **params):
+        request = RequestFactory().get('/search/results/', params)
+        request.session = session
+        request.user = AnonymousUser()
+        request.LANGUAGE_CODE = 'uk'
+        return request
+
+    def test_recaptcha_checked_once(self):
+        """reCAPTCHA проверяется только при первом запросе состояния задачи."""
+        session = SessionStore()
+        task = mock.Mock(state='PENDING')
+        with mock.patch.object(views, 'AsyncResult', return_value=task), \
+                mock.patch.object(views, 'recaptcha_is_valid', return_value=True) as recaptcha_is_valid:
+            response = views.get_results_html(self.get_request(session, task_id='abc', search_type='simple'))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(session['recaptcha_verified_tasks'], ['abc'])
+
+            response = views.get_results_html(self.get_request(session, task_id='abc', search_type='simple'))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(recaptcha_is_valid.call_count, 1)
+
+    def test_recaptcha_invalid(self):
+        """Задача без проверенной reCAPTCHA не запоминается."""
+        session = SessionStore()
+        with mock.patch.object(views, 'recaptcha_is_valid', return_value=False):
+            response = views.get_results_html(self.get_request(session, task_id='abc', search_type='simple'))
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('recaptcha_verified_tasks', session)
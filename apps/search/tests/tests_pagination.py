@@ -0,0 +1,38 @@
+from django.test import TestCase
+from elasticsearch_dsl import Search
+from apps.search.utils import encode_search_cursor, decode_search_cursor, reverse_sort, add_sort_tiebreaker
+
+
+class SearchCursorTestCase(TestCase):
+    """Тестирует курсоры пагинации результатов поиска (search_after)."""
+
+    def test_encode_decode(self):
+        """Тестирует кодирование и декодирование курсора."""
+        cursor = encode_search_cursor([1.5, '2020-01-01', 'abc'], 'app_date_desc:10')
+        self.assertEqual(decode_search_cursor(cursor, 'app_date_desc:10'), [1.5, '2020-01-01', 'abc'])
+
+    def test_other_context(self):
+        """Курсор, полученный для других параметров запроса, не используется."""
+        cursor = encode_search_cursor([1.5, 'abc'], ':10')
+        self.assertIsNone(decode_search_cursor(cursor, ':20'))
+
+    def test_invalid_cursor(self):
+        """Тестирует декодирование некорректного курсора."""
+        self.assertIsNone(decode_search_cursor('not a cursor'))
+        self.assertIsNone(decode_search_cursor(''))
+
+    def test_reverse_sort(self):
+        """Тестирует обратный порядок сортировки."""
+        self.assertEqual(
+            reverse_sort(['_score', {'search_data.app_date': {'order': 'desc', 'missing': '_last'}},
+                          {'search_data.app_id': {'order': 'asc', 'unmapped_type': 'long'}}]),
+            [{'_score': {'order': 'asc'}}, {'search_data.app_date': {'order': 'asc', 'missing': '_first'}},
+             {'search_data.app_id': {'order': 'desc', 'unmapped_type': 'long'}}]
+        )
+
+    def test_sort_tiebreaker(self):
+        """Порядок результатов уточняется идентификатором заявки (поле с doc_values, а не _id)."""
+        self.assertEqual(
+            add_sort_tiebreaker(Search()).to_dict()['sort'],
+            [{'_score': {'order': 'desc'}}, {'search_data.app_id': {'order': 'asc', 'unmapped_type': 'long'}}]
+        )
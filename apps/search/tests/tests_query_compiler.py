@@ -0,0 +1,28 @@
+from django.test import TestCase
+from apps.search.services.query_compiler import SearchField, compile_field_query
+
+
+class CompileFieldQueryTestCase(TestCase):
+    """Тестирует формирование запроса ElasticSearch по значению поля."""
+
+    def test_text_field(self):
+        """Тестирует запрос по текстовому полю."""
+        q = compile_field_query('кава ТА чай', SearchField('search_data.title', 'text')).to_dict()
+        self.assertEqual(q['query_string']['query'], 'кава AND чай')
+        self.assertEqual(
+            q['query_string']['fields'],
+            ['search_data.title^2', 'search_data.title.exact^3', 'search_data.title.*']
+        )
+
+    def test_date_field(self):
+        """Тестирует запрос по полю с датой (диапазон дат)."""
+        q = compile_field_query('01.02.2020 ~ 31.12.2020', SearchField('search_data.app_date', 'date')).to_dict()
+        self.assertEqual(q['query_string']['query'], '[2020-02-01 TO 2020-12-31]')
+        self.assertEqual(q['query_string']['fields'], ['search_data.app_date'])
+
+    def test_nested_field(self):
+        """Тестирует запрос по полю nested-типа."""
+        field = SearchField('search_data.owner.name', 'text', 'search_data.owner')
+        q = compile_field_query('Тест', field).to_dict()
+        self.assertEqual(q['nested']['path'], 'search_data.owner')
+        self.assertIn('query_string', q['nested']['query'])
@@ -0,0 +1,33 @@
+from django.test import TestCase
+from apps.search.services.query_compiler import SearchField
+from apps.search.services.query_validator import is_valid_query
+from apps.search.utils import prepare_query
+
+
+class QueryValidatorTestCase(TestCase):
+    """Тестирует локальную валидацию поисковых запросов."""
+
+    def test_valid_text_queries(self):
+        """Тестирует корректные запросы к текстовому полю."""
+        field = SearchField('search_data.title', 'text')
+        for value in ('кава ТА чай', 'кава АБО (чай НЕ цукор)', '"кава чай" ТА молоко', 'https://uipv.org',
+                      'ко*а', 'кава~2', '-чай'):
+            self.assertTrue(is_valid_query(prepare_query(value, field), 'text'), value)
+
+    def test_invalid_text_queries(self):
+        """Тестирует некорректные запросы к текстовому полю."""
+        for query in ('кава AND', 'AND кава', '(кава', 'кава)', '()', '"кава', 'кава\\', 'кава AND OR чай', 'кава^'):
+            self.assertFalse(is_valid_query(query, 'text'), query)
+
+    def test_date_queries(self):
+        """Тестирует запросы к полю с датами."""
+        field = SearchField('search_data.app_date', 'date')
+        self.assertTrue(is_valid_query(prepare_query('01.02.2020 ~ 31.12.2020', field), 'date'))
+        self.assertTrue(is_valid_query('[2020-01-01 TO *]', 'date'))
+        self.assertFalse(is_valid_query(prepare_query('31.02.2020 ~ 31.12.2020', field), 'date'))
+        self.assertFalse(is_valid_query('кава', 'date'))
+
+    def test_integer_queries(self):
+        """Тестирует запросы к числовому полю."""
+        self.assertTrue(is_valid_query('123 OR 456', 'integer'))
+        self.assertFalse(is_valid_query('12*', 'integer'))
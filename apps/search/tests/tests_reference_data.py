@@ -0,0 +1,30 @@
+from types import SimpleNamespace
+
+from django.test import TestCase
+
+from apps.search.models import SortParameter, PaidServicesSettings
+from apps.search.services.reference_data import get_reference_data
+
+
+class ReferenceDataTestCase(TestCase):
+    """Тестирует справочные данные в памяти процесса."""
+
+    def test_invalidation(self):
+        """Тестирует перезагрузку данных при изменении моделей."""
+        SortParameter.objects.create(title_uk='Дата', title_en='Date', value='app_date', ordering='desc')
+        self.assertEqual(get_reference_data().get_sort_params('en'), [{'title': 'Date', 'value': 'app_date'}])
+
+        SortParameter.objects.create(title_uk='Номер', title_en='Number', value='app_num', ordering='asc',
+                                     weight=2000)
+        self.assertEqual([x['value'] for x in get_reference_data().get_sort_params('uk')], ['app_num', 'app_date'])
+
+        PaidServicesSettings.objects.update_or_create(defaults={'enabled': True})
+        self.assertTrue(get_reference_data().paid_services_enabled)
+
+    def test_request_memoization(self):
+        """Тестирует однократное получение данных в рамках запроса."""
+        request = SimpleNamespace()
+        data = get_reference_data(request)
+        SortParameter.objects.create(title_uk='Дата', title_en='Date', value='app_date', ordering='desc')
+        self.assertIs(get_reference_data(request), data)
+        self.assertIsNot(get_reference_data(), data)
@@ -0,0 +1,89 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.search.management.commands.reindex import Command
+from apps.search.models import IpcAppList
+
+
+class ReindexTestCase(TestCase):
+    """Тестирует команду reindex."""
+
+    def setUp(self):
+        now = timezone.now()
+        IpcAppList.objects.create(id=1, id_shedule_type=3, last_indexation_date=now - datetime.timedelta(days=1))
+        IpcAppList.objects.create(id=2, id_shedule_type=3, last_indexation_date=now)
+        IpcAppList.objects.create(id=3, id_shedule_type=3, last_indexation_date=now)
+        self.since = now - datetime.timedelta(hours=1)
+
+        self.command = Command(stdout=StringIO())
+        self.command.es = mock.MagicMock()
+        self.command.es.mget.return_value = {'docs': [
+            {'_id': '2', 'found': True, '_source': {'search_data': {'applicant': ['Заявник']}}},
+            {'_id': '3', 'found': False},
+        ]}
+
+    def test_copy_changes(self):
+        """Копируются только документы, проиндексированные после since, удалённые документы удаляются."""
+        with mock.patch(
+                'apps.search.management.commands.reindex.elasticsearch_helpers.streaming_bulk',
+                return_value=[]
+        ) as streaming_bulk:
+            started = self.command.copy_changes('src', 'dest', self.since, 100)
+
+        self.assertGreater(started, self.since)
+        self.assertEqual(self.command.es.mget.call_args.kwargs['body'], {'ids': [2, 3]})
+        actions = list(streaming_bulk.call_args.args[1])
+        self.assertEqual(actions, [
+            {
+                '_index': 'dest', '_type': '_doc', '_id': '2',
+                '_source': {'search_data': {'applicant': [{'name': 'Заявник'}], 'app_id': 2}}
+            },
+            {'_index': 'dest', '_type': '_doc', '_id': '3', '_op_type': 'delete'},
+        ])
+
+    def test_count_mismatch(self):
+        """При несовпадении количества документов псевдоним не переключается, запись в исходный индекс разрешается."""
+        es = self.command.es
+        es.indices.exists_alias.return_value = True
+        es.indices.get_alias.return_value = {'src': {}}
+        es.indices.get.return_value = {'src': {'settings': {'index': {}}, 'mappings': {}}}
+        es.count.side_effect = [{'count': 3}, {'count': 2}]
+
+        with mock.patch('apps.search.management.commands.reindex.Elasticsearch', return_value=es), \
+                mock.patch.object(Command, 'copy_slice', return_value=(2, [])), \
+                mock.patch.object(Command, 'copy_changes', return_value=timezone.now()) as copy_changes:
+            with self.assertRaises(CommandError):
+                self.command.handle(alias='alias', source=None, mapping=None, slices=1, chunk_size=100,
+                                    no_swap=False, replace_index=False)
+
+        # Два догоняющих прохода: после копирования и после запрета записи в исходный индекс
+        self.assertEqual(copy_changes.call_count, 2)
+        es.indices.update_aliases.assert_not_called()
+        blocks = [
+            c.kwargs['body']['index']['blocks']['write'] for c in es.indices.put_settings.call_args_list
+            if 'blocks' in c.kwargs['body']['index']
+        ]
+        self.assertEqual(blocks, [True, False])
+
+    def test_swap(self):
+        """Псевдоним переключается на новый индекс."""
+        es = self.command.es
+        es.indices.exists_alias.return_value = True
+        es.indices.get_alias.return_value = {'src': {}}
+        es.indices.get.return_value = {'src': {'settings': {'index': {}}, 'mappings': {}}}
+        es.count.return_value = {'count': 2}
+
+        with mock.patch('apps.search.management.commands.reindex.Elasticsearch', return_value=es), \
+                mock.patch.object(Command, 'copy_slice', return_value=(2, [])), \
+                mock.patch.object(Command, 'copy_changes', return_value=timezone.now()):
+            self.command.handle(alias='alias', source=None, mapping=None, slices=1, chunk_size=100,
+                                no_swap=False, replace_index=False)
+
+        actions = es.indices.update_aliases.call_args.kwargs['body']['actions']
+        self.assertEqual(actions[0], {'remove': {'index': 'src', 'alias': 'alias'}})
+        self.assertTrue(actions[1]['add']['index'].startswith('alias_'))
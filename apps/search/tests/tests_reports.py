@@ -6,6 +6,7 @@ from apps.bulletin.models import ClListOfficialBulletinsIp
 from docx import Document
 
 from pathlib import Path
+import billiard
 import tempfile
 
 
@@ -4052,6 +4053,11 @@ class ReportItemDocxMadridTestCase(TestCase):
         self.assertNotIn(expected_str, p.text)
 
 
+def _generate_report(items, file_path):
+    """Формирует отчёт с параметрами по умолчанию (выполняется в дочернем демоническом процессе)."""
+    ReportWriterDocx(items, chunk_size=2, workers=2).generate(file_path)
+
+
 class ReportWriterDocxTestCase(TestCase):
     """Тестирует класс создания файла отчёта в формате .docx."""
     report_path = Path(tempfile.gettempdir()) / 'report.docx'
@@ -4078,3 +4084,59 @@ class ReportWriterDocxTestCase(TestCase):
         writer = ReportWriterDocx(items)
         writer.generate(file_path)
         self.assertTrue(file_path.exists())
+
+    def test_generates_report_parallel(self):
+        """Тестирует создание отчёта частями в нескольких процессах."""
+        inid_data = [
+            InidCode(4, '111', 'Номер свідоцтва', 2, True)
+        ]
+        items = []
+        for i in range(5):
+            biblio_data = {
+                'Document': {
+                    'idObjType': 4
+                },
+                'TradeMark': {
+                    'TrademarkDetails': {
+                        'RegistrationNumber': str(i + 1)
+                    }
+                },
+                'search_data': {
+                    'obj_state': 2
+                }
+            }
+            items.append(ReportItemDocxTM(biblio_data, inid_data))
+
+        file_path = Path(tempfile.gettempdir()) / 'report_parallel.docx'
+        writer = ReportWriterDocx(items, chunk_size=2, workers=2)
+        writer.generate(file_path)
+
+        paragraphs = [p.text for p in Document(str(file_path)).paragraphs]
+        self.assertEqual(len(paragraphs), 10)
+        for i in range(5):
+            self.assertTrue(paragraphs[i * 2].startswith(f"{i + 1}. "))
+            self.assertIn(str(i + 1), paragraphs[i * 2 + 1])
+
+    def test_generates_report_in_daemon_process(self):
+        """В демоническом процессе (Celery worker с пулом prefork) отчёт формируется в пуле процессов."""
+        inid_data = [
+            InidCode(4, '111', 'Номер свідоцтва', 2, True)
+        ]
+        items = [
+            ReportItemDocxTM(
+                {
+                    'Document': {'idObjType': 4},
+                    'TradeMark': {'TrademarkDetails': {'RegistrationNumber': str(i + 1)}},
+                    'search_data': {'obj_state': 2}
+                },
+                inid_data
+            ) for i in range(5)
+        ]
+
+        file_path = Path(tempfile.gettempdir()) / 'report_daemon.docx'
+        file_path.unlink(missing_ok=True)
+        process = billiard.Process(target=_generate_report, args=(items, file_path), daemon=True)
+        process.start()
+        process.join(60)
+        self.assertEqual(process.exitcode, 0)
+        self.assertEqual(len(Document(str(file_path)).paragraphs), 10)
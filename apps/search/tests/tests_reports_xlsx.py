@@ -0,0 +1,51 @@
+import os
+import tempfile
+import zipfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from apps.search.services import reports_xlsx
+
+
+@override_settings(SEARCH_RESULTS_EXPORT_CHUNK_SIZE=2)
+class WriteSearchResultsXlsxTestCase(TestCase):
+    """Тестирует потоковую запись результатов поиска в Excel-файл."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.thumbnail_path = os.path.join(self.tmp_dir.name, 'thumbnail.jpg')
+        Image.new('RGB', (30, 20)).save(self.thumbnail_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def get_row(h, obj_types, user=None):
+        return [f"m2020{h}"] + [''] * (reports_xlsx.IMAGE_COLUMN - 1) + [f"image_{h}"]
+
+    def test_write(self):
+        """Все документы записываются частями, изображения ТМ вставляются из хранилища уменьшенных копий."""
+        s = mock.Mock()
+        s.count.return_value = 3
+        s.params.return_value.scan.return_value = iter([1, 2, 3])
+        progress = []
+        file_path = os.path.join(self.tmp_dir.name, 'results.xlsx')
+
+        with mock.patch.object(reports_xlsx, 'get_search_report_row', side_effect=self.get_row), \
+                mock.patch.object(reports_xlsx.thumbnails_store, 'get_thumbnail',
+                                  side_effect=lambda img_path, size: self.thumbnail_path
+                                  if img_path == 'image_1' else None):
+            count = reports_xlsx.write_search_results_xlsx(
+                s, file_path, 'ua', on_progress=lambda written, total: progress.append((written, total))
+            )
+
+        self.assertEqual(count, 3)
+        self.assertEqual(progress, [(2, 3), (3, 3)])
+        with zipfile.ZipFile(file_path) as f:
+            sheet = f.read('xl/worksheets/sheet1.xml').decode()
+            self.assertEqual(len([name for name in f.namelist() if name.startswith('xl/media/')]), 1)
+        for value in ('m20201', 'm20202', 'm20203', 'image_2', 'image_3'):
+            self.assertIn(value, sheet)
+        self.assertNotIn('image_1', sheet)
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from elasticsearch_dsl import Search
+from elasticsearch_dsl.response import Hit
+
+from apps.search.services import results_cache
+from apps.search.utils import get_page_cursors
+
+
+class ResultsCacheKeyTestCase(TestCase):
+    """Тестирует формирование ключа кэша результатов поиска."""
+
+    @staticmethod
+    def get_user(is_vip=False, is_anonymous=False):
+        user = SimpleNamespace(pk=1, is_anonymous=is_anonymous)
+        user._access_data = {'is_vip': is_vip, 'names': [], 'matcher': None}
+        user.is_vip = mock.Mock(side_effect=AssertionError('is_vip() must not be called'))
+        return user
+
+    def test_normalization(self):
+        """Ключ не зависит от пагинации, пробелов, типа значения и порядка значений фильтров."""
+        user = self.get_user()
+        key = results_cache.get_key('simple', {
+            'obj_type': ['1'],
+            'filter_obj_type': ['4', '1'],
+            'page': 2,
+            'after': 'abc',
+            'g-recaptcha-response': 'token',
+        }, user)
+        self.assertEqual(key, results_cache.get_key('simple', {
+            'obj_type': ' 1 ',
+            'filter_obj_type': ['1', '4'],
+        }, user))
+
+    def test_differences(self):
+        """Ключ зависит от типа поиска, порядка значений параметров запроса и класса доступа пользователя."""
+        user = self.get_user()
+        params = {'param_type': ['1', '2'], 'value': ['a', 'b']}
+        key = results_cache.get_key('advanced', params, user)
+        self.assertNotEqual(key, results_cache.get_key('simple', params, user))
+        reordered = {'param_type': ['2', '1'], 'value': ['a', 'b']}
+        self.assertNotEqual(key, results_cache.get_key('advanced', reordered, user))
+        self.assertNotEqual(key, results_cache.get_key('advanced', params, self.get_user(is_vip=True)))
+        self.assertNotEqual(key, results_cache.get_key('advanced', params, self.get_user(is_anonymous=True)))
+
+    def test_index_version(self):
+        """Ключ меняется после индексации."""
+        user = self.get_user()
+        key = results_cache.get_key('simple', {'q': 'x'}, user)
+        results_cache.bump_index_version()
+        self.assertNotEqual(key, results_cache.get_key('simple', {'q': 'x'}, user))
+
+    def test_access_class(self):
+        """Признак ВИП-пользователя берётся из закэшированных данных доступа."""
+        self.assertEqual(results_cache.get_user_access_class(self.get_user(is_anonymous=True)), 'anonymous')
+        self.assertEqual(results_cache.get_user_access_class(self.get_user()), 'user')
+        self.assertEqual(results_cache.get_user_access_class(self.get_user(is_vip=True)), 'vip')
+
+
+class ResultsCachePageTestCase(TestCase):
+    """Тестирует получение страницы результатов из кэша."""
+
+    def test_cached_page_cursors(self):
+        """Документы страницы из кэша содержат значения сортировки (для курсора следующей страницы)."""
+        key = 'search_results_test'
+        cache.set(key, {'ids': ['5', '3', '7'], 'sort': [[1.5, 5], [1.5, 3], [1.0, 7]], 'total': 3,
+                        'aggregations': {}})
+        response = [
+            Hit({'_id': '3', '_source': {'search_data': {}}}),
+            Hit({'_id': '5', '_source': {'search_data': {}}}),
+        ]
+        with mock.patch.object(results_cache, 'Search') as search:
+            search.return_value.query.return_value.extra.return_value.__getitem__.return_value.execute.return_value = \
+                response
+            hits, total, aggregations = results_cache.get_results_page(Search().source(['search_data']), key, 0, 2)
+
+        self.assertEqual([hit['meta']['id'] for hit in hits], ['5', '3'])
+        self.assertEqual([hit['meta']['sort'] for hit in hits], [[1.5, 5], [1.5, 3]])
+        self.assertIsNotNone(get_page_cursors(hits)['next_cursor'])
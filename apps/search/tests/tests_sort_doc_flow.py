@@ -0,0 +1,35 @@
+from django.test import TestCase
+
+from apps.search.utils import sort_doc_flow, parse_iso_date
+
+
+class SortDocFlowTestCase(TestCase):
+    """Тестирует сортировку документов заявки по дате."""
+
+    def test_parse_iso_date(self):
+        """Тестирует разбор дат (в т.ч. форматов, которые допускает strptime)."""
+        self.assertLess(parse_iso_date('2019-12-31'), parse_iso_date('2020-01-01'))
+        self.assertEqual(parse_iso_date('2020-1-5'), parse_iso_date('2020-01-05'))
+        for value in ('2020-13-01', '01.01.2020', '2020-01-01T10:00:00'):
+            with self.assertRaises(ValueError):
+                parse_iso_date(value)
+
+    def test_sort_inv_um(self):
+        """Тестирует сортировку документов, платежей и сборов заявки на изобретение."""
+        hit = {
+            'Document': {'idObjType': 1},
+            'DOCFLOW': {
+                'DOCUMENTS': [
+                    {'DOCRECORD': {'DOCREGDATE': '2021-03-01'}},
+                    {'DOCRECORD': {'DOCSENDINGDATE': '2020-05-01'}},
+                    {'DOCRECORD': {}},
+                ],
+                'PAYMENTS': [{'PFRECORD': {'PFDATE': '2021-01-01'}}, {'PFRECORD': {'PFDATE': '2020-01-01'}}],
+            },
+        }
+        sort_doc_flow(hit)
+        self.assertEqual(
+            [x['DOCRECORD'] for x in hit['DOCFLOW']['DOCUMENTS']],
+            [{}, {'DOCSENDINGDATE': '2020-05-01'}, {'DOCREGDATE': '2021-03-01'}]
+        )
+        self.assertEqual([x['PFRECORD']['PFDATE'] for x in hit['DOCFLOW']['PAYMENTS']], ['2020-01-01', '2021-01-01'])
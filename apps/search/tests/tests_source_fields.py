@@ -0,0 +1,184 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase
+from elasticsearch_dsl.response import Hit
+from apps.search.services import source_fields
+from apps.search.utils import get_search_report_row
+from pathlib import Path
+import copy
+import re
+
+
+def person(role: str, name: str) -> dict:
+    """Возвращает данные лица (заявителя, владельца и т.д.) в формате документов ТМ, пром. образцов и т.д."""
+    return {
+        f'{role}AddressBook': {
+            'FormattedNameAddress': {
+                'Name': {'FreeFormatName': {'FreeFormatNameDetails': {'FreeFormatNameLine': name}}},
+                'Address': {'AddressCountryCode': 'UA'},
+            }
+        }
+    }
+
+
+def project(data, paths: list, prefix: str = ''):
+    """Возвращает данные документа, отфильтрованные так же, как параметр _source includes."""
+    if isinstance(data, list):
+        return [project(x, paths, prefix) for x in data]
+    if not isinstance(data, dict):
+        return data
+    res = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if any(path == x or path.startswith(f"{x}.") for x in paths):
+            res[key] = value
+        elif any(x.startswith(f"{path}.") for x in paths):
+            res[key] = project(value, paths, f"{path}.")
+    return res
+
+
+class SourceFieldsTestCase(TestCase):
+    """Тестирует наборы полей документов, которые запрашиваются из ElasticSearch."""
+    # Шаблоны списка результатов поиска -> типы объектов
+    list_templates = {
+        'inv_um_item.html': (1, 2),
+        'ld_item.html': (3,),
+        'tm_item.html': (4,),
+        'tm_item_paid_displaying.html': (4,),
+        'qi_item.html': (5,),
+        'id_item.html': (6,),
+        'tm_item_madrid.html': (9, 14),
+        'copyright_item.html': (10, 13),
+        'agreement_item.html': (11, 12),
+    }
+
+    @staticmethod
+    def get_template_paths(template_path):
+        """Возвращает пути к полям документа (hit.*, biblio_data.*), которые используются в шаблоне."""
+        content = Path(template_path).read_text(encoding='utf-8')
+        paths = set()
+        for var, attrs, key in re.findall(r'\b(hit|biblio_data)((?:\.[\w@]+)*)(?:\|get:"([^"]+)")?', content):
+            parts = [x for x in attrs.split('.') + (key.split('.') if key else []) if x and not x.isdigit()]
+            if var == 'hit':
+                if parts and parts[0] != 'meta':
+                    paths.add('.'.join(parts))
+            else:
+                paths.update(f"{root}.{'.'.join(parts)}" for root in ('Claim', 'Patent') if parts)
+        return paths
+
+    def test_list(self):
+        """Набор полей списка результатов поиска включает общие поля и поля для проверки доступа."""
+        source = source_fields.get_source(source_fields.LIST, [4])
+        self.assertEqual(source['includes'][:2], ['search_data', 'Document'])
+        self.assertIn('TradeMark.TrademarkDetails.MarkImageDetails', source['includes'])
+        self.assertIn('TradeMark.DocFlow.Documents.DocRecord.DocType', source['includes'])
+        self.assertNotIn('Claim.I_71', source['includes'])
+        self.assertEqual(source['excludes'], source_fields.EXCLUDES)
+
+    def test_all_obj_types(self):
+        """По умолчанию набор полей включает поля всех типов объектов без повторов."""
+        includes = source_fields.get_source(source_fields.EXPORT_XLSX)['includes']
+        self.assertIn('Claim.I_71', includes)
+        self.assertIn('MadridTradeMark.TradeMarkDetails.HOLGR', includes)
+        self.assertEqual(len(includes), len(set(includes)))
+
+    def test_detail(self):
+        """Для страницы объекта запрашивается документ полностью."""
+        self.assertEqual(source_fields.get_source(source_fields.DETAIL), {'excludes': source_fields.EXCLUDES})
+
+    def test_list_templates(self):
+        """Набор полей списка результатов поиска включает все поля, которые используются в шаблонах списка."""
+        templates_dir = Path(settings.BASE_DIR) / 'apps' / 'search' / 'templates' / 'search' / 'advanced' / '_partials'
+        for template_name, obj_types in self.list_templates.items():
+            for path in self.get_template_paths(templates_dir / template_name):
+                for obj_type_id in obj_types:
+                    includes = source_fields.get_source(source_fields.LIST, [obj_type_id])['includes']
+                    self.assertTrue(
+                        any(path == x or path.startswith(f"{x}.") or x.startswith(f"{path}.") for x in includes),
+                        f"{template_name}: {path} is not requested for obj_type {obj_type_id}"
+                    )
+
+    # Библиографические данные изобретений, полезных моделей, топографий
+    biblio = {
+        'IPC': ['A01B 1/00'],
+        'I_54': [{'I_54.U': 'Спосіб'}],
+        'I_71': [{'I_71.N.U': 'Заявник', 'I_71.C.U': 'UA'}],
+        'I_72': [{'I_72.N.U': 'Винахідник', 'I_72.C.U': 'UA'}],
+        'I_73': [{'I_73.N.U': 'Власник', 'I_73.C.U': 'UA'}],
+    }
+
+    # Тип объекта -> данные документа (без search_data и Document)
+    xlsx_documents = {
+        1: {'Claim': biblio, 'Patent': biblio},
+        2: {'Claim': biblio, 'Patent': biblio},
+        3: {'Claim': biblio, 'Patent': biblio},
+        4: {'TradeMark': {'TrademarkDetails': {
+            'Code_441': '2020-09-01',
+            'WordMarkSpecification': {'MarkSignificantVerbalElement': 'Марка'},
+            'ApplicantDetails': {'Applicant': [person('Applicant', 'Заявник')]},
+            'HolderDetails': {'Holder': [person('Holder', 'Власник')]},
+            'MarkImageDetails': {'MarkImage': {'MarkImageFilename': 'm202001234.jpg'}},
+            'GoodsServicesDetails': {'GoodsServices': {'ClassDescriptionDetails': {'ClassDescription': [
+                {'ClassNumber': 25, 'ClassificationTermDetails': {}},
+            ]}}},
+        }}},
+        5: {'Geo': {'GeoDetails': {
+            'ProductName': 'Продукт',
+            'HolderDetails': {'Holder': [person('Holder', 'Власник')]},
+        }}},
+        6: {'Design': {'DesignDetails': {
+            'DesignTitle': 'Зразок',
+            'ApplicantDetails': {'Applicant': [person('Applicant', 'Заявник')]},
+            'HolderDetails': {'Holder': [person('Holder', 'Власник')]},
+            'DesignerDetails': {'Designer': [person('Designer', 'Автор')]},
+            'IndicationProductDetails': [{'Class': '01-01', 'Product': 'Виріб'}],
+        }}},
+        9: {'MadridTradeMark': {'TradeMarkDetails': {
+            '@INTREGN': '1234567',
+            'Code_441': '2020-09-01',
+            'HOLGR': {'NAME': {'NAMEL': 'Власник'}, 'ADDRESS': {'ADDRL': ['Адреса'], 'COUNTRY': 'FR'}},
+            'BASICGS': {'GSGR': [{'@NICCLAI': '25', 'GSTERMEN': 'Clothing'}]},
+        }}},
+        10: {'Certificate': {'CopyrightDetails': {
+            'Name': 'Твір',
+            'ApplicantDetails': {'Applicant': [person('Applicant', 'Заявник')]},
+            'HolderDetails': {'Holder': [person('Holder', 'Власник')]},
+            'AuthorDetails': {'Author': [person('Author', 'Автор')]},
+        }}},
+        11: {'Decision': {'DecisionDetails': {
+            'Name': 'Договір',
+            'ApplicantDetails': {'Applicant': [person('Applicant', 'Заявник')]},
+            'AuthorDetails': {'Author': [person('Author', 'Автор')]},
+        }}},
+    }
+
+    def get_xlsx_document(self, obj_type_id: int, obj_state: int) -> dict:
+        """Возвращает полный документ индекса для выгрузки в Excel."""
+        document = copy.deepcopy(self.xlsx_documents[{12: 11, 13: 10, 14: 9}.get(obj_type_id, obj_type_id)])
+        document['Document'] = {
+            'idObjType': obj_type_id,
+            'filesPath': '\\\\bear\\share\\MADRID\\TRADE_MARKS\\2020\\m202001234\\',
+        }
+        document['search_data'] = {
+            'obj_state': obj_state,
+            'app_number': 'm202001234',
+            'app_date': '2020-01-02',
+            'protective_doc_number': '1234567',
+            'rights_date': '2021-03-04',
+            'title': 'Назва',
+            'agent': [{'name': 'Представник'}],
+        }
+        return document
+
+    def test_export_xlsx(self):
+        """Строка Excel-файла по документу с набором полей выгрузки совпадает со строкой по полному документу."""
+        obj_types = [(obj_type_id, str(obj_type_id)) for obj_type_id in source_fields.PROJECTIONS[source_fields.LIST]]
+        for obj_type_id, obj_type_title in obj_types:
+            includes = source_fields.get_source(source_fields.EXPORT_XLSX, [obj_type_id])['includes']
+            for obj_state in (1, 2):
+                document = self.get_xlsx_document(obj_type_id, obj_state)
+                with self.subTest(obj_type_id=obj_type_id, obj_state=obj_state):
+                    self.assertEqual(
+                        get_search_report_row(Hit({'_source': project(document, includes)}), obj_types, AnonymousUser()),
+                        get_search_report_row(Hit({'_source': document}), obj_types, AnonymousUser()),
+                    )
@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import math
+import os
+import tempfile
+
+from django.http import Http404
+from django.test import TestCase, RequestFactory, override_settings
+from PIL import Image
+
+from apps.search import views
+from apps.search.services import thumbnails
+
+
+class ThumbnailsTestCase(TestCase):
+    """Тестирует хранилище уменьшенных изображений."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp_dir.name, 'thumbnails')
+        self.img_path = os.path.join(self.tmp_dir.name, 'image.png')
+        Image.new('RGBA', (600, 400)).save(self.img_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_thumbnail(self):
+        """Копия формируется один раз и имеет заданную высоту."""
+        with override_settings(THUMBNAILS_ROOT=self.root):
+            path = thumbnails.get_thumbnail(self.img_path, 'report')
+            self.assertTrue(path.startswith(self.root))
+            self.assertEqual(Image.open(path).size, (180, 120))
+            self.assertEqual(thumbnails.get_thumbnail(self.img_path, 'report'), path)
+
+    def test_concurrent(self):
+        """Одна и та же копия может формироваться одновременно в нескольких потоках."""
+        with override_settings(THUMBNAILS_ROOT=self.root):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                paths = list(executor.map(lambda i: thumbnails.get_thumbnail(self.img_path, 'report'), range(16)))
+            self.assertEqual(len(set(paths)), 1)
+            self.assertIsNotNone(paths[0])
+            self.assertEqual(os.listdir(os.path.dirname(paths[0])), [os.path.basename(paths[0])])
+
+    def test_evicted_thumbnail(self):
+        """Копия, удалённая при очистке хранилища, формируется повторно."""
+        with override_settings(THUMBNAILS_ROOT=self.root):
+            path = thumbnails.get_thumbnail(self.img_path)
+            os.remove(path)
+            self.assertEqual(thumbnails.get_thumbnail(self.img_path), path)
+            self.assertTrue(os.path.exists(path))
+
+    def test_changed_image(self):
+        """При изменении исходного изображения формируется новая копия."""
+        with override_settings(THUMBNAILS_ROOT=self.root):
+            path = thumbnails.get_thumbnail(self.img_path)
+            st = os.stat(self.img_path)
+            os.utime(self.img_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+            self.assertNotEqual(thumbnails.get_thumbnail(self.img_path), path)
+
+    def test_missing_image(self):
+        """Для несуществующего изображения копия не формируется."""
+        with override_settings(THUMBNAILS_ROOT=self.root):
+            self.assertIsNone(thumbnails.get_thumbnail(os.path.join(self.tmp_dir.name, 'missing.png')))
+
+    def test_evict(self):
+        """Удаляются копии, к которым дольше всего не обращались."""
+        with override_settings(THUMBNAILS_ROOT=self.root):
+            old_path = thumbnails.get_thumbnail(self.img_path, 'report')
+            new_path = thumbnails.get_thumbnail(self.img_path, 'list')
+            os.utime(old_path, (0, 0))
+            # После очистки в хранилище должна остаться только новая копия
+            max_size = math.ceil(os.path.getsize(new_path) / thumbnails.EVICT_TARGET_RATIO)
+            self.assertGreater(os.path.getsize(old_path) + os.path.getsize(new_path), max_size)
+            self.assertEqual(thumbnails.evict(max_size), 1)
+            self.assertFalse(os.path.exists(old_path))
+            self.assertTrue(os.path.exists(new_path))
+            self.assertEqual(thumbnails.evict(max_size), 0)
+
+
+class ThumbnailViewTestCase(TestCase):
+    """Тестирует выдачу уменьшенных изображений."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.thumbnail_path = os.path.join(self.tmp_dir.name, 'thumbnail.jpg')
+        Image.new('RGB', (30, 20)).save(self.thumbnail_path)
+        self.request = RequestFactory().get('/', {'path': 'image.png'})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_evicted(self):
+        """Если копия удалена после её получения, она формируется повторно."""
+        missing_path = os.path.join(self.tmp_dir.name, 'missing.jpg')
+        with override_settings(MEDIA_ROOT=self.tmp_dir.name), \
+                mock.patch.object(views.thumbnails, 'get_thumbnail', side_effect=[missing_path, self.thumbnail_path]):
+            response = views.get_thumbnail(self.request, 'list')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        response.close()
+
+        with override_settings(MEDIA_ROOT=self.tmp_dir.name), \
+                mock.patch.object(views.thumbnails, 'get_thumbnail', return_value=missing_path):
+            with self.assertRaises(Http404):
+                views.get_thumbnail(self.request, 'list')
@@ -2,7 +2,7 @@ from django.urls import path
 from .views import (SimpleListView, AdvancedListView, add_filter_params, ObjectDetailView, download_docs_zipped,
                     download_doc, download_selection, download_simple, download_advanced, download_shared_docs,
                     TransactionsSearchView, download_transactions, get_results_html, get_data_app_html,
-                    get_obj_types_with_transactions, download_details_docx)
+                    get_obj_types_with_transactions, download_details_docx, get_thumbnail)
 
 app_name = 'search'
 urlpatterns = [
@@ -26,4 +26,5 @@ urlpatterns = [
     path('download_shared_docs/<int:id_app_number>/', download_shared_docs, name="download_shared_docs"),
     path('results/', get_results_html, name="get_results_html"),
     path('get_obj_types_with_transactions/', get_obj_types_with_transactions, name="get_obj_types_with_transactions"),
+    path('thumbnail/<str:size>/', get_thumbnail, name="thumbnail"),
 ]
@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.core.cache import cache
 from django.http import HttpResponse
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.utils.translation import gettext as _
@@ -6,50 +7,23 @@ from django.db.models import Prefetch
 from elasticsearch import Elasticsearch
 from elasticsearch_dsl import Search, Q, A
 from elasticsearch_dsl.aggs import Terms, Nested
-from .models import ObjType, InidCodeSchedule, OrderService, SortParameter, IpcAppList, PaidServicesSettings, IpcCode
+from .models import InidCodeSchedule, OrderService, SortParameter, IpcAppList, PaidServicesSettings, IpcCode
 from docx import Document
 from docx.oxml.shared import OxmlElement, qn
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.table import WD_ALIGN_VERTICAL
 from docx.shared import Pt, Cm
-from PIL import Image
 import re
 import time
+import functools
 import datetime
-import os
 from uma.utils import iterable
-import xlsxwriter
-import io
+import json
+import base64
+import binascii
 from apps.bulletin.models import ClListOfficialBulletinsIp
 
 
-def get_search_groups(search_data):
-    """Разбивка поисковых данных на поисковые группы"""
-    search_groups = []
-    for obj_type in ObjType.objects.all():
-        # Поисковые запросы на заявки
-        search_groups.append({
-            'obj_type': obj_type,
-            'obj_state': 1,
-            'search_params': list(filter(
-                lambda x: str(obj_type.pk) in x['obj_type'] and '1' in x['obj_state'],
-                search_data
-            ))
-        })
-        # Поисковые запросы на охранные документы
-        search_groups.append({
-            'obj_type': obj_type,
-            'obj_state': 2,
-            'search_params': list(filter(
-                lambda x: str(obj_type.pk) in x['obj_type'] and '2' in x['obj_state'],
-                search_data
-            ))
-        })
-    # Фильтрация пустых групп
-    search_groups = filter(lambda x: len(x['search_params']) > 0, search_groups)
-    return list(search_groups)
-
-
 def prepare_query(query, elastic_field):
     """Обрабатывает строку расширенного запроса пользователя."""
     if elastic_field.field_type == 'date':
@@ -88,96 +62,6 @@ def prepare_query(query, elastic_field):
     return query
 
 
-def get_elastic_results(search_groups, user):
-    """Поиск в ElasticSearch по группам."""
-    qs_list = []
-    for group in search_groups:
-        if group['search_params']:
-            # Идентификаторы schedule_type для заявок или охранных документов
-            schedule_type_ids = (10, 11, 12, 13, 14, 15) if group['obj_state'] == 1 else (3, 4, 5, 6, 7, 8, 16, 17, 18, 19, 30, 32)
-            qs = None
-
-            for search_param in group['search_params']:
-                # Поле поиска ElasticSearch
-                inid_schedule = InidCodeSchedule.objects.filter(
-                    ipc_code__id=search_param['ipc_code'],
-                    schedule_type__id__in=schedule_type_ids
-                ).first()
-
-                # Проверка доступно ли поле для поиска
-                if inid_schedule.enable_search and inid_schedule.elastic_index_field is not None:
-                    query = prepare_query(search_param['value'], inid_schedule.elastic_index_field)
-
-                    if inid_schedule.elastic_index_field.field_type == 'text':
-                        fields = [
-                            f"{inid_schedule.elastic_index_field.field_name}^2",
-                            f"{inid_schedule.elastic_index_field.field_name}.exact^3",
-                            f"{inid_schedule.elastic_index_field.field_name}.*",
-                        ]
-
-                        # if '*' in query:
-                        #     fields = [
-                        #         # f"{inid_schedule.elastic_index_field.field_name}^2",
-                        #         f"{inid_schedule.elastic_index_field.field_name}.exact^2",
-                        #     ]
-                        # else:
-                        #     fields = [
-                        #         # f"{inid_schedule.elastic_index_field.field_name}^2",
-                        #         f"{inid_schedule.elastic_index_field.field_name}.exact^2",
-                        #         f"{inid_schedule.elastic_index_field.field_name}.*",
-                        #     ]
-                    else:
-                        fields = [
-                            f"{inid_schedule.elastic_index_field.field_name}",
-                        ]
-
-                    q = Q(
-                        'query_string',
-                        query=query,
-                        fields=fields,
-                        quote_field_suffix=".exact",
-                        default_operator='AND'
-                    )
-
-                    # Nested тип
-                    if inid_schedule.elastic_index_field.parent:
-                        q = Q(
-                            'nested',
-                            path=inid_schedule.elastic_index_field.parent.field_name,
-                            query=q,
-                        )
-
-                    if not qs:
-                        qs = q
-                    else:
-                        qs &= q
-
-            if qs is not None:
-                qs &= Q('query_string', query=f"{group['obj_type'].pk}", default_field='Document.idObjType')
-                qs &= Q('query_string', query=f"{group['obj_state']}", default_field='search_data.obj_state')
-
-                # Не включать в список результатов заявки, по которым выдан патент
-                qs = filter_bad_apps(qs)
-
-                qs_list.append(qs)
-
-    # Формирование результирующего запроса
-    qs_result = None
-    for qs in qs_list:
-        if qs_result is None:
-            qs_result = qs
-        else:
-            qs_result |= qs
-    client = Elasticsearch(settings.ELASTIC_HOST, timeout=settings.ELASTIC_TIMEOUT)
-    s = Search(using=client, index=settings.ELASTIC_INDEX_NAME).query(
-        qs_result
-    ).source(
-        excludes=["*.DocBarCode", "*.DOCBARCODE"]
-    ).sort('_score')
-
-    return s
-
-
 def get_client_ip(request):
     """Возвращает IP-адрес пользователя."""
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -213,9 +97,74 @@ def paginate_results(s, page, paginate_by=10):
         page = paginator.page(1)
     except EmptyPage:
         page = paginator.page(paginator.num_pages)
+    else:
+        # Курсоры (search_after) для перехода на соседние страницы
+        page.next_cursor = s.get('next_cursor') if page.has_next() else None
+        page.previous_cursor = s.get('previous_cursor') if page.has_previous() else None
     return page
 
 
+def encode_search_cursor(sort_values, context=''):
+    """Кодирует значения сортировки документа (hit.meta.sort) в курсор для ссылок пагинации.
+    context - параметры запроса (сортировка, количество результатов на странице), для которых курсор действителен."""
+    if not sort_values:
+        return None
+    data = json.dumps({'c': context, 'v': list(sort_values)}, separators=(',', ':'), ensure_ascii=False)
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_search_cursor(cursor, context=''):
+    """Декодирует курсор пагинации. Возвращает None, если курсор некорректен или получен для других параметров."""
+    if not cursor:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, UnicodeError):
+        return None
+    if not isinstance(data, dict) or data.get('c') != context or not isinstance(data.get('v'), list):
+        return None
+    return data['v'] or None
+
+
+def get_page_cursors(hits, context=''):
+    """Возвращает курсоры пагинации для перехода со страницы результатов на соседние страницы."""
+    if not hits:
+        return {'previous_cursor': None, 'next_cursor': None}
+    return {
+        'previous_cursor': encode_search_cursor(hits[0].get('meta', {}).get('sort'), context),
+        'next_cursor': encode_search_cursor(hits[-1].get('meta', {}).get('sort'), context),
+    }
+
+
+def add_sort_tiebreaker(s):
+    """Добавляет сортировку по идентификатору заявки, которая делает порядок результатов однозначным
+    (необходимо для пагинации с помощью search_after).
+    Используется поле search_data.app_id (doc_values), а не _id, сортировка по которому требует fielddata."""
+    sort = s.to_dict().get('sort') or [{'_score': {'order': 'desc'}}]
+    return s.sort(*sort, {'search_data.app_id': {'order': 'asc', 'unmapped_type': 'long'}})
+
+
+def reverse_sort(sort):
+    """Возвращает обратный порядок сортировки (для перехода на предыдущую страницу с помощью search_after)."""
+    result = []
+    for item in sort:
+        if isinstance(item, str):
+            field = item.lstrip('-')
+            if item.startswith('-'):
+                order = 'desc'
+            else:
+                order = 'desc' if field == '_score' else 'asc'
+            item = {field: {'order': order}}
+        field, options = next(iter(item.items()))
+        options = dict(options) if isinstance(options, dict) else {'order': options}
+        order = options.get('order', 'desc' if field == '_score' else 'asc')
+        options['order'] = 'asc' if order == 'desc' else 'desc'
+        if 'missing' in options:
+            options['missing'] = '_first' if options['missing'] == '_last' else '_last'
+        result.append({field: options})
+    return result
+
+
 def filter_bad_apps(qs):
     """Исключает из результатов запроса заявки, которые не положено публиковать."""
     # Не показывать заявки, по которым выдан охранный документ
@@ -252,60 +201,81 @@ def sort_results(s, sort_by_value):
     return s
 
 
+# Возможные фильтры результатов поиска (сайдбар)
+RESULTS_FILTERS = [
+    {
+        'title': 'obj_type',
+        'field': 'Document.idObjType'
+    },
+    {
+        'title': 'obj_state',
+        'field': 'search_data.obj_state'
+    },
+    {
+        'title': 'registration_status_color',
+        'field': 'search_data.registration_status_color'
+    },
+]
+
+
+def apply_filters(s, get_params):
+    """Фильтрует результат запроса ElasticSearch (без агрегации, например для формирования файлов)."""
+    for item in RESULTS_FILTERS:
+        if get_params.get(f"filter_{item['title']}"):
+            s = s.filter('terms', **{item['field']: get_params.get(f"filter_{item['title']}")})
+    return s
+
+
 def filter_results(s, get_params):
-    """Фильтрует результат запроса ElasticSearch и выполняет агрегацию для фильтров в сайдбаре."""
-    # Возможные фильтры
-    filters = [
-        {
-            'title': 'obj_type',
-            'field': 'Document.idObjType'
-        },
-        {
-            'title': 'obj_state',
-            'field': 'search_data.obj_state'
-        },
-        {
-            'title': 'registration_status_color',
-            'field': 'search_data.registration_status_color'
-        },
-    ]
+    """Фильтрует результат запроса ElasticSearch и добавляет агрегацию для фильтров в сайдбаре.
+    Фильтры применяются через post_filter, поэтому результаты, их количество и агрегация
+    получаются одним запросом."""
+    active_filters = {
+        item['title']: Q('terms', **{item['field']: get_params.get(f"filter_{item['title']}")})
+        for item in RESULTS_FILTERS if get_params.get(f"filter_{item['title']}")
+    }
 
-    # Агрегация без фильтрации
-    for item in filters:
-        s.aggs.bucket(f"{item['title']}_terms", A('terms', field=item['field'], order={"_key": "asc"}, size=1000))
+    for item in RESULTS_FILTERS:
+        terms = A('terms', field=item['field'], order={"_key": "asc"}, size=1000)
 
-    aggregations = s.execute().aggregations.to_dict()
-    s_ = s
+        # Агрегация без фильтрации (post_filter на агрегацию не влияет)
+        s.aggs.bucket(f"{item['title']}_terms", terms)
 
-    # Фильтрация
-    for item in filters:
-        if get_params.get(f"filter_{item['title']}"):
-            # Фильтрация в основном запросе
-            s = s.filter('terms', **{item['field']: get_params.get(f"filter_{item['title']}")})
+        # Агрегация с применением остальных фильтров
+        other_filters = [q for title, q in active_filters.items() if title != item['title']]
+        if other_filters:
+            s.aggs.bucket(
+                f"{item['title']}_filtered",
+                'filter',
+                filter=Q('bool', filter=other_filters)
+            ).bucket(f"{item['title']}_terms", terms)
 
-        # Применение остальных фильтров в отдельном запросе для последующей агрегации
-        s_item = s_
-        for item_ in filters:
-            if item_ != item and get_params.get(f"filter_{item_['title']}"):
-                s_item = s_item.filter(
-                    'terms',
-                    **{item_['field']: get_params.get(f"filter_{item_['title']}")}
-                )
+    # Фильтрация результатов
+    if active_filters:
+        s = s.post_filter(Q('bool', filter=list(active_filters.values())))
 
-        # Агрегация
-        aggregations_item = s_item.execute().aggregations.to_dict()
+    return s
+
+
+def get_filters_aggregations(response):
+    """Возвращает агрегацию для фильтров в сайдбаре из ответа ElasticSearch на запрос,
+    подготовленный функцией filter_results."""
+    aggregations = response.aggregations.to_dict()
+    for item in RESULTS_FILTERS:
         item_terms_title = f"{item['title']}_terms"
+        filtered = aggregations.pop(f"{item['title']}_filtered", None)
+        if filtered is None:
+            continue
+
+        # Значения, отсутствующие после фильтрации, отображаются с нулевым количеством
+        buckets = filtered[item_terms_title]['buckets']
+        keys = [bucket['key'] for bucket in buckets]
         for bucket in aggregations[item_terms_title]['buckets']:
-            if not list(filter(
-                    lambda x: x['key'] == bucket['key'],
-                    aggregations_item[item_terms_title]['buckets']
-            )):
-                aggregations_item[item_terms_title]['buckets'].append(
-                    {'key': bucket['key'], 'doc_count': 0}
-                )
-        aggregations[item_terms_title]['buckets'] = aggregations_item[item_terms_title]['buckets']
+            if bucket['key'] not in keys:
+                buckets.append({'key': bucket['key'], 'doc_count': 0})
+        aggregations[item_terms_title]['buckets'] = buckets
 
-    return s, aggregations
+    return aggregations
 
 
 def extend_doc_flow(hit):
@@ -1165,73 +1135,111 @@ def user_has_access_to_docs_decorator(f):
     return wrapper
 
 
-def user_has_access_to_docs(user, hit):
-    """Возвращает признак доступности документа(ов)"""
-    # Проверка на принадлженость пользователя к роли суперадмина или к ВИП-роли
-    if not user.is_anonymous:
-        if user.is_vip():
-            return True
-        else:
-            allowed_persons = []
+def normalize_person_name(name):
+    """Приводит имя лица к виду для сравнения (латинские I, i заменяются на кириллицу, апострофы, верхний регистр)."""
+    return name.replace('I', 'І').replace('i', 'і').replace("`", "'").replace("’", "'").upper()
 
-            for person_type in ('applicant', 'inventor', 'owner', 'agent'):
-                try:
-                    if hit['search_data'].get(person_type):
-                        allowed_persons += [x['name'] for x in hit['search_data'][person_type]]
-                except KeyError:
-                    pass
 
-            # Адреса для листування (ТМ)
-            try:
-                allowed_persons.append(
-                    hit['TradeMark']['TrademarkDetails']['CorrespondenceAddress']['CorrespondenceAddressBook'][
-                        'Name']['FreeFormatNameLine']
-                )
-            except KeyError:
-                pass
+def get_app_access_names(hit):
+    """Возвращает нормализованные имена лиц, которые имеют отношение к заявке (для проверки доступа к документам)."""
+    derived = get_derived_fields(hit)
+    if derived and derived.get('access_names') is not None:
+        return derived['access_names']
 
-            # Адреса для листування (ПЗ)
-            try:
-                allowed_persons.append(
-                    hit['Design']['DesignDetails']['CorrespondenceAddress']['CorrespondenceAddressBook'][
-                        'FormattedNameAddress']['Name']['FreeFormatName']['FreeFormatNameDetails']['FreeFormatNameLine']
-                )
-            except KeyError:
-                pass
+    allowed_persons = []
 
-            # Адреса для листування (заявки на винаходи, корисні моделі)
-            try:
-                allowed_persons.append(hit['Claim']['I_98'])
-            except KeyError:
-                pass
+    for person_type in ('applicant', 'inventor', 'owner', 'agent'):
+        try:
+            if hit['search_data'].get(person_type):
+                allowed_persons += [x['name'] for x in hit['search_data'][person_type]]
+        except KeyError:
+            pass
 
-            # Адреса для листування (охоронні документи на винаходи, корисні моделі)
-            try:
-                allowed_persons.append(hit['Patent']['I_98'])
-            except KeyError:
-                pass
+    # Адреса для листування (ТМ)
+    try:
+        allowed_persons.append(
+            hit['TradeMark']['TrademarkDetails']['CorrespondenceAddress']['CorrespondenceAddressBook'][
+                'Name']['FreeFormatNameLine']
+        )
+    except KeyError:
+        pass
+
+    # Адреса для листування (ПЗ)
+    try:
+        allowed_persons.append(
+            hit['Design']['DesignDetails']['CorrespondenceAddress']['CorrespondenceAddressBook'][
+                'FormattedNameAddress']['Name']['FreeFormatName']['FreeFormatNameDetails']['FreeFormatNameLine']
+        )
+    except KeyError:
+        pass
+
+    # Адреса для листування (заявки на винаходи, корисні моделі)
+    try:
+        allowed_persons.append(hit['Claim']['I_98'])
+    except KeyError:
+        pass
+
+    # Адреса для листування (охоронні документи на винаходи, корисні моделі)
+    try:
+        allowed_persons.append(hit['Patent']['I_98'])
+    except KeyError:
+        pass
+
+    return [normalize_person_name(x) for x in allowed_persons if x is not None]
 
-            # Имена пользователя (если роль - патентный поверенный, то необходимо проверять несколько имён)
-            user_names = []
+
+def get_names_matcher(names):
+    """Возвращает регулярное выражение для поиска любого из имён names (None, если имён нет)."""
+    if not names:
+        return None
+    return re.compile('|'.join(re.escape(x) for x in names))
+
+
+def get_user_access_data(user):
+    """Возвращает признак ВИП-пользователя и регулярное выражение для поиска его имён среди имён лиц заявки.
+    Данные хранятся в кэше (USER_ACCESS_CACHE_TIMEOUT сек.) и в объекте пользователя."""
+    if hasattr(user, '_access_data'):
+        return user._access_data
+
+    cache_key = f"user_access_data_{user.pk}"
+    data = cache.get(cache_key)
+    if data is None:
+        is_vip = user.is_vip()
+        # Имена пользователя (если роль - патентный поверенный, то необходимо проверять несколько имён)
+        user_names = []
+        if not is_vip:
             if hasattr(user, 'certificateowner'):
                 user_names = [user.certificateowner.pszSubjFullName.strip()]
             elif user.is_patent_attorney():
                 user_names.append(f"{user.last_name} {user.first_name}".strip())
                 for patent_attroney in user.patentattorney_set.all():
                     user_names.append(patent_attroney.name)
+        data = {
+            'is_vip': is_vip,
+            # Пустое имя содержится в любой строке
+            'names': [normalize_person_name(x) for x in user_names if x and x.strip()],
+        }
+        cache.set(cache_key, data, getattr(settings, 'USER_ACCESS_CACHE_TIMEOUT', 600))
+
+    data['matcher'] = get_names_matcher(data['names'])
+    user._access_data = data
+    return data
 
-            # Удаление None-объектов
-            allowed_persons = list(filter(lambda item: item is not None, allowed_persons))
 
-            # Замена латинских I, i на кириллицу, апострофов
-            user_names = [x.replace('I', 'І').replace('i', 'і').replace("`", "'").replace("’", "'") for x in user_names]
-            allowed_persons = [x.replace('I', 'І').replace('i', 'і').replace("`", "'").replace("’", "'") for x in allowed_persons]
+def user_has_access_to_docs(user, hit):
+    """Возвращает признак доступности документа(ов)"""
+    if user.is_anonymous:
+        return False
 
-            # Проверка на вхождение
-            return any([person for person in allowed_persons for user_name in user_names if
-                        user_name.upper() in person.upper()])
+    # Проверка на принадлженость пользователя к роли суперадмина или к ВИП-роли
+    access_data = get_user_access_data(user)
+    if access_data['is_vip']:
+        return True
+    if not access_data['matcher']:
+        return False
 
-    return False
+    # Проверка на вхождение имени пользователя в имена лиц заявки
+    return any(access_data['matcher'].search(person) for person in get_app_access_names(hit))
 
 
 def user_has_access_to_tm_app(user, hit):
@@ -1248,13 +1256,9 @@ def user_has_access_to_tm_app(user, hit):
         return False
 
 
-def create_search_res_doc(data, file_path):
-    """Формировние Excel-файла с результатами поиска."""
-    workbook = xlsxwriter.Workbook(file_path)
-    worksheet = workbook.add_worksheet()
-
-    # Заголовки
-    titles = [
+def get_search_report_titles():
+    """Возвращает заголовки столбцов Excel-файла с результатами поиска."""
+    return [
         _("Тип об'єкта промислової власності"),
         _("Стан об'єкта промислової власності"),
         _("Номер заявки"),
@@ -1273,123 +1277,81 @@ def create_search_res_doc(data, file_path):
         _("Зображення ТМ"),
     ]
 
-    bold = workbook.add_format({'bold': True})
-    worksheet.write_row(0, 0, titles, bold)
-
-    for row_num, row_data in enumerate(data):
-        for col_num, col_data in enumerate(row_data):
-            if col_num == 15 and col_data and os.path.exists(col_data):
-                worksheet.insert_image(
-                    row_num + 1,
-                    col_num,
-                    col_data,
-                    {
-                        'x_offset': 2,
-                        'y_offset': 2,
-                        'x_scale': 0.3,
-                        'y_scale': 0.3,
-                        'image_data': get_resized_image_for_report(col_data)
-                    }
-                )
-            else:
-                worksheet.write(row_num + 1, col_num, col_data)
 
-    workbook.close()
-
-
-def get_resized_image_for_report(img_path):
-    """Изменяет размер изображения для отчёта и возвращает BytesIO."""
-    fixed_height = 120
-    image = Image.open(img_path)
-
-    height_percent = (fixed_height / float(image.size[1]))
-    width_size = int((float(image.size[0]) * float(height_percent)))
-    image = image.resize((width_size, fixed_height), Image.NEAREST)
-    if image.mode in ("RGBA", "P"):
-        image = image.convert("RGB")
-
-    img_byte_arr = io.BytesIO()
-    image.save(img_byte_arr, format='JPEG', optimize=True, quality=50)
-    return img_byte_arr
+def get_search_report_row(h, obj_types, user=None):
+    """Возвращает строку файла Excel для документа из результатов поиска.
+    obj_types - список (id, название) типов объектов."""
+    obj_states = [_('Заявка'), _('Охоронний документ')]
+    obj_type = next(filter(lambda item: item[0] == h.Document.idObjType, obj_types), None)[1]
+    obj_state = obj_states[h.search_data.obj_state - 1]
 
+    nice_indexes = get_app_nice_indexes(h)
 
-def prepare_data_for_search_report(s, lang_code, user=None):
-    """Подготавливает данные для файла Excel."""
-    obj_states = [_('Заявка'), _('Охоронний документ')]
-    obj_types = ObjType.objects.order_by('id').values_list('id', f"obj_type_{lang_code}")
-    data = list()
-    for h in s.params(size=1000, preserve_order=True).scan():
-        obj_type = next(filter(lambda item: item[0] == h.Document.idObjType, obj_types), None)[1]
-        obj_state = obj_states[h.search_data.obj_state - 1]
-
-        nice_indexes = get_app_nice_indexes(h)
-
-        if is_app_limited_for_user(h.to_dict(), user):
-            # Если библиографические данные заявки не публикуются
-            if h.Document.idObjType == 4:
-                image = get_tm_image_path(h)
-            else:
-                image = ''
-
-            data.append([
-                obj_type,
-                obj_state,
-                h.search_data.app_number,
-                '',
-                '',
-                '',
-                '',
-                '',
-                '',
-                '',
-                '',
-                '',
-                nice_indexes,
-                '',
-                '',
-                image
-            ])
+    if is_app_limited_for_user(h.to_dict(), user):
+        # Если библиографические данные заявки не публикуются
+        if h.Document.idObjType == 4:
+            image = get_tm_image_path(h)
         else:
-            app_date = datetime.datetime.strptime(h.search_data.app_date[:10], '%Y-%m-%d').strftime('%d.%m.%Y') \
-                if hasattr(h.search_data, 'app_date') and h.search_data.app_date else ''
-            rights_date = datetime.datetime.strptime(h.search_data.rights_date, '%Y-%m-%d').strftime(
-                '%d.%m.%Y') if h.search_data.rights_date else ''
-            title = ';\r\n'.join(h.search_data.title) if iterable(h.search_data.title) else h.search_data.title
-            applicant = get_app_applicant(h)
-            owner = get_app_owner(h)
-            inventor = get_app_inventor(h)
-            if hasattr(h.search_data, 'agent') and h.search_data.agent:
-                agent = ';\r\n'.join([x.name for x in h.search_data.agent])
-            else:
-                agent = ''
-            ipc_indexes = get_app_ipc_indexes(h)
-            icid = get_app_icid(h)
-            if h.Document.idObjType in (4, 9, 14):
-                code_441 = get_441_code(h)
-                image = get_tm_image_path(h)
-            else:
-                code_441 = ''
-                image = ''
-
-            data.append([
-                    obj_type,
-                    obj_state,
-                    h.search_data.app_number,
-                    app_date,
-                    h.search_data.protective_doc_number,
-                    rights_date,
-                    title,
-                    applicant,
-                    owner,
-                    inventor,
-                    agent,
-                    ipc_indexes,
-                    nice_indexes,
-                    icid,
-                    code_441,
-                    image,
-                ])
-    return data
+            image = ''
+
+        return [
+            obj_type,
+            obj_state,
+            h.search_data.app_number,
+            '',
+            '',
+            '',
+            '',
+            '',
+            '',
+            '',
+            '',
+            '',
+            nice_indexes,
+            '',
+            '',
+            image
+        ]
+
+    app_date = datetime.datetime.strptime(h.search_data.app_date[:10], '%Y-%m-%d').strftime('%d.%m.%Y') \
+        if hasattr(h.search_data, 'app_date') and h.search_data.app_date else ''
+    rights_date = datetime.datetime.strptime(h.search_data.rights_date, '%Y-%m-%d').strftime(
+        '%d.%m.%Y') if h.search_data.rights_date else ''
+    title = ';\r\n'.join(h.search_data.title) if iterable(h.search_data.title) else h.search_data.title
+    applicant = get_app_applicant(h)
+    owner = get_app_owner(h)
+    inventor = get_app_inventor(h)
+    if hasattr(h.search_data, 'agent') and h.search_data.agent:
+        agent = ';\r\n'.join([x.name for x in h.search_data.agent])
+    else:
+        agent = ''
+    ipc_indexes = get_app_ipc_indexes(h)
+    icid = get_app_icid(h)
+    if h.Document.idObjType in (4, 9, 14):
+        code_441 = get_441_code(h)
+        image = get_tm_image_path(h)
+    else:
+        code_441 = ''
+        image = ''
+
+    return [
+        obj_type,
+        obj_state,
+        h.search_data.app_number,
+        app_date,
+        h.search_data.protective_doc_number,
+        rights_date,
+        title,
+        applicant,
+        owner,
+        inventor,
+        agent,
+        ipc_indexes,
+        nice_indexes,
+        icid,
+        code_441,
+        image,
+    ]
 
 
 def get_tm_image_path(app):
@@ -1419,6 +1381,7 @@ def get_441_code(app):
     """Возвращает 441 код ТМ."""
     if type(app) is not dict:
         app = app.to_dict()
+    derived = get_derived_fields(app)
 
     if app['Document']['idObjType'] in (4, 9, 14):
         try:
@@ -1430,6 +1393,9 @@ def get_441_code(app):
         except KeyError:
             return ''
 
+        if derived and derived.get('bul_number_441'):
+            return f"{code_441_formatted}, бюл. №{derived['bul_number_441']}"
+
         try:
             obj = ClListOfficialBulletinsIp.objects.get(date_from__lte=code_441, date_to__gte=code_441)
         except ClListOfficialBulletinsIp.DoesNotExist:
@@ -1776,57 +1742,67 @@ def get_search_in_transactions(search_params):
     return False
 
 
+@functools.lru_cache(maxsize=4096)
+def parse_iso_date(value):
+    """Возвращает дату из строки формата YYYY-MM-DD (для сортировки документов, платежей, оповещений).
+    Результаты кэшируются, т.к. в документах одной заявки даты часто повторяются."""
+    if len(value) == 10 and value[4] == '-' and value[7] == '-':
+        return datetime.date.fromisoformat(value)
+    # Строки, которые допускает strptime (например, 2020-1-5)
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+
 def sort_doc_flow(hit):
     """Сортировка документов по дате."""
     # Изобретения, полезные модели, топографии
     if hit['Document']['idObjType'] in (1, 2, 3):
         if hit.get('DOCFLOW'):
             hit['DOCFLOW'].get('DOCUMENTS', []).sort(
-                key=lambda document: time.strptime(document['DOCRECORD'].get(
+                key=lambda document: parse_iso_date(document['DOCRECORD'].get(
                     'DOCREGDATE', document['DOCRECORD'].get(
                         'DOCSENDINGDATE', '1970-01-01'
                     )
-                ), "%Y-%m-%d")
+                ))
             )
             hit['DOCFLOW'].get('PAYMENTS', []).sort(
-                key=lambda document: time.strptime(document['PFRECORD'].get(
+                key=lambda document: parse_iso_date(document['PFRECORD'].get(
                     'PFDATE', '1970-01-01'
-                ), "%Y-%m-%d")
+                ))
             )
             hit['DOCFLOW'].get('COLLECTIONS', []).sort(
-                key=lambda document: time.strptime(document['CLRECORD'].get(
+                key=lambda document: parse_iso_date(document['CLRECORD'].get(
                     'CLDATEBEGIN', '1970-01-01'
-                ), "%Y-%m-%d")
+                ))
             )
 
     # Знаки для товаров и услуг
     elif hit['Document']['idObjType'] == 4:
         if hit['TradeMark'].get('DocFlow'):
             hit['TradeMark']['DocFlow']['Documents'].sort(
-                key=lambda document: time.strptime(document['DocRecord'].get(
+                key=lambda document: parse_iso_date(document['DocRecord'].get(
                     'DocRegDate', '1970-01-01'
-                ), "%Y-%m-%d")
+                ))
             )
         if hit['TradeMark'].get('PaymentDetails'):
             hit['TradeMark']['PaymentDetails']['Payment'].sort(
-                key=lambda document: time.strptime(document.get(
+                key=lambda document: parse_iso_date(document.get(
                     'PaymentDate', '1970-01-01'
-                ), "%Y-%m-%d")
+                ))
             )
 
     # Пром образцы
     elif hit['Document']['idObjType'] == 6:
         if hit['Design'].get('DocFlow'):
             hit['Design']['DocFlow']['Documents'].sort(
-                key=lambda document: time.strptime(document['DocRecord'].get(
+                key=lambda document: parse_iso_date(document['DocRecord'].get(
                     'DocRegDate', '1970-01-01'
-                ), "%Y-%m-%d")
+                ))
             )
         if hit['Design'].get('PaymentDetails'):
             hit['Design']['PaymentDetails']['Payment'].sort(
-                key=lambda document: time.strptime(document.get(
+                key=lambda document: parse_iso_date(document.get(
                     'PaymentDate', '1970-01-01'
-                ), "%Y-%m-%d")
+                ))
             )
 
 
@@ -1898,8 +1874,40 @@ def get_registration_status_color(hit):
     return status
 
 
+# Версия набора производных полей документа search_data.derived (см. services/derived_fields.py)
+DERIVED_FIELDS_VERSION = 2
+
+# Поля, которые добавлены или вычисляются по-другому начиная с версии (версия -> поля).
+# Остальные поля документов, проиндексированных с предыдущей версией, используются до их пересчёта
+# командой fill_derived_fields.
+DERIVED_FIELDS_CHANGES = {
+    2: ('access_names',),
+}
+
+
+def get_derived_fields(app_data):
+    """Возвращает производные поля документа, вычисленные при индексации,
+    или None, если они отсутствуют или вычислены для неизвестной версии набора полей.
+    Для предыдущих версий возвращаются только поля, которые с тех пор не изменились."""
+    derived = app_data.get('search_data', {}).get('derived')
+    if not derived or not isinstance(derived.get('version'), int):
+        return None
+    version = derived['version']
+    if version == DERIVED_FIELDS_VERSION:
+        return derived
+    if version < 1 or version > DERIVED_FIELDS_VERSION:
+        return None
+
+    changed = {field for v, fields in DERIVED_FIELDS_CHANGES.items() if v > version for field in fields}
+    return {key: value for key, value in derived.items() if key not in changed}
+
+
 def get_fixed_mark_status_code(app_data):
     """Анализирует список документов и возвращает код статуса согласно их наличию."""
+    derived = get_derived_fields(app_data)
+    if derived and derived.get('mark_status_code') is not None:
+        return derived['mark_status_code']
+
     result = int(app_data['Document'].get('MarkCurrentStatusCodeType', 0))
     for doc in app_data['TradeMark'].get('DocFlow', {}).get('Documents', []):
         if ('ТM-1.1' in doc['DocRecord']['DocType'] or 'ТМ-1.1' in doc['DocRecord']['DocType']) and result < 2000:
@@ -1912,14 +1920,15 @@ def get_fixed_mark_status_code(app_data):
 
 
 def filter_app_data(app_data, user):
-    """Фильтрует данные заявки. Оставляет только необходимую и доступную для отображения информацию."""
+    """Фильтрует данные заявки. Оставляет только необходимую и доступную для отображения информацию.
+    app_data может содержать не все поля документа (см. services/source_fields.py)."""
 
     # Если это заявка на полезную модель или пром образец, заявка на ТМ без установленной даты подачи
     # то необходимо убрать всю "закрытую" информацию
     # (кроме как для вип-пользователей или людей, которые имеют отношение к заявке)
     if app_data['search_data']['obj_state'] == 1 and not user_has_access_to_docs(user, app_data):
 
-        if app_data['Document']['idObjType'] == 1 and not app_data['Claim'].get('I_43.D'):  # Изобретения
+        if app_data['Document']['idObjType'] == 1 and not app_data.get('Claim', {}).get('I_43.D'):  # Изобретения
             res = {
                 'meta': app_data['meta'],
                 'Document': app_data['Document'],
@@ -1944,20 +1953,8 @@ def filter_app_data(app_data, user):
             return res
 
         elif app_data['Document']['idObjType'] == 4:
-            # mark_status = int(app_data['Document'].get('MarkCurrentStatusCodeType', 0))
-            mark_status = get_fixed_mark_status_code(app_data)
-            app_date = datetime.datetime.strptime(app_data['search_data']['app_date'][:10], '%Y-%m-%d')
-            if app_data['TradeMark']['TrademarkDetails'].get('Code_441'):
-                date_441 = datetime.datetime.strptime(
-                    app_data['TradeMark']['TrademarkDetails'].get('Code_441'),
-                    '%Y-%m-%d'
-                )
-            else:
-                date_441 = None
-            date_441_start = datetime.datetime.strptime('2020-08-18', '%Y-%m-%d')
-
             # Условие, которое определяет установлена ли дата подачи заявки
-            if (mark_status < 2000 and app_date < date_441_start) or (date_441 is None and app_date >= date_441_start):
+            if is_app_limited(app_data):
                 res = {}
                 res.update({'meta': app_data['meta']})
                 res.update({'Document': app_data['Document']})
@@ -1971,9 +1968,9 @@ def filter_app_data(app_data, user):
                                         'MarkImageFilename': app_data['TradeMark'].get(
                                             'TrademarkDetails', {}
                                         ).get(
-                                            'MarkImageDetails'
+                                            'MarkImageDetails', {}
                                         ).get(
-                                            'MarkImage'
+                                            'MarkImage', {}
                                         ).get('MarkImageFilename')
                                     }
                                 },
@@ -1996,7 +1993,8 @@ def filter_app_data(app_data, user):
                 return res
 
         # КЗПТ
-        elif app_data['Document']['idObjType'] == 5 and 'ApplicationPublicationDetails' not in app_data['Geo']['GeoDetails']:
+        elif app_data['Document']['idObjType'] == 5 \
+                and 'ApplicationPublicationDetails' not in app_data['Geo'].get('GeoDetails', {}):
             res = {
                 'meta': app_data['meta'],
                 'Document': app_data['Document'],
@@ -2042,8 +2040,12 @@ def filter_app_data(app_data, user):
 
 def is_app_limited(app_data: dict):
     """Является ли заявка такой, библиографические данные которой не должны публиковаться"""
+    derived = get_derived_fields(app_data)
+    if derived and derived.get('is_limited') is not None:
+        return derived['is_limited']
+
     if app_data['search_data']['obj_state'] == 1:
-        if app_data['Document']['idObjType'] == 1 and not app_data['Claim'].get('I_43.D'):  # Изобретения
+        if app_data['Document']['idObjType'] == 1 and not app_data.get('Claim', {}).get('I_43.D'):  # Изобретения
             return True
         elif app_data['Document']['idObjType'] == 2:  # Полезные модели
             return True
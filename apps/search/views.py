@@ -2,7 +2,8 @@ from django.views.generic import TemplateView
 from django.views.generic.detail import DetailView
 from django.db.models import F, Q
 from django.forms import formset_factory
-from django.http import Http404, HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, FileResponse
+from django.utils.cache import patch_cache_control
 from django.utils.http import urlencode
 from django.shortcuts import redirect
 from django.views.decorators.http import require_POST
@@ -16,10 +17,13 @@ from .forms import AdvancedSearchForm, SimpleSearchForm
 from .utils import (get_client_ip, paginate_results, get_ipc_codes_with_schedules)
 from urllib.parse import parse_qs, urlparse
 from celery.result import AsyncResult
+from elasticsearch import exceptions as elasticsearch_exceptions
 import json
 import six
 import apps.search.tasks as tasks
-from apps.search.decorators import check_recaptcha
+from apps.search.services import thumbnails
+import os
+from apps.search.decorators import check_recaptcha, recaptcha_is_valid
 from apps.bulletin.models import ClListOfficialBulletinsIp as Bulletin
 
 
@@ -71,52 +75,110 @@ class SimpleListView(TemplateView):
             # Показывать или скрывать поисковую форму
             context['show_search_form'] = self.request.session.get('show_search_form', False)
 
-            # Количество результатов на странице
-            self.request.session['show'] = self.request.GET.get(
-                'show',
-                self.request.session.get('show', 10)
-            )
-            get_params = dict(six.iterlists(self.request.GET))
-            get_params['show'] = [self.request.session['show']]
-
-            # Создание асинхронной задачи для Celery
-            task = tasks.perform_simple_search.delay(
-                self.request.user.pk,
-                get_params
-            )
-            context['task_id'] = task.id
+            context.update(get_search_context(self.request, 'simple'))
 
         return context
 
 
-@check_recaptcha
+def get_search_params(request):
+    """Возвращает параметры поиска из GET-запроса."""
+    # Количество результатов на странице
+    request.session['show'] = request.GET.get(
+        'show',
+        request.session.get('show', 10)
+    )
+    get_params = dict(six.iterlists(request.GET))
+    for key in ('token', 'search_type', 'task_id'):
+        get_params.pop(key, None)
+    get_params['show'] = [request.session['show']]
+    return get_params
+
+
+def perform_search(request, search_type, get_params):
+    """Выполняет поиск в процессе веб-сервера, если он укладывается в отведённое время (SEARCH_INLINE_TIME_BUDGET),
+    иначе передаёт его в Celery. Возвращает результат поиска или id задачи Celery."""
+    search_tasks = {
+        'simple': tasks.perform_simple_search,
+        'advanced': tasks.perform_advanced_search,
+    }
+    task = search_tasks[search_type]
+    time_budget = getattr(settings, 'SEARCH_INLINE_TIME_BUDGET', 0)
+    if time_budget:
+        try:
+            return task(request.user.pk, get_params, request_timeout=time_budget), None
+        except elasticsearch_exceptions.ConnectionTimeout:
+            pass
+
+    # Создание асинхронной задачи для Celery
+    return None, task.delay(request.user.pk, get_params).id
+
+
+def get_search_context(request, search_type):
+    """Возвращает переменные шаблона страницы поиска для выполнения поискового запроса."""
+    get_params = get_search_params(request)
+
+    if not getattr(settings, 'SEARCH_INLINE_TIME_BUDGET', 0):
+        return {'task_id': perform_search(request, search_type, get_params)[1]}
+
+    if settings.RECAPTCHA_ENABLED:
+        # Поиск выполняется запросом со страницы после проверки reCAPTCHA
+        return {'search_query': urlencode(get_params, True)}
+
+    result, task_id = perform_search(request, search_type, get_params)
+    if result is not None:
+        return {'results_html': render_results_html(request, search_type, result)}
+    return {'task_id': task_id}
+
+
+def render_results_html(request, search_type, result):
+    """Возвращает HTML с результатами поиска."""
+    context = dict(result)
+    context['lang_code'] = 'ua' if request.LANGUAGE_CODE == 'uk' else 'en'
+
+    if result.get('validation_errors'):
+        context['validation_errors'] = result['validation_errors']
+    else:
+        # Пагинация
+        page = result['get_params']['page'][0] if result['get_params'].get('page') else 1
+        results_on_page = result['get_params']['show'][0] if result['get_params'].get('show') else 10
+        context['results'] = paginate_results(result['results'], page, results_on_page)
+
+    return render_to_string(f"search/{search_type}/_partials/results.html", context, request)
+
+
 def get_results_html(request):
-    """Возвращает HTML с результатами простого поиска."""
-    task_id = request.GET.get('task_id', None)
+    """Возвращает HTML с результатами поиска."""
+    task_id = request.GET.get('task_id') or None
     search_type = request.GET.get('search_type', None)
-    if task_id is not None and search_type in ('simple', 'advanced', 'transactions'):
-        task = AsyncResult(task_id)
-        data = {}
-        if task.state == 'SUCCESS':
-            context = task.result
-            context['lang_code'] = 'ua' if request.LANGUAGE_CODE == 'uk' else 'en'
-            data['state'] = 'SUCCESS'
+    if search_type not in ('simple', 'advanced', 'transactions') or (task_id is None and search_type == 'transactions'):
+        return HttpResponse('No job id given.')
 
-            if task.result.get('validation_errors'):
-                context['validation_errors'] = task.result['validation_errors']
-            else:
-                # Пагинация
-                page = task.result['get_params']['page'][0] if task.result['get_params'].get('page') else 1
-                results_on_page = task.result['get_params']['show'][0] if task.result['get_params'].get('show') else 10
-                context['results'] = paginate_results(task.result['results'], page, results_on_page)
+    # reCAPTCHA проверяется один раз для поиска, а не при каждом запросе состояния задачи
+    verified_tasks = request.session.get('recaptcha_verified_tasks', [])
+    if settings.RECAPTCHA_ENABLED and task_id not in verified_tasks:
+        if not recaptcha_is_valid(request):
+            return HttpResponseBadRequest()
+        if task_id is not None:
+            request.session['recaptcha_verified_tasks'] = (verified_tasks + [task_id])[-20:]
+
+    data = {}
+    if task_id is None:
+        result, task_id = perform_search(request, search_type, get_search_params(request))
+        if result is None:
+            # Поиск не уложился в отведённое время и выполняется Celery
+            request.session['recaptcha_verified_tasks'] = (verified_tasks + [task_id])[-20:]
+            data['task_id'] = task_id
+            return HttpResponse(json.dumps(data), content_type='application/json')
+    else:
+        task = AsyncResult(task_id)
+        if task.state != 'SUCCESS':
+            return HttpResponse(json.dumps(data), content_type='application/json')
+        result = task.result
 
-            # Формирование HTML с результатами
-            data['result'] = render_to_string(
-                f"search/{search_type}/_partials/results.html",
-                context,
-                request)
-        return HttpResponse(json.dumps(data), content_type='application/json')
-    return HttpResponse('No job id given.')
+    # Формирование HTML с результатами
+    data['state'] = 'SUCCESS'
+    data['result'] = render_results_html(request, search_type, result)
+    return HttpResponse(json.dumps(data), content_type='application/json')
 
 
 class AdvancedListView(TemplateView):
@@ -162,21 +224,8 @@ class AdvancedListView(TemplateView):
             # Показывать или скрывать поисковую форму
             context['show_search_form'] = self.request.session.get('show_search_form', False)
 
-            # Количество результатов на странице
-            self.request.session['show'] = self.request.GET.get(
-                'show',
-                self.request.session.get('show', 10)
-            )
-            get_params = dict(six.iterlists(self.request.GET))
-            get_params['show'] = [self.request.session['show']]
-
             # Поиск в ElasticSearch
-            # Создание асинхронной задачи для Celery
-            task = tasks.perform_advanced_search.delay(
-                self.request.user.pk,
-                get_params
-            )
-            context['task_id'] = task.id
+            context.update(get_search_context(self.request, 'advanced'))
 
         context['RECAPTCHA_ENABLED'] = settings.RECAPTCHA_ENABLED
 
@@ -193,8 +242,9 @@ def add_filter_params(request):
         if not get_params[f]:
             del get_params[f]
 
-    if get_params.get('page'):
-        del get_params['page']  # Для переадресации на 1 страницу
+    # Для переадресации на 1 страницу
+    for key in ('page', 'after', 'before'):
+        get_params.pop(key, None)
 
     get_params = urlencode(get_params, True)
 
@@ -337,9 +387,10 @@ def download_selection(request, id_app_number):
 
 
 def validate_query(request):
-    """Создаёт задание на валидацию запроса, который идёт в ElasticSearch (для валидации на стороне клиента)"""
-    task = tasks.validate_query.delay(dict(six.iterlists(request.GET)))
-    return HttpResponse(json.dumps({'task_id': task.id}), content_type='application/json')
+    """Возвращает JSON с результатом валидации поискового запроса (для валидации на стороне клиента).
+    Валидация выполняется в процессе веб-сервера, без постановки задачи в очередь."""
+    result = tasks.validate_query(dict(six.iterlists(request.GET)))
+    return HttpResponse(json.dumps({'result': bool(result)}), content_type='application/json')
 
 
 def download_simple(request, format_: str):
@@ -509,6 +560,30 @@ def get_obj_types_with_transactions(request):
     return HttpResponse(json.dumps({'task_id': task.id}), content_type='application/json')
 
 
+def get_thumbnail(request, size: str):
+    """Возвращает уменьшенную копию изображения из MEDIA_ROOT (path - путь к изображению относительно MEDIA_ROOT)."""
+    if size not in thumbnails.SIZES:
+        raise Http404
+    media_root = os.path.realpath(settings.MEDIA_ROOT)
+    img_path = os.path.realpath(os.path.join(media_root, request.GET.get('path', '').lstrip('/')))
+    if not img_path.startswith(os.path.join(media_root, '')):
+        raise Http404
+
+    # Копия может быть удалена при очистке хранилища после её получения, тогда она формируется повторно
+    for attempt in range(2):
+        thumbnail_path = thumbnails.get_thumbnail(img_path, size)
+        if not thumbnail_path:
+            raise Http404
+        try:
+            f = open(thumbnail_path, 'rb')
+        except FileNotFoundError:
+            continue
+        response = FileResponse(f, content_type='image/jpeg')
+        patch_cache_control(response, public=True, max_age=24 * 60 * 60)
+        return response
+    raise Http404
+
+
 @require_POST
 @csrf_exempt
 def toggle_search_form(request):
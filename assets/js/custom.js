@@ -63,6 +63,11 @@ function downloadFileAfterTaskExec(taskId, onSuccess, onError, retries = 20) {
                 saveAs(res.data.file_path, res.data.file_path.split('/').pop());
             }
             onSuccess(data);
+        } else if (data.state === 'PROGRESS') {
+            // Задача выполняется (формирование файла с большим количеством результатов), попытки не расходуются
+            setTimeout(function () {
+                downloadFileAfterTaskExec(taskId, onSuccess, onError, retries);
+            }, 1000);
         } else {
             if (retries > 0) {
                 setTimeout(function () {
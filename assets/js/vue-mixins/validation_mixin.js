@@ -85,12 +85,15 @@ export default {
                     axios
                         .get(validatePath, {retry: 1})
                         .then(response => {
-                            return response.data['task_id'];
-                        }).then(task_id => {
-                        this.getTaskInfo(task_id).then(result => {
-                            resolve(result);
+                            if ('result' in response.data) {
+                                // Запрос провалидирован сервером сразу
+                                resolve(response.data['result']);
+                            } else {
+                                this.getTaskInfo(response.data['task_id']).then(result => {
+                                    resolve(result);
+                                });
+                            }
                         });
-                    });
                 });
             }
         });
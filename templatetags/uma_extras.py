@@ -29,6 +29,17 @@ def replace_and_urlencode(get_params, field, value):
     return urllib.parse.urlencode(get_params, doseq=True)
 
 
+@register.simple_tag
+def page_urlencode(get_params, page, cursor_param=None, cursor=None):
+    """Параметры ссылки на страницу результатов поиска.
+    Курсор (search_after) передаётся только в ссылках на соседние страницы."""
+    params = {key: value for key, value in get_params.items() if key not in ('after', 'before')}
+    params['page'] = page
+    if cursor_param and cursor:
+        params[cursor_param] = cursor
+    return urllib.parse.urlencode(params, doseq=True)
+
+
 @register.filter
 def urlencode_dict(data):
     return urllib.parse.urlencode(data, doseq=True)
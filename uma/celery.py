@@ -1,6 +1,7 @@
 import os
 import socket
 from celery import Celery
+from celery.schedules import crontab
 from celery.signals import task_failure
 from django.core.mail import mail_admins
 
@@ -18,6 +19,19 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
 
+# Периодические задачи (при использовании django_celery_beat.schedulers:DatabaseScheduler
+# переносятся в БД при запуске beat)
+app.conf.beat_schedule = {
+    'evict-thumbnails': {
+        'task': 'apps.search.tasks.evict_thumbnails',
+        'schedule': crontab(minute=30),
+    },
+    'create-open-data-snapshots': {
+        'task': 'apps.api.tasks.create_open_data_snapshots',
+        'schedule': crontab(hour=3, minute=0),
+    },
+}
+
 
 @task_failure.connect()
 def celery_task_failure_email(**kwargs):
@@ -1,5 +1,8 @@
 import six
 import datetime
+import codecs
+import json
+import time
 from django.contrib.auth.models import User, AnonymousUser
 
 try:
@@ -7,6 +10,11 @@ try:
 except ImportError:
     from collections import Iterable
 
+try:
+    import orjson as fast_json
+except ImportError:
+    fast_json = None
+
 
 def iterable(arg):
     """Возвращает признак того, является ли объект итерируемым."""
@@ -26,6 +34,13 @@ def get_unique_filename(prefix: str = '') -> str:
     return "_".join([prefix, suffix]).replace('/', '_')
 
 
+def get_progress_callback(task):
+    """Возвращает функцию для сохранения прогресса выполнения задачи Celery (состояние PROGRESS)."""
+    def on_progress(current, total):
+        task.update_state(state='PROGRESS', meta={'current': current, 'total': total})
+    return on_progress
+
+
 def get_user_or_anonymous(user_id):
     """Возвращает пользователя по его id или возвращает анонимного юзера, если он не найден."""
     try:
@@ -34,3 +49,33 @@ def get_user_or_anonymous(user_id):
         user = AnonymousUser()
 
     return user
+
+
+def detect_json_encoding(raw: bytes) -> str:
+    """Определяет кодировку JSON по BOM или по первым байтам содержимого."""
+    if raw.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if raw.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    # JSON начинается с ASCII-символа, поэтому нулевой байт указывает на UTF-16 без BOM
+    if len(raw) > 1 and raw[0] == 0:
+        return 'utf-16-be'
+    if len(raw) > 1 and raw[1] == 0:
+        return 'utf-16-le'
+    return 'utf-8'
+
+
+def read_json_file(path: str) -> tuple:
+    """Читает и разбирает файл JSON за один проход.
+    Возвращает данные и время (в секундах), затраченное на декодирование."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+
+    start = time.perf_counter()
+    text = raw.decode(detect_json_encoding(raw))
+    # В файлах встречаются лишние BOM внутри содержимого
+    if '\ufeff' in text:
+        text = text.replace('\ufeff', '')
+    data = fast_json.loads(text) if fast_json else json.loads(text)
+
+    return data, time.perf_counter() - start